@@ -0,0 +1,311 @@
+"""Asyncio-native (ASGI) variant of the web app.
+
+Serves the same routes and pages as ``web_app`` without a framework. The
+blocking SQLite calls run on a bounded thread pool so a slow query never
+stalls the event loop. Run it with any ASGI server, e.g. ``python3 main.py
+--asgi`` or ``uvicorn asgi_app:app``.
+"""
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Union
+from urllib.parse import parse_qsl, urlencode
+
+from jinja2 import Environment
+
+import web_app
+
+# Threads available for database work; requests beyond this queue up.
+DB_WORKERS = int(os.getenv("ASGI_DB_WORKERS", 8))
+
+executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="asgi-db")
+
+ROUTES = {"index": "/"}
+
+
+def url_for(endpoint: str, **values) -> str:
+    """Build a URL like Flask's url_for for the endpoints the templates use."""
+    query = urlencode([(k, v) for k, v in values.items() if v is not None])
+    return ROUTES[endpoint] + (f"?{query}" if query else "")
+
+
+env = Environment(autoescape=True)
+env.globals["url_for"] = url_for
+index_template, edit_template, rows_template = web_app.compile_templates(env)
+
+
+class Request:
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True))
+        self.form = dict(parse_qsl(body.decode(), keep_blank_values=True))
+        self.query_string = scope.get("query_string", b"")
+        self.headers = {name.decode().lower(): value.decode() for name, value in scope.get("headers", [])}
+        # URL pattern that matched, for request metrics
+        self.route = "unmatched"
+
+    def holds(self, etag: str) -> bool:
+        """Whether If-None-Match lists ``etag``."""
+        tags = [tag.strip() for tag in self.headers.get("if-none-match", "").split(",")]
+        return "*" in tags or f'"{etag}"' in tags or f'W/"{etag}"' in tags
+
+
+# The body is either bytes or, for streams, an async iterator of chunks.
+Response = Tuple[int, List[Tuple[bytes, bytes]], Union[bytes, AsyncIterator[bytes]]]
+
+
+def html(body: str) -> Response:
+    return 200, [(b"content-type", b"text/html; charset=utf-8")], body.encode()
+
+
+async def conditional_page(request: Request, etag: str, render: Callable[[], Awaitable[str]]) -> Response:
+    """Reply 304 when the client holds ``etag``, else the rendered page."""
+    headers = [(b"etag", f'W/"{etag}"'.encode()), (b"cache-control", b"no-cache")]
+    if request.holds(etag):
+        return 304, headers, b""
+    status, page_headers, body = html(await render())
+    return status, page_headers + headers, body
+
+
+def redirect(location: str) -> Response:
+    return 302, [(b"location", location.encode())], b""
+
+
+def bad_form(error: ValueError) -> Response:
+    """See web_app.bad_form."""
+    return 400, [(b"content-type", b"text/plain; charset=utf-8")], f"{error}\n".encode()
+
+
+async def run_db(func: Callable, *args, **kwargs):
+    """Run a blocking tracker call on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def index(request: Request) -> Response:
+    async def render() -> str:
+        context = await run_db(web_app.index_context, request.args)
+        return index_template.render(**context)
+
+    etag = await run_db(web_app.page_etag, request.path, request.query_string)
+    return await conditional_page(request, etag, render)
+
+
+async def rows(request: Request) -> Response:
+    """The index page's <tbody>; see web_app.rows."""
+    async def render() -> str:
+        context = await run_db(web_app.rows_context, request.args)
+        return rows_template.render(**context)
+
+    etag = await run_db(web_app.page_etag, request.path, request.query_string)
+    return await conditional_page(request, etag, render)
+
+
+async def static_asset(request: Request, name: str) -> Response:
+    found = web_app.asset_body(name, request.headers.get("accept-encoding", ""))
+    if found is None:
+        return 404, [], b"Not Found"
+    mimetype, encoding, body = found
+    headers = [
+        (b"content-type", mimetype.encode()),
+        (b"cache-control", web_app.ASSET_CACHE_CONTROL.encode()),
+        (b"vary", b"Accept-Encoding"),
+    ]
+    if encoding is not None:
+        headers.append((b"content-encoding", encoding.encode()))
+    return 200, headers, body
+
+
+async def add(request: Request) -> Response:
+    try:
+        await run_db(web_app.tracker.add_task, **web_app.add_args(request.form))
+    except ValueError as exc:
+        return bad_form(exc)
+    return redirect(url_for("index"))
+
+
+async def done(request: Request, task_id: int) -> Response:
+    await run_db(web_app.tracker.mark_done, task_id)
+    return redirect(url_for("index"))
+
+
+async def delete(request: Request, task_id: int) -> Response:
+    await run_db(web_app.tracker.delete_task, task_id)
+    return redirect(url_for("index"))
+
+
+async def comment(request: Request, task_id: int) -> Response:
+    await run_db(
+        web_app.tracker.update_task,
+        task_id,
+        comment=request.form.get("comment", ""),
+        color=request.form.get("color", ""),
+    )
+    return 204, [], b""
+
+
+async def edit(request: Request, task_id: int) -> Response:
+    if request.method == "POST":
+        try:
+            await run_db(web_app.tracker.update_task, task_id, **web_app.edit_args(request.form))
+        except ValueError as exc:
+            return bad_form(exc)
+        return redirect(url_for("index"))
+    async def render() -> str:
+        task = await run_db(web_app.tracker.get_task, task_id)
+        return edit_template.render(t=task, statuses=web_app.STATUSES)
+
+    etag = await run_db(web_app.page_etag, request.path)
+    return await conditional_page(request, etag, render)
+
+
+async def prometheus_metrics(request: Request) -> Response:
+    body = web_app.tracker.metrics.render() + web_app.http_metrics.render()
+    return 200, [(b"content-type", b"text/plain; version=0.0.4; charset=utf-8")], body.encode()
+
+
+async def events(request: Request) -> Response:
+    """Server-Sent Events stream of task changes; see web_app.events."""
+    feed = web_app.feed
+    seq = await run_db(web_app.stream_start, request.headers.get("last-event-id"), request.args.get("since"))
+    await run_db(feed.start)
+
+    async def stream() -> AsyncIterator[bytes]:
+        nonlocal seq
+        yield b"retry: 3000\n\n"
+        idle = 0.0
+        while not feed.closed:
+            batch = feed.since(seq)
+            if batch is None:
+                batch = await run_db(feed.catch_up, seq)
+            if batch is None:
+                yield web_app.RESET_MESSAGE.encode()
+                return
+            if batch:
+                idle = 0.0
+                messages = []
+                for seq, payload in batch:
+                    messages.append(web_app.event_message(seq, payload))
+                yield "".join(messages).encode()
+                continue
+            if idle >= web_app.KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield b": keepalive\n\n"
+            # the feed's thread does the polling; this only reads its buffer
+            await asyncio.sleep(web_app.CHANGE_POLL_SECONDS)
+            idle += web_app.CHANGE_POLL_SECONDS
+
+    headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]
+    return 200, headers, stream()
+
+
+# (path pattern, allowed methods, handler)
+URLS: List[Tuple["re.Pattern[str]", Tuple[str, ...], Callable[..., Awaitable[Response]]]] = [
+    (re.compile(r"/"), ("GET",), index),
+    (re.compile(r"/rows"), ("GET",), rows),
+    (re.compile(r"/static/([^/]+)"), ("GET",), static_asset),
+    (re.compile(r"/add"), ("POST",), add),
+    (re.compile(r"/done/(\d+)"), ("POST",), done),
+    (re.compile(r"/delete/(\d+)"), ("POST",), delete),
+    (re.compile(r"/comment/(\d+)"), ("POST",), comment),
+    (re.compile(r"/edit/(\d+)"), ("GET", "POST"), edit),
+    (re.compile(r"/metrics"), ("GET",), prometheus_metrics),
+    (re.compile(r"/events"), ("GET",), events),
+]
+
+
+async def dispatch(request: Request) -> Response:
+    for pattern, methods, handler in URLS:
+        match = pattern.fullmatch(request.path)
+        if match is None:
+            continue
+        request.route = pattern.pattern
+        if request.method not in methods:
+            return 405, [(b"allow", ", ".join(methods).encode())], b"Method Not Allowed"
+        try:
+            args = (int(group) if group.isdigit() else group for group in match.groups())
+            return await handler(request, *args)
+        except (KeyError, ValueError):
+            return 400, [], b"Bad Request"
+    return 404, [], b"Not Found"
+
+
+async def read_body(receive: Callable) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def stream_body(body: AsyncIterator[bytes], receive: Callable, send: Callable) -> None:
+    """Send chunks of ``body`` until it ends or the client disconnects."""
+    disconnected = asyncio.ensure_future(receive())
+    chunks = body.__aiter__()
+    try:
+        while True:
+            chunk = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not chunk.done():
+                # the only message left to receive is http.disconnect
+                chunk.cancel()
+                await asyncio.gather(chunk, return_exceptions=True)
+                break
+            try:
+                data = chunk.result()
+            except StopAsyncIteration:
+                await send({"type": "http.response.body", "body": b""})
+                break
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+    finally:
+        disconnected.cancel()
+        await chunks.aclose()
+
+
+async def lifespan(receive: Callable, send: Callable) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: Dict, receive: Callable, send: Callable) -> None:
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise RuntimeError(f"Unsupported ASGI scope {scope['type']!r}")
+    started = time.perf_counter()
+    request = Request(scope, await read_body(receive))
+    status, headers, body = await dispatch(request)
+    web_app.http_metrics.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - started,
+        route=request.route,
+        method=request.method,
+        status=str(status),
+    )
+    if not isinstance(body, bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await stream_body(body, receive, send)
+        return
+    if status == 200 and not any(name == b"content-encoding" for name, _ in headers):
+        content_type = next((value for name, value in headers if name == b"content-type"), b"")
+        encoding, body = web_app.encode_body(
+            body, content_type.decode(), request.headers.get("accept-encoding", "")
+        )
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"vary", b"Accept-Encoding"))
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
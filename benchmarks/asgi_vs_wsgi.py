@@ -0,0 +1,113 @@
+"""Compare requests/sec and latency of the Flask and ASGI servers.
+
+Starts ``main.py`` twice (Flask dev server, then ``--asgi`` under uvicorn)
+against the same pre-populated database and drives the index page from
+concurrent client threads.
+
+    python3 benchmarks/asgi_vs_wsgi.py --tasks 100000 --clients 32 --seconds 5
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from synthetic import populate
+
+PATHS = ["/", "/?sort=due_asc", "/?sort=asc", "/?q=report", "/?status=in+progress"]
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def drive(port: int, clients: int, seconds: float) -> dict:
+    stop = threading.Event()
+    latencies = [[] for _ in range(clients)]
+    errors = [0]
+
+    def client(slot: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn.request("GET", random.choice(PATHS))
+                conn.getresponse().read()
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies[slot].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    samples = sorted(s for per_client in latencies for s in per_client)
+    if not samples:
+        return {"requests_per_sec": 0.0, "p50_ms": None, "p99_ms": None, "errors": errors[0]}
+    return {
+        "requests_per_sec": len(samples) / seconds,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        "errors": errors[0],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        populate(os.path.join(tmp, "tasks.db"), args.tasks)
+        env = dict(os.environ, PORT=str(args.port), PYTHONPATH=str(ROOT))
+        print(f"{'server':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name, flags in (("flask", []), ("asgi", ["--asgi"])):
+            server = subprocess.Popen(
+                [sys.executable, str(ROOT / "main.py"), *flags],
+                cwd=tmp,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(args.port)
+                result = drive(args.port, args.clients, args.seconds)
+            finally:
+                server.terminate()
+                server.wait()
+            p50 = f"{result['p50_ms']:.1f}" if result["p50_ms"] is not None else "-"
+            p99 = f"{result['p99_ms']:.1f}" if result["p99_ms"] is not None else "-"
+            print(
+                f"{name:<8} {result['requests_per_sec']:>8.0f} {p50:>8} {p99:>8}"
+                f" {result['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-command latency of the task_tracker.py CLI, direct and via the daemon.
+
+Runs each command many times as a fresh process, first as
+``task_tracker.py`` opening the database itself and then as
+``task_client.py`` forwarding to ``task_tracker.py serve`` over a Unix
+socket, and prints the mean and p95 wall time per command.
+
+    python3 benchmarks/cli_latency.py --tasks 10000 --runs 50
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from synthetic import populate
+
+CLI = str(ROOT / "task_tracker.py")
+CLIENT = str(ROOT / "task_client.py")
+COMMANDS = {
+    "add": ["add", "benchmark task", "-p", "3"],
+    "list -n 10": ["list", "-n", "10"],
+    "summary": ["summary"],
+    "done": ["done", "1"],
+}
+
+
+def time_command(script: str, argv, runs: int, env: dict, cwd: str) -> dict:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, script, *argv], cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": sum(samples) / len(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def wait_for_socket(path: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise RuntimeError("daemon did not start")
+        time.sleep(0.05)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=50, help="Invocations per command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        populate(os.path.join(tmp, "tasks.db"), args.tasks)
+        socket_path = os.path.join(tmp, "daemon.sock")
+        env = {k: v for k, v in os.environ.items() if k != "TASK_TRACKER_SOCKET"}
+        print(f"{'command':<12} {'mode':<7} {'mean ms':>8} {'p95 ms':>8}")
+        results = {
+            name: {"direct": time_command(CLI, argv, args.runs, env, tmp)}
+            for name, argv in COMMANDS.items()
+        }
+        daemon = subprocess.Popen([sys.executable, CLI, "--socket", socket_path, "serve"], cwd=tmp)
+        try:
+            wait_for_socket(socket_path)
+            forwarded = dict(env, TASK_TRACKER_SOCKET=socket_path)
+            for name, argv in COMMANDS.items():
+                results[name]["daemon"] = time_command(CLIENT, argv, args.runs, forwarded, tmp)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+        for name, modes in results.items():
+            for mode, result in modes.items():
+                print(f"{name:<12} {mode:<7} {result['mean_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
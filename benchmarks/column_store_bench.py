@@ -0,0 +1,80 @@
+"""Memory per task and list latency of the column store against SQLite.
+
+Measures, with tracemalloc, the memory held by every task as fetched
+``fetchall()`` tuples and as a ColumnStore with two sort orders built.
+It then times list_tasks and count_tasks on a plain TaskTracker and on
+one opened with ``column_store=True``.
+
+    python3 benchmarks/column_store_bench.py --tasks 100000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from column_store import ColumnStore
+from suite import measure
+from synthetic import populate
+from task_tracker import EXPORT_FIELDS, TaskTracker
+
+CASES = {
+    "list priority page1": dict(show_all=True, limit=10),
+    "list due_asc page1": dict(show_all=True, sort_by="due", ascending=True, limit=10),
+    "list open offset 500": dict(limit=10, offset=500),
+    "list status page1": dict(show_all=True, status="in progress", limit=10),
+    "list search page1": dict(show_all=True, search="budget", limit=10),
+    "count open": None,
+}
+
+
+def memory_per_task(tracker: TaskTracker, tasks: int) -> dict:
+    """Bytes per task held as fetched tuples and as a column store."""
+    tracemalloc.start()
+    rows = tracker.conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM tasks").fetchall()
+    tuples = tracemalloc.get_traced_memory()[0]
+    store = ColumnStore()
+    for row in rows:
+        store.upsert(*row)
+    del rows
+    for order in ("priority_desc", "due_asc"):
+        store.select(order, limit=1)
+    columns = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"tuples": tuples / tasks, "columns": columns / tasks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per case")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "tasks.db")
+        populate(db_path, args.tasks)
+        plain = TaskTracker(db_path)
+        columns = TaskTracker(db_path, column_store=True)
+
+        per_task = memory_per_task(plain, args.tasks)
+        print(f"bytes per task: {per_task['tuples']:.0f} as tuples, {per_task['columns']:.0f} as columns")
+        print(f"{'case':<24} {'sqlite ms':>10} {'columns ms':>11}")
+        for name, query in CASES.items():
+            if query is None:
+                results = [measure(tracker.count_tasks, args.repeat) for tracker in (plain, columns)]
+            else:
+                results = [
+                    measure(lambda: tracker.list_tasks(**query), args.repeat)
+                    for tracker in (plain, columns)
+                ]
+            print(f"{name:<24} {results[0]['median_ms']:>10.3f} {results[1]['median_ms']:>11.3f}")
+        plain.close()
+        columns.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Load test: read throughput by thread count while writes are in flight.
+
+Runs the index page queries (a keyset page plus a status count) from a
+growing number of reader threads while one thread keeps updating tasks: with
+the single shared connection, in pooled mode, and reading from an in-memory
+snapshot refreshed every second.
+
+    python3 benchmarks/concurrency.py --tasks 100000 --seconds 3
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from synthetic import populate
+from task_tracker import TaskTracker
+
+
+def run(tracker: TaskTracker, threads: int, seconds: float, tasks: int) -> dict:
+    stop = threading.Event()
+    reads = [0] * threads
+    writes = [0]
+
+    def reader(slot: int) -> None:
+        while not stop.is_set():
+            tracker.list_tasks_page(show_all=True, sort_by="due", ascending=True, limit=10)
+            tracker.count_tasks(show_all=True, status="in progress")
+            reads[slot] += 1
+
+    def writer() -> None:
+        while not stop.is_set():
+            tracker.update_task(random.randint(1, tasks), priority=random.randint(1, 5))
+            writes[0] += 1
+
+    workers = [threading.Thread(target=reader, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=writer))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return {"reads_per_sec": sum(reads) / seconds, "writes_per_sec": writes[0] / seconds}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "tasks.db")
+        populate(db_path, args.tasks)
+        print(f"{'mode':<8} {'threads':>7} {'reads/s':>10} {'writes/s':>10}")
+        modes = {
+            "shared": {},
+            "pooled": {"pooled": True, "pool_size": max(args.threads)},
+            "snapshot": {"snapshot": ":memory:", "snapshot_max_age": 2.0},
+        }
+        for mode, options in modes.items():
+            tracker = TaskTracker(db_path, **options)
+            for threads in args.threads:
+                result = run(tracker, threads, args.seconds, args.tasks)
+                print(
+                    f"{mode:<8} {threads:>7} {result['reads_per_sec']:>10.0f}"
+                    f" {result['writes_per_sec']:>10.0f}"
+                )
+            tracker.close()
+
+
+if __name__ == "__main__":
+    main()
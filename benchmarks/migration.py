@@ -0,0 +1,133 @@
+"""Write latency while a large database from before schema versioning is upgraded.
+
+Builds a legacy database with ``synthetic.populate_legacy`` and upgrades a
+copy of it each way, while another connection keeps adding tasks:
+
+* ``blocking``: each backfill in a single transaction, the way upgrades
+  used to run;
+* ``online``: ``TaskTracker(backfill="background")``, one chunk at a time.
+
+It reports how long opening took (the schema steps, which hold the write
+lock in both modes), how long the backfills took, and the writer's latency
+and failed writes while they ran.
+
+    python3 benchmarks/migration.py --tasks 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import migrations
+from synthetic import populate_legacy
+from task_tracker import BACKFILLS, TaskTracker
+
+
+class Writer(threading.Thread):
+    """Adds a task every ``interval`` seconds and records how long each took."""
+
+    def __init__(self, db_path: str, interval: float):
+        super().__init__(daemon=True)
+        self.tracker = TaskTracker(db_path, backfill="off")
+        self.interval = interval
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.stop = threading.Event()
+
+    def run(self) -> None:
+        while not self.stop.wait(self.interval):
+            started = time.perf_counter()
+            try:
+                self.tracker.add_task("written during the migration", due_date="2024-06-01")
+            except sqlite3.OperationalError:
+                self.errors += 1
+            self.latencies.append(time.perf_counter() - started)
+
+    def finish(self) -> Dict[str, object]:
+        self.stop.set()
+        self.join()
+        self.tracker.close()
+        ordered = sorted(self.latencies)
+        return {
+            "writes": len(ordered),
+            "failed_writes": self.errors,
+            "write_p99_ms": round(ordered[int(len(ordered) * 0.99)] * 1000, 2) if ordered else None,
+            "write_max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+            "write_median_ms": round(statistics.median(ordered) * 1000, 2) if ordered else None,
+        }
+
+
+def upgrade(db_path: str, mode: str, interval: float = 0.005) -> Dict[str, object]:
+    """Upgrade the database at ``db_path`` in ``mode`` and time it."""
+    started = time.perf_counter()
+    tracker = TaskTracker(db_path, backfill="off" if mode == "blocking" else "background")
+    opened = time.perf_counter()
+    writer = Writer(db_path, interval)
+    writer.start()
+    if mode == "blocking":
+        whole = {
+            name: migrations.Backfill(name, backfill.step, backfill.table, chunk_size=2 ** 62)
+            for name, backfill in BACKFILLS.items()
+        }
+        with tracker._write_lock:
+            while migrations.run_chunk(tracker.conn, whole):
+                pass
+    else:
+        while any(backfill["finished"] is None for backfill in tracker.backfill_progress()):
+            time.sleep(0.01)
+    backfill_seconds = time.perf_counter() - opened
+    result = writer.finish()
+    tracker.close()
+    result.update(
+        mode=mode,
+        open_seconds=round(opened - started, 3),
+        backfill_seconds=round(backfill_seconds, 3),
+    )
+    return result
+
+
+def run(tasks: int, seed: int = 0, db_dir: Optional[str] = None) -> Dict[str, object]:
+    """Build one legacy database of ``tasks`` tasks and upgrade a copy each way."""
+    with tempfile.TemporaryDirectory(dir=db_dir) as tmp:
+        legacy = os.path.join(tmp, "legacy.db")
+        populate_legacy(legacy, tasks, seed)
+        results = []
+        for mode in ("blocking", "online"):
+            path = os.path.join(tmp, f"{mode}.db")
+            shutil.copy(legacy, path)
+            results.append(upgrade(path, mode))
+    return {"tasks": tasks, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    report = run(args.tasks, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.tasks} tasks")
+    print(f"{'mode':>8} {'open s':>7} {'backfill s':>10} {'writes':>7} {'failed':>7} {'p99 ms':>8} {'max ms':>8}")
+    for r in report["results"]:
+        print(
+            f"{r['mode']:>8} {r['open_seconds']:>7} {r['backfill_seconds']:>10} {r['writes']:>7}"
+            f" {r['failed_writes']:>7} {r['write_p99_ms']!s:>8} {r['write_max_ms']!s:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Requests/sec of the pre-forked server by number of worker processes.
+
+Starts ``main.py --workers N`` for each N given against the same
+pre-populated database and drives the index page from several client
+processes, so the load generator is not limited to one core either.
+Throughput should grow with N up to the number of cores.
+
+    python3 benchmarks/prefork_scaling.py --workers 1 2 4 8 --clients 64 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from asgi_vs_wsgi import drive, wait_for_port
+from synthetic import populate
+
+
+def drive_from(port: int, clients: int, seconds: float, processes: int) -> dict:
+    """Run ``drive`` in several processes and combine the results."""
+    per_process = max(1, clients // processes)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(drive, [(port, per_process, seconds)] * processes)
+    p99s = [r["p99_ms"] for r in results if r["p99_ms"] is not None]
+    return {
+        "requests_per_sec": sum(r["requests_per_sec"] for r in results),
+        "p99_ms": max(p99s) if p99s else None,
+        "errors": sum(r["errors"] for r in results),
+    }
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cores}))
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--driver-processes", type=int, default=cores)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--asgi", action="store_true", help="Pre-fork the ASGI app instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        populate(os.path.join(tmp, "tasks.db"), args.tasks)
+        env = dict(os.environ, PORT=str(args.port), PYTHONPATH=str(ROOT))
+        print(f"{cores} cores")
+        print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'p99 ms':>8} {'errors':>7}")
+        baseline = None
+        for workers in args.workers:
+            server = subprocess.Popen(
+                [sys.executable, str(ROOT / "main.py"), "--workers", str(workers)]
+                + (["--asgi"] if args.asgi else []),
+                cwd=tmp,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(args.port)
+                # let every worker open its tracker before measuring
+                drive_from(args.port, args.clients, 1.0, args.driver_processes)
+                result = drive_from(args.port, args.clients, args.seconds, args.driver_processes)
+            finally:
+                server.terminate()
+                server.wait()
+            rate = result["requests_per_sec"]
+            baseline = baseline or rate or None
+            speedup = f"{rate / baseline:.2f}x" if baseline else "-"
+            p99 = f"{result['p99_ms']:.1f}" if result["p99_ms"] is not None else "-"
+            print(f"{workers:>7} {rate:>8.0f} {speedup:>8} {p99:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
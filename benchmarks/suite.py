@@ -0,0 +1,217 @@
+"""Benchmark suite for TaskTracker operations and the Flask routes.
+
+Builds a synthetic database per size (see synthetic.py), times every
+tracker operation and web route, and writes the results as JSON so that
+runs from different commits can be compared.
+
+    python3 benchmarks/suite.py --sizes 10000 1000000 --output bench.json
+    python3 benchmarks/suite.py --sizes 10000 --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic import generate_tasks
+from task_tracker import TaskTracker
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Call ``func`` ``repeat`` times and summarize the wall times in ms."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean_ms": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+def tracker_cases(tracker: TaskTracker, size: int) -> Dict[str, Callable[[], object]]:
+    """Operations to time, keyed by a stable name used to compare runs."""
+    deep_cursor = None
+    for _ in range(min(50, size // 10)):
+        _, deep_cursor, _ = tracker.list_tasks_page(show_all=True, limit=10, after=deep_cursor)
+    counter = iter(range(10**9))
+
+    def next_id() -> int:
+        return next(counter) % size + 1
+
+    return {
+        "list_tasks.priority.page1": lambda: tracker.list_tasks(show_all=True, limit=10),
+        "list_tasks.due_asc.page1": lambda: tracker.list_tasks(
+            show_all=True, sort_by="due", ascending=True, limit=10
+        ),
+        "list_tasks.open.page1": lambda: tracker.list_tasks(limit=10),
+        "list_tasks.status.page1": lambda: tracker.list_tasks(
+            show_all=True, status="in progress", limit=10
+        ),
+        "list_tasks.offset_page50": lambda: tracker.list_tasks(
+            show_all=True, limit=10, offset=min(490, size - 10)
+        ),
+        "list_tasks_page.cursor_page50": lambda: tracker.list_tasks_page(
+            show_all=True, limit=10, after=deep_cursor
+        ),
+        "list_tasks.search": lambda: tracker.list_tasks(show_all=True, search="budget", limit=10),
+        "list_tasks.search_relevance": lambda: tracker.list_tasks(
+            show_all=True, search="review budget", sort_by="relevance", limit=10
+        ),
+        "count_tasks.all": lambda: tracker.count_tasks(show_all=True),
+        "count_tasks.open": lambda: tracker.count_tasks(),
+        "count_tasks.status": lambda: tracker.count_tasks(show_all=True, status="done"),
+        "count_tasks.search": lambda: tracker.count_tasks(show_all=True, search="budget"),
+        "summary": lambda: tracker.summary(today="2024-06-01"),
+        "get_task": lambda: tracker.get_task(next_id()),
+        "add_task": lambda: tracker.add_task("benchmark task", priority=3, due_date="2024-06-01"),
+        "update_task": lambda: tracker.update_task(next_id(), priority=2, comment="touched"),
+        "mark_done": lambda: tracker.mark_done(next_id()),
+    }
+
+
+def route_cases(client, size: int) -> Dict[str, Callable[[], object]]:
+    """Flask routes to time through the test client."""
+    counter = iter(range(10**9))
+
+    def next_id() -> int:
+        return next(counter) % size + 1
+
+    return {
+        "GET /": lambda: client.get("/"),
+        "GET /?sort=due_asc": lambda: client.get("/?sort=due_asc"),
+        "GET /?q=budget": lambda: client.get("/?q=budget"),
+        "GET /?status=in progress": lambda: client.get("/?status=in+progress"),
+        "GET /edit/<id>": lambda: client.get(f"/edit/{next_id()}"),
+        "POST /add": lambda: client.post("/add", data={"description": "bench", "priority": "2"}),
+        "POST /comment/<id>": lambda: client.post(
+            f"/comment/{next_id()}", data={"comment": "bench", "color": "#ffffff"}
+        ),
+        "GET /api/tasks": lambda: client.get("/api/tasks?limit=50"),
+    }
+
+
+def run_size(size: int, repeat: int, seed: int, db_dir: str) -> List[dict]:
+    import web_app
+
+    db_path = os.path.join(db_dir, f"bench-{size}.db")
+    results = []
+    started = time.perf_counter()
+    loader = TaskTracker(db_path)
+    loader.bulk_add(generate_tasks(size, seed), batch_size=10_000)
+    loader.close()
+    load_seconds = time.perf_counter() - started
+    results.append(
+        {
+            "size": size,
+            "kind": "load",
+            "name": "bulk_add",
+            "seconds": load_seconds,
+            "rows_per_sec": size / load_seconds,
+        }
+    )
+
+    tracker = TaskTracker(db_path)
+    for name, case in tracker_cases(tracker, size).items():
+        case()  # warm up caches and the statement cache
+        results.append({"size": size, "kind": "tracker", "name": name, **measure(case, repeat)})
+    tracker.close()
+
+    # measure the database work behind each route, not the result cache
+    web_app.tracker = TaskTracker(db_path, pooled=True)
+    web_app.app.config.update({"TESTING": True})
+    with web_app.app.test_client() as client:
+        for name, case in route_cases(client, size).items():
+            case()
+            results.append({"size": size, "kind": "route", "name": name, **measure(case, repeat)})
+    web_app.tracker.close()
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def run(sizes: List[int], repeat: int, seed: int, db_dir: Optional[str] = None) -> dict:
+    """Run the whole suite and return the JSON-serializable report."""
+    with tempfile.TemporaryDirectory(dir=db_dir) as tmp:
+        results = []
+        for size in sizes:
+            results.extend(run_size(size, repeat, seed, tmp))
+    return {"environment": environment(), "seed": seed, "results": results}
+
+
+def compare(report: dict, baseline: dict) -> List[str]:
+    """Describe the median time change of each result present in both runs."""
+    before = {
+        (r["size"], r["name"]): r["median_ms"] for r in baseline["results"] if "median_ms" in r
+    }
+    lines = []
+    for result in report["results"]:
+        old = before.get((result["size"], result["name"]))
+        if old is None or "median_ms" not in result:
+            continue
+        ratio = result["median_ms"] / old if old else float("inf")
+        flag = "  REGRESSION" if ratio > 1.2 else ""
+        lines.append(
+            f"{result['size']:>10} {result['name']:<34} {old:>9.3f} -> "
+            f"{result['median_ms']:>9.3f} ms ({ratio:.2f}x){flag}"
+        )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per case")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed")
+    parser.add_argument("--db-dir", help="Directory for the temporary databases")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare medians against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.seed, args.db_dir)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
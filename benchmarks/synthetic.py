@@ -0,0 +1,89 @@
+"""Synthetic task data with realistic distributions for the benchmarks.
+
+Most tasks are low priority and open, due dates cluster around "today"
+with a long tail (and a quarter have none), and descriptions draw from a
+skewed vocabulary so searches hit a realistic share of rows.
+"""
+import datetime
+import random
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from task_tracker import TaskTracker
+
+# Fixed so that generated data, and therefore timings, are reproducible.
+REFERENCE_DATE = datetime.date(2024, 6, 1)
+
+PRIORITIES = [1, 2, 3, 4, 5]
+PRIORITY_WEIGHTS = [30, 30, 20, 12, 8]
+STATUSES = ["not started", "in progress", "done"]
+STATUS_WEIGHTS = [55, 25, 20]
+VERBS = ["fix", "write", "review", "call", "plan", "update", "email", "buy", "test", "deploy"]
+NOUNS = [
+    "report", "invoice", "meeting", "budget", "release", "client", "server", "docs",
+    "roadmap", "groceries", "contract", "dashboard", "backlog", "migration", "survey",
+]
+COLORS = ["", "", "", "#ffdddd", "#ddffdd", "#ddddff"]
+
+
+def generate_tasks(count: int, seed: int = 0) -> Iterator[Dict[str, object]]:
+    """Yield ``count`` task dicts accepted by TaskTracker.bulk_add."""
+    rng = random.Random(seed)
+    # Zipf-like word weights: a few words are very common
+    verb_weights = [1 / (rank + 1) for rank in range(len(VERBS))]
+    noun_weights = [1 / (rank + 1) for rank in range(len(NOUNS))]
+    for i in range(count):
+        if rng.random() < 0.25:
+            due = None
+        else:
+            offset = int(rng.gauss(0, 30)) if rng.random() < 0.8 else rng.randint(-365, 365)
+            due = (REFERENCE_DATE + datetime.timedelta(days=offset)).isoformat()
+        verb = rng.choices(VERBS, verb_weights)[0]
+        noun = rng.choices(NOUNS, noun_weights)[0]
+        yield {
+            "description": f"{verb.capitalize()} {noun} #{i}",
+            "priority": rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            "due_date": due,
+            "status": rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+            "comment": f"follow up on {rng.choice(NOUNS)}" if rng.random() < 0.2 else "",
+            "color": rng.choice(COLORS),
+        }
+
+
+def populate(db_path: str, count: int, seed: int = 0) -> None:
+    """Create a database at ``db_path`` holding ``count`` synthetic tasks."""
+    tracker = TaskTracker(db_path)
+    tracker.bulk_add(generate_tasks(count, seed), batch_size=10_000)
+    tracker.close()
+
+
+def populate_legacy(db_path: str, count: int, seed: int = 0) -> None:
+    """Create a database from before schema versioning holding ``count`` tasks.
+
+    It has no status column, only the done flag, and one due date in ten
+    is stored in the compact YYYYMMDD form, so opening it runs every
+    migration and every backfill.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL,"
+        " priority INTEGER NOT NULL DEFAULT 1, due_date TEXT, done INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.executemany(
+        "INSERT INTO tasks(description, priority, due_date, done) VALUES (?, ?, ?, ?)",
+        (
+            (
+                task["description"],
+                task["priority"],
+                task["due_date"].replace("-", "") if task["due_date"] and i % 10 == 0 else task["due_date"],
+                int(task["status"] == "done"),
+            )
+            for i, task in enumerate(generate_tasks(count, seed))
+        ),
+    )
+    conn.commit()
+    conn.close()
@@ -0,0 +1,317 @@
+"""Tasks held in columnar arrays for sorting and filtering in memory.
+
+Each column is a typed array with one slot per task: integers for ids and
+priorities, date ordinals for due dates, and codes into a pool that stores
+every distinct text value (descriptions, comments, colors, statuses,
+projects) once. Every sort order keeps a permutation of the slots sorted
+by its key. A page is read by walking that permutation through the filters
+and stopping once the page is full, so no query sorts the tasks.
+"""
+import bisect
+import datetime
+import sys
+from array import array
+from itertools import compress, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Date ordinals start at 1, so 0 stands for a NULL due date.
+NO_DUE = 0
+MIN_DUE = datetime.date.min.toordinal()
+MAX_DUE = datetime.date.max.toordinal()
+
+
+def _due_ordinal(value: Optional[str]) -> Tuple[int, Optional[str]]:
+    """Return (ordinal, leftover) for a due date.
+
+    Dates that are not ISO YYYY-MM-DD strings cannot be stored as ordinals.
+    They sort like a missing due date and are returned as the leftover to
+    be kept as text.
+    """
+    if value is None:
+        return NO_DUE, None
+    try:
+        day = datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return NO_DUE, value
+    if day.isoformat() != value:
+        return NO_DUE, value
+    return day.toordinal(), None
+
+
+def _equal(slots: Iterable[int], column: array, code: int) -> Iterator[int]:
+    return (s for s in slots if column[s] == code)
+
+
+class _Pool:
+    """Distinct text values, each referenced by a code; code 0 is None."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        """Return the code of ``value`` without adding it, or None."""
+        return self._codes.get(value)
+
+    def containing(self, needle: str) -> Set[int]:
+        """Codes of the values containing ``needle``, ignoring case."""
+        needle = needle.lower()
+        return {
+            code
+            for code, value in enumerate(self.values)
+            if value is not None and needle in value.lower()
+        }
+
+
+class ColumnStore:
+    def __init__(self):
+        self.ids = array("q")  # 0 marks a free slot
+        self.priority = array("q")
+        self.due = array("i")
+        self.done = array("b")
+        self.status = array("I")
+        self.project = array("I")
+        self.description = array("I")
+        self.comment = array("I")
+        self.color = array("I")
+        self._columns = (
+            self.ids, self.priority, self.due, self.done, self.status,
+            self.project, self.description, self.comment, self.color,
+        )
+        self._text = _Pool()
+        # due dates that are not ISO dates, by slot
+        self._odd_due: Dict[int, str] = {}
+        # slot + 1 of every task, indexed by id; ids are dense, so this is
+        # far smaller than a dict
+        self._slot_of = array("i")
+        self._free: List[int] = []
+        self._keys: Dict[str, Callable[[int], tuple]] = self._sort_keys()
+        # permutations of the live slots, built on first use per order
+        self._orders: Dict[str, array] = {}
+        # running totals per (status code, done), like task_counts
+        self._counts: Dict[Tuple[int, int], int] = {}
+        # change log sequence the contents reflect
+        self.seq = 0
+
+    def _sort_keys(self) -> Dict[str, Callable[[int], tuple]]:
+        """Slot sort keys matching task_tracker.SORT_KEYS, NULL placement included."""
+        ids, priority, due = self.ids, self.priority, self.due
+        return {
+            # COALESCE(due_date, '') sorts a missing date first
+            "priority_desc": lambda s: (-priority[s], due[s], ids[s]),
+            "priority_asc": lambda s: (priority[s], due[s], ids[s]),
+            "due_asc": lambda s: (due[s] or MAX_DUE, -priority[s], ids[s]),
+            "due_desc": lambda s: (-(due[s] or MIN_DUE), -priority[s], -ids[s]),
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids) - len(self._free)
+
+    def _slot(self, task_id: int) -> Optional[int]:
+        if task_id >= len(self._slot_of):
+            return None
+        return self._slot_of[task_id] - 1 if self._slot_of[task_id] else None
+
+    def _live_slots(self) -> Iterator[int]:
+        return compress(range(len(self.ids)), self.ids)
+
+    def _order(self, name: str) -> array:
+        order = self._orders.get(name)
+        if order is None:
+            order = self._orders[name] = array(
+                "i", sorted(self._live_slots(), key=self._keys[name])
+            )
+        return order
+
+    def _link(self, slot: int) -> None:
+        for name, order in self._orders.items():
+            bisect.insort(order, slot, key=self._keys[name])
+
+    def _unlink(self, slot: int) -> None:
+        for name, order in self._orders.items():
+            key = self._keys[name]
+            del order[bisect.bisect_left(order, key(slot), key=key)]
+
+    def upsert(
+        self,
+        id: int,
+        description: str,
+        priority: int,
+        due_date: Optional[str],
+        done: int,
+        status: str,
+        comment: Optional[str],
+        color: Optional[str],
+        project: str,
+    ) -> None:
+        """Add or replace a task; arguments follow task_tracker.EXPORT_FIELDS."""
+        due, odd_due = _due_ordinal(due_date)
+        slot = self._slot(id)
+        if slot is None:
+            slot = self._allocate(id)
+            moved = True
+        else:
+            moved = self.priority[slot] != priority or self.due[slot] != due
+            if moved:
+                self._unlink(slot)
+            self._tally(slot, -1)
+        self.priority[slot] = priority
+        self.due[slot] = due
+        self.done[slot] = done
+        self.status[slot] = self._text.code(status)
+        self.project[slot] = self._text.code(project)
+        self.description[slot] = self._text.code(description)
+        self.comment[slot] = self._text.code(comment)
+        self.color[slot] = self._text.code(color)
+        if odd_due is None:
+            self._odd_due.pop(slot, None)
+        else:
+            self._odd_due[slot] = odd_due
+        self._tally(slot, 1)
+        if moved:
+            self._link(slot)
+
+    def _tally(self, slot: int, change: int) -> None:
+        key = (self.status[slot], self.done[slot])
+        self._counts[key] = self._counts.get(key, 0) + change
+
+    def _allocate(self, task_id: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.ids)
+            for column in self._columns:
+                column.append(0)
+        self.ids[slot] = task_id
+        if task_id >= len(self._slot_of):
+            grow = max(task_id + 1, 2 * len(self._slot_of)) - len(self._slot_of)
+            self._slot_of.frombytes(bytes(grow * self._slot_of.itemsize))
+        self._slot_of[task_id] = slot + 1
+        return slot
+
+    def remove(self, task_id: int) -> None:
+        """Drop a task if present."""
+        slot = self._slot(task_id)
+        if slot is None:
+            return
+        self._unlink(slot)
+        self._tally(slot, -1)
+        self._slot_of[task_id] = 0
+        self._odd_due.pop(slot, None)
+        # free slots count as done with no status or project, so filters
+        # need no separate live check
+        for column in self._columns:
+            column[slot] = 0
+        self.done[slot] = 1
+        self._free.append(slot)
+
+    def _filter(
+        self,
+        slots: Iterable[int],
+        show_all: bool,
+        status: Optional[str],
+        project: Optional[str],
+        ids: Optional[Set[int]],
+        text: Optional[str],
+    ) -> Optional[Iterator[int]]:
+        """Narrow ``slots`` to the matching tasks, or None if none can match."""
+        if not show_all:
+            done = self.done
+            slots = (s for s in slots if not done[s])
+        for value, column in ((status, self.status), (project, self.project)):
+            if value is None:
+                continue
+            code = self._text.find(value)
+            if code is None:
+                return None
+            slots = _equal(slots, column, code)
+        if ids is not None:
+            task_ids = self.ids
+            slots = (s for s in slots if task_ids[s] in ids)
+        if text:
+            # test each distinct text once rather than once per task
+            codes = self._text.containing(text)
+            description, comment = self.description, self.comment
+            slots = (s for s in slots if description[s] in codes or comment[s] in codes)
+        return iter(slots)
+
+    def select(
+        self,
+        order: str,
+        show_all: bool = False,
+        status: Optional[str] = None,
+        project: Optional[str] = None,
+        ids: Optional[Set[int]] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> List[int]:
+        """Return the slots of a page of matching tasks in ``order``.
+
+        ``ids`` keeps only those task ids and ``text`` only tasks whose
+        description or comment contains it, ignoring case.
+        """
+        slots = self._filter(self._order(order), show_all, status, project, ids, text)
+        if slots is None:
+            return []
+        start = offset or 0
+        return list(islice(slots, start, None if limit is None else start + limit))
+
+    def count(
+        self,
+        show_all: bool = False,
+        status: Optional[str] = None,
+        project: Optional[str] = None,
+        ids: Optional[Set[int]] = None,
+        text: Optional[str] = None,
+    ) -> int:
+        """Return the number of matching tasks; filters as for select."""
+        if ids is None and not text and project is None:
+            code = None if status is None else self._text.find(status)
+            if status is not None and code is None:
+                return 0
+            return sum(
+                n
+                for (status_code, done), n in self._counts.items()
+                if (show_all or not done) and (code is None or status_code == code)
+            )
+        slots = self._filter(self._live_slots(), show_all, status, project, ids, text)
+        return 0 if slots is None else sum(1 for _ in slots)
+
+    def _due_text(self, slot: int) -> Optional[str]:
+        day = self.due[slot]
+        if day:
+            return datetime.date.fromordinal(day).isoformat()
+        return self._odd_due.get(slot)
+
+    def rows(self, slots: Sequence[int], fields: Sequence[str]) -> List[tuple]:
+        """Return the given fields of each slot, named as in EXPORT_FIELDS."""
+        text = self._text.values
+        getters = []
+        for field in fields:
+            if field == "due_date":
+                getters.append(self._due_text)
+            elif field in ("status", "project", "description", "comment", "color"):
+                column = getattr(self, field)
+                getters.append(lambda s, column=column: text[column[s]])
+            else:
+                getters.append(getattr(self, "ids" if field == "id" else field).__getitem__)
+        return [tuple(get(s) for get in getters) for s in slots]
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the columns, sort orders and text pool."""
+        arrays = self._columns + (self._slot_of,) + tuple(self._orders.values())
+        total = sum(column.buffer_info()[1] * column.itemsize for column in arrays)
+        values = self._text.values
+        total += sys.getsizeof(values) + sys.getsizeof(self._text._codes)
+        total += sum(sys.getsizeof(value) for value in values)
+        return total
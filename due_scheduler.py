@@ -0,0 +1,87 @@
+"""Due and overdue events for open tasks, evaluated incrementally.
+
+A DueScheduler remembers the day it last evaluated and how far it has read
+the change log. Moving to a later day reads only the tasks whose due date
+the clock passed, as ranges of the idx_tasks_open_due index of open tasks
+by due date. Tasks added, rescheduled or reopened onto a day already
+passed come from the change log. Neither rescans the table, so a poll costs
+about as much as the events it returns.
+"""
+import datetime
+from typing import List, Optional, Tuple
+
+# (kind, id, description, priority, due_date, status); kind is "due" on the
+# due date itself and "overdue" once it has passed.
+DueEvent = Tuple[str, int, str, int, str, str]
+
+_COLUMNS = "t.id, t.description, t.priority, t.due_date, t.status"
+
+
+class DueScheduler:
+    def __init__(self, tracker, today: Optional[str] = None):
+        """Start following ``tracker`` as of ``today`` (the local date by default).
+
+        Tasks already due or overdue then are not reported; see
+        TaskTracker.due_tasks for those.
+        """
+        self.tracker = tracker
+        self.day = self._date(today)
+        self.seq = tracker.last_change()
+
+    @staticmethod
+    def _date(today: Optional[str]) -> datetime.date:
+        return datetime.date.fromisoformat(today) if today else datetime.date.today()
+
+    def poll(self, today: Optional[str] = None) -> List[DueEvent]:
+        """Return the events since the last poll, advancing the clock to ``today``.
+
+        Changes to tasks are reported against the day of the last poll.
+        Moving to a later day then reports tasks due on that day as due and
+        those due from the previous day until then as overdue. The clock
+        never moves backwards.
+        """
+        old = self.day.isoformat()
+        new = max(self.day, self._date(today)).isoformat()
+        fetch = self.tracker._fetch
+        with self.tracker._reading() as conn:
+            # one read transaction, so every write is seen by exactly one of
+            # the change log read and the index ranges
+            began = not conn.in_transaction
+            if began:
+                conn.execute("BEGIN")
+            try:
+                seq = fetch(conn, "SELECT COALESCE(MAX(seq), 0) FROM task_changes", ())[0][0]
+                changed = fetch(
+                    conn,
+                    f"SELECT c.seq, {_COLUMNS} FROM task_changes c JOIN tasks t ON t.id = c.task_id"
+                    " WHERE c.seq > ? AND c.seq <= ? AND c.op IN ('insert', 'reschedule')"
+                    " AND t.done=0 AND t.due_date <= ? ORDER BY c.seq",
+                    (self.seq, seq, old),
+                )
+                overdue = due = []
+                if new > old:
+                    overdue = fetch(
+                        conn,
+                        f"SELECT {_COLUMNS} FROM tasks t WHERE done=0 AND due_date IS NOT NULL"
+                        " AND due_date >= ? AND due_date < ? ORDER BY due_date, id",
+                        (old, new),
+                    )
+                    due = fetch(
+                        conn,
+                        f"SELECT {_COLUMNS} FROM tasks t WHERE done=0 AND due_date IS NOT NULL"
+                        " AND due_date = ? ORDER BY id",
+                        (new,),
+                    )
+            finally:
+                if began:
+                    conn.commit()
+        events: List[DueEvent] = []
+        # a task changed several times is reported once
+        latest = {row[1]: row[1:] for row in changed}
+        for task in latest.values():
+            events.append(("overdue" if task[3] < old else "due",) + task)
+        events.extend(("overdue",) + task for task in overdue)
+        events.extend(("due",) + task for task in due)
+        self.seq = seq
+        self.day = datetime.date.fromisoformat(new)
+        return events
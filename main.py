@@ -1,6 +1,29 @@
-from web_app import app
+import argparse
 import os
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the task tracker web interface")
+    parser.add_argument(
+        "--asgi",
+        action="store_true",
+        help="Serve the asyncio (ASGI) app with uvicorn instead of the Flask server",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Serve from this many pre-forked processes (see prefork.py)",
+    )
+    args = parser.parse_args()
     port = int(os.getenv("PORT", 3000))
-    app.run(host="0.0.0.0", port=port)
+    if args.workers:
+        import prefork
+
+        prefork.main(["--port", str(port), "--workers", str(args.workers)] + (["--asgi"] if args.asgi else []))
+    elif args.asgi:
+        import uvicorn
+
+        uvicorn.run("asgi_app:app", host="0.0.0.0", port=port, log_level="warning")
+    else:
+        from web_app import app
+
+        app.run(host="0.0.0.0", port=port)
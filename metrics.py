@@ -0,0 +1,126 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+A Metrics registry holds counters and histograms, each a family of series
+told apart by their label values, plus gauges read from a callback when the
+metrics are rendered. Everything is thread-safe and dependency-free.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds, from half a millisecond to ten seconds.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0,
+)
+# Buckets for result sizes in rows.
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 1000, 10000, 100000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, help, buckets); counters have no buckets
+        self._families: Dict[str, Tuple[str, str, Sequence[float]]] = {}
+        self._series: Dict[str, Dict[Labels, object]] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[Labels, float]]]] = {}
+
+    def counter(self, name: str, help: str) -> None:
+        """Declare a counter family."""
+        self._declare(name, "counter", help, ())
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Declare a histogram family with the given upper bucket bounds."""
+        self._declare(name, "histogram", help, sorted(buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], Dict[Labels, float]]) -> None:
+        """Declare a gauge whose series ``read`` returns at render time."""
+        self._gauges[name] = (help, read)
+
+    def _declare(self, name: str, kind: str, help: str, buckets: Sequence[float]) -> None:
+        with self._lock:
+            self._families[name] = (kind, help, buckets)
+            self._series.setdefault(name, {})
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Add ``amount`` to a counter series."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record one observation in a histogram series."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._families[name][2])
+            histogram.observe(value)
+
+    def value(self, name: str, **labels: str) -> float:
+        """Return a counter's value, or a histogram's observation count."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name].get(key)
+        if isinstance(series, _Histogram):
+            return series.count
+        return series or 0
+
+    def render(self) -> str:
+        """Return every family in the Prometheus text format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help, _) in self._families.items():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, series in sorted(self._series[name].items()):
+                    if kind == "counter":
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(series)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(series.buckets + (math.inf,), series.counts):
+                        cumulative += count
+                        le = f'le="{_format_value(bound)}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {series.count}")
+        for name, (help, read) in self._gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(read().items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
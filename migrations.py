@@ -0,0 +1,179 @@
+"""Versioned schema migrations whose data backfills run in small transactions.
+
+Each Migration brings a database from ``version - 1`` to ``version``. Its
+``schema`` step runs when the database is opened, together with those of
+the other pending migrations, in one transaction that holds the write lock,
+so it should only change the schema. Work that grows with the number of
+rows belongs in a Backfill instead. Migrating an existing database records
+each of its backfills in ``schema_backfills``, and run_chunk then applies
+them ``chunk_size`` rowids at a time, each chunk in its own transaction
+that also saves how far the backfill got. Other connections read and write
+between chunks, and a backfill stopped by a crash carries on from its last
+committed chunk the next time it runs.
+"""
+import sqlite3
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# One row per backfill. Rowids up to done_id have been visited; rows past
+# end_id were written after the migration, by code that already writes the
+# new form, so the backfill stops there.
+BACKFILL_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_backfills (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        done_id INTEGER NOT NULL DEFAULT 0,
+        end_id INTEGER NOT NULL,
+        changed INTEGER NOT NULL DEFAULT 0,
+        started TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        finished TEXT
+    )
+"""
+
+BackfillStep = Union[str, Callable[[sqlite3.Connection, int, int], int]]
+
+
+class Backfill:
+    """A change applied to every existing row of ``table``, one rowid range at a time.
+
+    ``step`` is SQL run with ``:first`` and ``:last`` bound to the range, or
+    a function ``step(conn, first, last)`` returning how many rows it
+    changed. A chunk commits together with the backfill's progress, so it
+    runs exactly once, but rows may have been rewritten by newer code
+    since the migration and the step should leave those alone. With
+    ``needed`` given, the backfill is only scheduled on databases for which
+    ``needed(conn)`` is true after the migration's schema step.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        step: BackfillStep,
+        table: str = "tasks",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        needed: Optional[Callable[[sqlite3.Connection], bool]] = None,
+    ):
+        self.name = name
+        self.step = step
+        self.table = table
+        self.chunk_size = chunk_size
+        self.needed = needed
+
+    def apply(self, conn: sqlite3.Connection, first: int, last: int) -> int:
+        if callable(self.step):
+            return self.step(conn, first, last)
+        return conn.execute(self.step, {"first": first, "last": last}).rowcount
+
+
+class Migration:
+    """The schema step that brings a database to ``version``, and its backfills.
+
+    ``schema(conn, created)`` is told whether the tables were created in
+    the same transaction, in which case there is nothing to backfill.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        schema: Callable[[sqlite3.Connection, bool], None],
+        backfills: Sequence[Backfill] = (),
+    ):
+        self.version = version
+        self.schema = schema
+        self.backfills = tuple(backfills)
+
+
+def backfills_by_name(migrations: Sequence[Migration]) -> Dict[str, Backfill]:
+    return {backfill.name: backfill for migration in migrations for backfill in migration.backfills}
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[Migration], version: int, created: bool) -> int:
+    """Run the schema steps of the migrations after ``version`` and schedule their backfills.
+
+    The caller holds the write transaction and commits it. Returns the new
+    version, which the caller stores.
+    """
+    conn.execute(BACKFILL_TABLE)
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        migration.schema(conn, created)
+        if not created:
+            for backfill in migration.backfills:
+                _schedule(conn, backfill, migration.version)
+        version = migration.version
+    return version
+
+
+def _schedule(conn: sqlite3.Connection, backfill: Backfill, version: int) -> None:
+    if backfill.needed is not None and not backfill.needed(conn):
+        return
+    end_id = conn.execute(f"SELECT MAX(rowid) FROM {backfill.table}").fetchone()[0]
+    if end_id is None:
+        return
+    conn.execute(
+        "INSERT OR IGNORE INTO schema_backfills(name, version, end_id) VALUES (?, ?, ?)",
+        (backfill.name, version, end_id),
+    )
+
+
+def pending(conn: sqlite3.Connection) -> List[str]:
+    """Names of the backfills not yet finished, in the order they will run."""
+    try:
+        rows = conn.execute(
+            "SELECT name FROM schema_backfills WHERE finished IS NULL ORDER BY version, name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # databases never migrated by this module have no backfills
+        return []
+    return [row[0] for row in rows]
+
+
+def progress(conn: sqlite3.Connection) -> List[Dict[str, object]]:
+    """Every backfill's position, rows changed and start and finish times (UTC)."""
+    try:
+        cursor = conn.execute(
+            "SELECT name, version, done_id, end_id, changed, started, finished"
+            " FROM schema_backfills ORDER BY version, name"
+        )
+    except sqlite3.OperationalError:
+        return []
+    fields = [column[0] for column in cursor.description]
+    return [dict(zip(fields, row)) for row in cursor]
+
+
+def run_chunk(conn: sqlite3.Connection, backfills: Mapping[str, Backfill]) -> bool:
+    """Apply the next chunk of the first unfinished backfill and commit it.
+
+    Returns False, without writing, once every backfill has finished.
+    ``conn`` must not be inside a transaction.
+    """
+    if not pending(conn):
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # read again under the lock: another process may have moved it on
+        row = conn.execute(
+            "SELECT name, done_id, end_id FROM schema_backfills WHERE finished IS NULL"
+            " ORDER BY version, name LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            return False
+        name, done_id, end_id = row
+        if name not in backfills:
+            raise RuntimeError(f"no code for backfill {name!r}")
+        last = min(done_id + backfills[name].chunk_size, end_id)
+        changed = backfills[name].apply(conn, done_id + 1, last)
+        conn.execute(
+            "UPDATE schema_backfills SET done_id = :last, changed = changed + :changed,"
+            " finished = CASE WHEN :last >= end_id THEN strftime('%Y-%m-%d %H:%M:%f', 'now') END"
+            " WHERE name = :name",
+            {"last": last, "changed": max(changed, 0), "name": name},
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return True
@@ -0,0 +1,220 @@
+"""Pre-forking launcher: several worker processes serving one listening socket.
+
+The master binds the socket, forks the workers and restarts any that die.
+Workers import the app after the fork, so each opens its own TaskTracker
+and a reload runs the code currently on disk.
+
+    python3 main.py --workers 4
+    kill -HUP <master pid>   # start new workers, then drain and stop the old ones
+    kill -TERM <master pid>  # drain and stop every worker
+
+POSIX only, since it relies on fork.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+logger = logging.getLogger("prefork")
+
+# Seconds a stopping worker waits for requests in flight, including event
+# streams, before it exits anyway.
+GRACEFUL_TIMEOUT = 30
+# A worker that dies sooner than this after starting is restarted only after
+# the same delay, so one that cannot start does not fork in a tight loop.
+RESPAWN_DELAY = 1.0
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Return a listening socket for the workers to share."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # every worker is woken for each connection; the ones that lose the
+    # race to accept it must not block in accept()
+    sock.setblocking(False)
+    return sock
+
+
+def serve_wsgi(sock: socket.socket, graceful_timeout: float) -> None:
+    """Serve the Flask app on ``sock`` until SIGTERM, then drain requests in flight."""
+    from werkzeug.serving import make_server
+    from werkzeug.wsgi import ClosingIterator
+
+    import web_app
+
+    active = [0]
+    idle = threading.Condition()
+
+    def finished() -> None:
+        with idle:
+            active[0] -= 1
+            idle.notify_all()
+
+    def counted(environ, start_response):
+        with idle:
+            active[0] += 1
+        try:
+            return ClosingIterator(web_app.app(environ, start_response), finished)
+        except BaseException:
+            finished()
+            raise
+
+    host = sock.getsockname()[0]
+    server = make_server(host, sock.getsockname()[1], counted, threaded=True, fd=sock.fileno())
+
+    def stop(*_) -> None:
+        web_app.feed.close()
+        # shutdown() waits for serve_forever, which runs on this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    server.server_close()
+    with idle:
+        idle.wait_for(lambda: active[0] == 0, timeout=graceful_timeout)
+    web_app.tracker.close()
+
+
+def serve_asgi(sock: socket.socket, graceful_timeout: float) -> None:
+    """Serve the ASGI app on ``sock``; uvicorn drains on SIGTERM itself."""
+    import uvicorn
+
+    import web_app
+
+    class Server(uvicorn.Server):
+        def handle_exit(self, sig, frame) -> None:
+            web_app.feed.close()
+            super().handle_exit(sig, frame)
+
+    config = uvicorn.Config(
+        "asgi_app:app",
+        fd=sock.fileno(),
+        log_level="warning",
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+    Server(config).run()
+    web_app.tracker.close()
+
+
+class Master:
+    """Keeps ``workers`` processes running ``target(sock, graceful_timeout)``."""
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        target: Callable[[socket.socket, float], None],
+        workers: int,
+        graceful_timeout: float = GRACEFUL_TIMEOUT,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.sock = sock
+        self.target = target
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        # pid -> (generation, start time); a reload starts a new generation
+        self.children: Dict[int, tuple] = {}
+        self.generation = 0
+        self.stopping = False
+        self._signals: List[int] = []
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # Ctrl-C reaches the whole process group; the master decides
+            for signum in (signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            code = 0
+            try:
+                self.target(self.sock, self.graceful_timeout)
+            except BaseException:
+                logger.exception("worker %d failed", os.getpid())
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # never return into the master's loop
+                os._exit(code)
+        self.children[pid] = (self.generation, time.monotonic())
+        logger.info("worker %d started", pid)
+        return pid
+
+    def reload(self) -> None:
+        """Start a new set of workers, then stop the old ones."""
+        old = list(self.children)
+        self.generation += 1
+        for _ in range(self.workers):
+            self.spawn()
+        for pid in old:
+            self._kill(pid, signal.SIGTERM)
+
+    def stop(self) -> None:
+        self.stopping = True
+        for pid in self.children:
+            self._kill(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _kill(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            generation, started = self.children.pop(pid)
+            if self.stopping or generation != self.generation:
+                logger.info("worker %d stopped", pid)
+                continue
+            logger.warning("worker %d exited with status %d, restarting", pid, status)
+            if time.monotonic() - started < RESPAWN_DELAY:
+                time.sleep(RESPAWN_DELAY)
+            self.spawn()
+
+    def run(self) -> None:
+        """Supervise the workers until SIGTERM or SIGINT and every worker has stopped."""
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, _: self._signals.append(signum))
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children or not self.stopping:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP and not self.stopping:
+                    logger.info("reloading")
+                    self.reload()
+                elif signum in (signal.SIGTERM, signal.SIGINT):
+                    logger.info("stopping")
+                    self.stop()
+            self._reap()
+            time.sleep(0.1)
+        self.sock.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 3000)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--asgi", action="store_true", help="Serve the ASGI app with uvicorn")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(name)s %(process)d: %(message)s")
+    target = serve_asgi if args.asgi else serve_wsgi
+    Master(bind(args.host, args.port), target, args.workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
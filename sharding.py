@@ -0,0 +1,228 @@
+"""Tasks spread over several SQLite files, routed by project.
+
+Each project lives wholly in one shard, picked by a stable hash of its
+name, so writes for different projects go to different files and do not
+queue on one write lock. A task's id encodes its shard (``local_id *
+shards + shard``), so updates and deletes by id need no lookup. Lists and
+counts across projects query every shard in parallel and merge the results.
+"""
+import heapq
+import itertools
+import json
+import os
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from task_tracker import TaskTracker
+
+LAYOUT_FILE = "shards.json"
+
+
+class _Descending:
+    """Sort key wrapper that inverts the order of the wrapped value."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+def _merge_key(terms: Sequence[Tuple[str, str]]) -> Callable[[tuple], tuple]:
+    """Key ordering rows whose last ``len(terms)`` columns are the sort key."""
+    width = len(terms)
+    descending = [direction == "DESC" for _, direction in terms]
+
+    def key(row: tuple) -> tuple:
+        return tuple(
+            _Descending(value) if desc else value
+            for value, desc in zip(row[-width:], descending)
+        )
+
+    return key
+
+
+class ShardedTaskTracker:
+    def __init__(
+        self,
+        directory: str,
+        shards: int = 4,
+        workers: Optional[int] = None,
+        **options,
+    ):
+        """Open (and if needed create) ``shards`` task databases in ``directory``.
+
+        ``options`` are passed to every shard's TaskTracker. The shard count
+        is recorded on creation, since ids and routing depend on it, and
+        reopening with a different count raises ValueError. Cross-shard
+        queries run on ``workers`` threads, one per shard by default.
+        """
+        os.makedirs(directory, exist_ok=True)
+        layout_path = os.path.join(directory, LAYOUT_FILE)
+        if os.path.exists(layout_path):
+            with open(layout_path) as fh:
+                recorded = json.load(fh)["shards"]
+            if recorded != shards:
+                raise ValueError(f"{directory} holds {recorded} shards, not {shards}")
+        else:
+            with open(layout_path, "w") as fh:
+                json.dump({"shards": shards}, fh)
+        self.directory = directory
+        self.shards = [
+            TaskTracker(os.path.join(directory, f"tasks-{i}.db"), **options) for i in range(shards)
+        ]
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or shards, thread_name_prefix="task-shard"
+        )
+
+    def shard_for(self, project: str) -> int:
+        """Return the index of the shard holding ``project``'s tasks."""
+        return zlib.crc32(project.encode()) % len(self.shards)
+
+    def _locate(self, task_id: int) -> Tuple[TaskTracker, int]:
+        """Return the shard and local id for a global task id."""
+        return self.shards[task_id % len(self.shards)], task_id // len(self.shards)
+
+    def _global_id(self, shard: int, local_id: int) -> int:
+        return local_id * len(self.shards) + shard
+
+    def _scatter(self, call: Callable[[TaskTracker], object]) -> List[object]:
+        """Run ``call`` on every shard in parallel and return the results in shard order."""
+        return list(self._executor.map(call, self.shards))
+
+    def add_task(
+        self,
+        description: str,
+        priority: int = 1,
+        due_date: Optional[str] = None,
+        status: str = "not started",
+        comment: str = "",
+        color: str = "",
+        project: str = "",
+    ) -> Union[int, Future]:
+        """Add a task to its project's shard and return its global id."""
+        shard = self.shard_for(project)
+        result = self.shards[shard].add_task(
+            description, priority, due_date, status, comment, color, project
+        )
+        if not isinstance(result, Future):
+            return self._global_id(shard, result)
+        # group commit: resolve to the global id once the shard commits
+        mapped: Future = Future()
+
+        def resolve(done: Future) -> None:
+            if done.exception() is not None:
+                mapped.set_exception(done.exception())
+            else:
+                mapped.set_result(self._global_id(shard, done.result()))
+
+        result.add_done_callback(resolve)
+        return mapped
+
+    def update_task(self, task_id: int, **fields) -> Optional[Future]:
+        """Update a task's fields; see TaskTracker.update_task."""
+        tracker, local_id = self._locate(task_id)
+        return tracker.update_task(local_id, **fields)
+
+    def mark_done(self, task_id: int) -> Optional[Future]:
+        tracker, local_id = self._locate(task_id)
+        return tracker.mark_done(local_id)
+
+    def delete_task(self, task_id: int) -> Optional[Future]:
+        """Delete a task permanently."""
+        tracker, local_id = self._locate(task_id)
+        return tracker.delete_task(local_id)
+
+    def get_task(self, task_id: int) -> Optional[Tuple[object, ...]]:
+        """Return (description, priority, due_date, status, comment, color) for a task."""
+        tracker, local_id = self._locate(task_id)
+        return tracker.get_task(local_id)
+
+    def get_task_record(self, task_id: int) -> Optional[Dict[str, object]]:
+        """Return every column of a task as a dict, with its global id."""
+        tracker, local_id = self._locate(task_id)
+        record = tracker.get_task_record(local_id)
+        if record is not None:
+            record["id"] = task_id
+        return record
+
+    def list_tasks(
+        self,
+        show_all: bool = False,
+        ascending: bool = False,
+        sort_by: str = "priority",
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        with_status: bool = False,
+        with_meta: bool = False,
+        project: Optional[str] = None,
+    ) -> List[tuple]:
+        """Return tasks like TaskTracker.list_tasks, with global ids.
+
+        With ``project`` only that project's shard is queried. Otherwise
+        every shard returns its first ``offset + limit`` matches in sort
+        order and the sorted streams are merged. Ties are broken by global
+        id. Relevance ranks are computed per shard, so with
+        ``sort_by="relevance"`` the merge is only approximate.
+        """
+        if project is not None:
+            shard = self.shard_for(project)
+            rows = self.shards[shard].list_tasks(
+                show_all, ascending, sort_by, search, status, limit, offset,
+                with_status, with_meta, project=project,
+            )
+            return [(self._global_id(shard, row[0]),) + tuple(row[1:]) for row in rows]
+        _, terms = self.shards[0]._sort_terms(sort_by, ascending, search)
+        per_shard = None if limit is None else limit + (offset or 0)
+
+        def fetch(tracker: TaskTracker) -> List[tuple]:
+            query, params = tracker._list_query(
+                show_all, ascending, sort_by, search, status, per_shard,
+                with_status=with_status, with_meta=with_meta, with_keys=True,
+            )
+            return tracker._query(query, params)
+
+        streams = []
+        for shard, rows in enumerate(self._scatter(fetch)):
+            # the trailing id sort term becomes the global id as well
+            streams.append(
+                (self._global_id(shard, row[0]),) + tuple(row[1:-1])
+                + (self._global_id(shard, row[-1]),)
+                for row in rows
+            )
+        merged: Iterator[tuple] = heapq.merge(*streams, key=_merge_key(terms))
+        stop = None if limit is None else (offset or 0) + limit
+        width = len(terms)
+        return [row[:-width] for row in itertools.islice(merged, offset or 0, stop)]
+
+    def count_tasks(
+        self,
+        show_all: bool = False,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        project: Optional[str] = None,
+    ) -> int:
+        """Return number of tasks matching the given filters across all shards."""
+        if project is not None:
+            return self.shards[self.shard_for(project)].count_tasks(
+                show_all, search, status, project
+            )
+        return sum(self._scatter(lambda tracker: tracker.count_tasks(show_all, search, status)))
+
+    def flush(self) -> None:
+        """Block until every shard has committed its queued changes."""
+        self._scatter(lambda tracker: tracker.flush())
+
+    def close(self) -> None:
+        """Close every shard and stop the query threads."""
+        self._executor.shutdown(wait=True)
+        for tracker in self.shards:
+            tracker.close()
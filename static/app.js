@@ -0,0 +1,89 @@
+function openComment(id, text, color){
+  var box=document.getElementById('commentBox');
+  box.style.display='block';
+  box.dataset.id=id;
+  document.getElementById('commentText').value=text||'';
+  document.getElementById('commentColor').value=color||'#ffffff';
+}
+function closeComment(){
+  document.getElementById('commentBox').style.display='none';
+}
+document.addEventListener('click',function(e){
+  var box=document.getElementById('commentBox');
+  if(box.style.display==='block' && !box.contains(e.target) && e.target.tagName!=='BUTTON'){
+    box.style.display='none';
+  }
+});
+function saveComment(){
+  var id=document.getElementById('commentBox').dataset.id;
+  var text=document.getElementById('commentText').value;
+  var color=document.getElementById('commentColor').value;
+  fetch('/comment/'+id,{method:'POST',headers:{'Content-Type':'application/x-www-form-urlencoded'},body:'comment='+encodeURIComponent(text)+'&color='+encodeURIComponent(color)}).then(closeComment);
+}
+// Row actions post in the background; the change feed patches the table.
+document.querySelector('tbody').addEventListener('submit',function(e){
+  var form=e.target;
+  if(form.method!=='post' || !window.EventSource){return;}
+  e.preventDefault();
+  fetch(form.action,{method:'POST',redirect:'manual'});
+});
+if(window.EventSource){
+  var feed=new EventSource('/events?since='+document.querySelector('tbody').dataset.seq);
+  feed.addEventListener('change',function(e){
+    var change=JSON.parse(e.data);
+    var row=document.getElementById('task-'+change.id);
+    if(change.row===null){
+      if(row){row.remove();}
+    }else if(row){
+      row.outerHTML=change.row;
+    }else if(change.op==='insert'){
+      document.getElementById('newTasks').style.display='block';
+    }
+    document.getElementById('summary').innerHTML=change.summary;
+  });
+  feed.addEventListener('reset',function(){window.location.reload();});
+}
+// Paging, sorting and filtering fetch only the table rows from /rows.
+function setPageLink(id, text, href){
+  var link=document.getElementById(id);
+  var pager=document.getElementById('pager');
+  if(!href){
+    if(link){link.remove();}
+    return;
+  }
+  if(!link){
+    link=document.createElement('a');
+    link.id=id;
+    link.textContent=text;
+    if(id==='prevPage'){pager.prepend(link, ' ');}else{pager.append(' ', link);}
+  }
+  link.href=href;
+}
+function showRows(url, push){
+  fetch('/rows'+new URL(url, location.href).search).then(function(r){return r.text();}).then(function(html){
+    var parsed=document.createElement('template');
+    parsed.innerHTML=html;
+    var rows=parsed.content.querySelector('tbody');
+    var body=document.querySelector('tbody');
+    body.innerHTML=rows.innerHTML;
+    setPageLink('prevPage', 'Previous', rows.dataset.prev);
+    setPageLink('nextPage', 'Next', rows.dataset.next);
+    if(push){history.pushState(null,'',url);}
+  });
+}
+if(window.fetch){
+  document.getElementById('pager').addEventListener('click',function(e){
+    if(e.target.tagName!=='A'){return;}
+    e.preventDefault();
+    showRows(e.target.href, true);
+  });
+  var filters=document.getElementById('filters');
+  var applyFilters=function(e){
+    if(e.type==='change' && e.target.tagName!=='SELECT'){return;}
+    e.preventDefault();
+    showRows('/?'+new URLSearchParams(new FormData(filters)).toString(), true);
+  };
+  filters.addEventListener('submit',applyFilters);
+  filters.addEventListener('change',applyFilters);
+  window.addEventListener('popstate',function(){showRows(location.href, false);});
+}
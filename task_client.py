@@ -0,0 +1,65 @@
+"""Lightweight CLI entry point that forwards commands to a running daemon.
+
+    python3 task_tracker.py --socket /tmp/tasks.sock serve &
+    TASK_TRACKER_SOCKET=/tmp/tasks.sock python3 task_client.py list -n 10
+
+Takes the same arguments as task_tracker.py but imports only what talking
+to the socket needs, so with ``task_tracker.py serve`` running a command
+costs little more than interpreter startup. Without a daemon, or for a
+command the daemon does not run, it falls back to task_tracker.py.
+"""
+import json
+import os
+import socket
+import sys
+from typing import Optional, Sequence
+
+
+def forward(socket_path: str, argv: Sequence[str]) -> Optional[int]:
+    """Run a CLI command on the daemon and return its exit code.
+
+    The command's output is copied to sys.stdout and sys.stderr. Returns
+    None when no daemon answers or it declines the command, in which case
+    the caller runs the command itself.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    with client, client.makefile("rw", encoding="utf-8", newline="\n") as stream:
+        stream.write(json.dumps({"cwd": os.getcwd(), "argv": list(argv)}) + "\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+            elif "refused" in message:
+                return None
+            else:
+                return message["exit"]
+    # The command may already have run, so it must not be retried.
+    print("error: task tracker daemon closed the connection", file=sys.stderr)
+    return 1
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    socket_path = os.getenv("TASK_TRACKER_SOCKET")
+    code = forward(socket_path, argv) if socket_path else None
+    if code is None:
+        import task_tracker
+
+        task_tracker.main(argv)
+        return
+    sys.stdout.flush()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
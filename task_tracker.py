@@ -1,50 +1,1461 @@
+import re
+import json
+import base64
+import bisect
 import sqlite3
 import argparse
-from typing import List, Tuple, Optional
+import atexit
+import contextlib
+import csv
+import datetime
+import functools
+import itertools
+import logging
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import migrations
+from column_store import ColumnStore
+from due_scheduler import DueScheduler
+from metrics import ROW_BUCKETS, Metrics
+from task_client import forward
 
 DB_FILE = "tasks.db"
 
+# Stored in PRAGMA user_version once _init_db has brought a database up to
+# date; bump it whenever MIGRATIONS gains a migration.
+SCHEMA_VERSION = 6
+
+logger = logging.getLogger(__name__)
+
+# Ordering for each (sort_by, ascending) pair as (expression, direction)
+# terms. The trailing id makes the order total so that pages are stable when
+# several tasks share a priority or due date.
+SORT_KEYS = {
+    ("priority", False): (("priority", "DESC"), ("COALESCE(due_date, '')", "ASC"), ("id", "ASC")),
+    ("priority", True): (("priority", "ASC"), ("COALESCE(due_date, '')", "ASC"), ("id", "ASC")),
+    ("due", True): (("COALESCE(due_date, '9999-12-31')", "ASC"), ("priority", "DESC"), ("id", "ASC")),
+    ("due", False): (("COALESCE(due_date, '0001-01-01')", "DESC"), ("priority", "DESC"), ("id", "DESC")),
+    # Best full-text match first; bm25 ranks are lower for better matches.
+    ("relevance", False): (("fts_rank", "ASC"), ("id", "ASC")),
+    ("relevance", True): (("fts_rank", "ASC"), ("id", "ASC")),
+}
+
+# One index per sort order whose leading columns match the ORDER BY terms
+# above exactly (scanned backwards where every direction is flipped), so
+# list_tasks never needs a temporary B-tree to sort. done and status trail
+# the key so the list filters are checked without visiting the table row.
+# idx_tasks_status serves counts of LIKE searches filtered by status.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_tasks_priority_desc"
+    " ON tasks(priority DESC, COALESCE(due_date, ''), id, done, status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_priority_asc"
+    " ON tasks(priority, COALESCE(due_date, ''), id, done, status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_due_asc"
+    " ON tasks(COALESCE(due_date, '9999-12-31'), priority DESC, id, done, status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_due_desc"
+    " ON tasks(COALESCE(due_date, '0001-01-01'), priority, id, done, status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, done)",
+    # Open tasks by due date, the queue behind due_tasks and DueScheduler.
+    # Being partial, it holds no done or undated tasks.
+    "CREATE INDEX IF NOT EXISTS idx_tasks_open_due ON tasks(due_date, id)"
+    " WHERE done=0 AND due_date IS NOT NULL",
+)
+
+# Full-text index over description and comment, stored as an external content
+# table so the text is not duplicated. The triggers keep it in step with every
+# write to tasks; updates only touch it when the indexed text changes.
+FTS_TABLE = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+    "description, comment, content='tasks', content_rowid='id', prefix='2 3')"
+)
+FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, description, comment)
+        VALUES (new.id, new.description, new.comment);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, description, comment)
+        VALUES ('delete', old.id, old.description, old.comment);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF description, comment ON tasks
+    WHEN old.description IS NOT new.description OR old.comment IS NOT new.comment BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, description, comment)
+        VALUES ('delete', old.id, old.description, old.comment);
+        INSERT INTO tasks_fts(rowid, description, comment)
+        VALUES (new.id, new.description, new.comment);
+    END
+    """,
+)
+# Running task totals kept up to date by triggers, so counts and the summary
+# never scan tasks. task_counts holds one row per (status, done) for
+# count_tasks; task_due_counts splits those by due date and priority for the
+# summary, keyed so that a due date range is a single index range.
+COUNT_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS task_counts (
+        status TEXT NOT NULL,
+        done INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (status, done)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task_due_counts (
+        done INTEGER NOT NULL,
+        due_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (done, due_date, status, priority)
+    ) WITHOUT ROWID
+    """,
+)
+# Tasks without a due date are counted under ''. While the task_counts
+# backfill is counting the tasks of an older database, changes to rows it has
+# not reached yet are left to it.
+COUNT_SKIP = (
+    "NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name = 'task_counts' AND finished IS NULL"
+    " AND {row}.id > done_id AND {row}.id <= end_id)"
+)
+COUNT_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_counts_insert AFTER INSERT ON tasks
+    WHEN {COUNT_SKIP.format(row="new")} BEGIN
+        INSERT INTO task_counts(status, done, n) VALUES (new.status, new.done, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+        INSERT INTO task_due_counts(done, due_date, status, priority, n)
+        VALUES (new.done, COALESCE(new.due_date, ''), new.status, new.priority, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_counts_delete AFTER DELETE ON tasks
+    WHEN {COUNT_SKIP.format(row="old")} BEGIN
+        UPDATE task_counts SET n = n - 1 WHERE status = old.status AND done = old.done;
+        UPDATE task_due_counts SET n = n - 1
+        WHERE done = old.done AND due_date = COALESCE(old.due_date, '')
+            AND status = old.status AND priority = old.priority;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_counts_update
+    AFTER UPDATE OF status, done, priority, due_date ON tasks
+    WHEN (old.status IS NOT new.status OR old.done IS NOT new.done
+        OR old.priority IS NOT new.priority OR old.due_date IS NOT new.due_date)
+        AND {COUNT_SKIP.format(row="old")} BEGIN
+        UPDATE task_counts SET n = n - 1 WHERE status = old.status AND done = old.done;
+        INSERT INTO task_counts(status, done, n) VALUES (new.status, new.done, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+        UPDATE task_due_counts SET n = n - 1
+        WHERE done = old.done AND due_date = COALESCE(old.due_date, '')
+            AND status = old.status AND priority = old.priority;
+        INSERT INTO task_due_counts(done, due_date, status, priority, n)
+        VALUES (new.done, COALESCE(new.due_date, ''), new.status, new.priority, 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    END
+    """,
+)
+# The task_counts backfill: adds one range of rowids to the totals.
+COUNT_BACKFILL = (
+    "INSERT INTO task_counts(status, done, n)"
+    " SELECT status, done, COUNT(*) FROM tasks WHERE id BETWEEN :first AND :last"
+    " GROUP BY status, done ON CONFLICT DO UPDATE SET n = n + excluded.n",
+    "INSERT INTO task_due_counts(done, due_date, status, priority, n)"
+    " SELECT done, COALESCE(due_date, ''), status, priority, COUNT(*) FROM tasks"
+    " WHERE id BETWEEN :first AND :last GROUP BY done, COALESCE(due_date, ''), status, priority"
+    " ON CONFLICT DO UPDATE SET n = n + excluded.n",
+)
+# What count_tasks and summary read in place of the totals until then.
+COUNT_SCANS = {
+    "task_counts": "(SELECT status, done, COUNT(*) AS n FROM tasks GROUP BY status, done)",
+    "task_due_counts": (
+        "(SELECT done, COALESCE(due_date, '') AS due_date, status, priority, COUNT(*) AS n"
+        " FROM tasks GROUP BY done, COALESCE(due_date, ''), status, priority)"
+    ),
+}
+# Change feed: one row per insert, update or delete of a task, written by
+# triggers in the same transaction. AUTOINCREMENT keeps seq increasing even
+# after old entries are trimmed, so readers can follow it with seq > ?.
+CHANGE_TABLE = """
+    CREATE TABLE IF NOT EXISTS task_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+"""
+CHANGE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS task_changes_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_changes(task_id, op) VALUES (new.id, 'insert');
+    END
+    """,
+    # 'reschedule' marks updates that move the due date or reopen the task
+    """
+    CREATE TRIGGER IF NOT EXISTS task_changes_update AFTER UPDATE ON tasks BEGIN
+        INSERT INTO task_changes(task_id, op) VALUES (
+            new.id,
+            CASE WHEN old.due_date IS NOT new.due_date OR old.done > new.done
+                THEN 'reschedule' ELSE 'update' END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_changes_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_changes(task_id, op) VALUES (old.id, 'delete');
+    END
+    """,
+)
+# Change log entries kept by trim_changes by default.
+CHANGE_LOG_KEEP = 10000
+# A write that leaves more than CHANGE_LOG_KEEP + CHANGE_LOG_SLACK entries in
+# the log schedules maintenance, see TaskTracker.maintain().
+CHANGE_LOG_SLACK = 1000
+TRIM_CHANGES_SQL = "DELETE FROM task_changes WHERE seq <= (SELECT MAX(seq) FROM task_changes) - ?"
+# The oldest entries past the newest CHANGE_LOG_KEEP, at most a chunk of them.
+TRIM_CHANGES_CHUNK_SQL = (
+    "DELETE FROM task_changes WHERE seq < (SELECT MIN(seq) FROM task_changes) + ?"
+    " AND seq <= (SELECT MAX(seq) FROM task_changes) - ?"
+)
+# Rows a maintenance step deletes in one transaction, and the pause between
+# steps when they run in the background.
+MAINTENANCE_CHUNK = 2000
+MAINTENANCE_PAUSE = 0.05
+MAINTENANCE_MODES = ("background", "off")
+# Changes read per query when bringing the column store up to date.
+COLUMN_SYNC_BATCH = 5000
+
+# Columns written by export_tasks and the export command, in order.
+EXPORT_FIELDS = (
+    "id", "description", "priority", "due_date", "done", "status", "comment", "color", "project",
+)
+
+# Audit history: one row per insert, update or delete of a task, written by
+# triggers in the same transaction. changes is a JSON object holding every
+# field for an insert, only the fields that changed for an update, and NULL
+# for a delete. Times are UTC. task_checkpoints holds a task's fields as of
+# a history seq, so its past state is its newest checkpoint by then plus its
+# entries after it. Tasks get one once compaction drops entries they need,
+# and tasks from before the history one as of its start. task_history_start
+# is the oldest seq, and time, that can still be reconstructed.
+HISTORY_FIELDS = EXPORT_FIELDS[1:]
+HISTORY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+HISTORY_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS task_history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        op TEXT NOT NULL,
+        changes TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_task_history_task ON task_history(task_id)",
+    """
+    CREATE TABLE IF NOT EXISTS task_checkpoints (
+        task_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        fields TEXT NOT NULL,
+        PRIMARY KEY (task_id, seq)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task_history_start (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL,
+        at TEXT NOT NULL
+    )
+    """,
+)
+# Unchanged fields are removed by path; '$._' names no field, so removing it
+# leaves the object as it is.
+HISTORY_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_history_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_history(task_id, op, changes) VALUES (
+            new.id, 'insert', json_object({", ".join(f"'{f}', new.{f}" for f in HISTORY_FIELDS)})
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_history_update AFTER UPDATE ON tasks
+    WHEN {" OR ".join(f"old.{f} IS NOT new.{f}" for f in HISTORY_FIELDS)} BEGIN
+        INSERT INTO task_history(task_id, op, changes) VALUES (
+            new.id,
+            'update',
+            json_remove(
+                json_object({", ".join(f"'{f}', new.{f}" for f in HISTORY_FIELDS)}),
+                {", ".join(f"CASE WHEN old.{f} IS new.{f} THEN '$.{f}' ELSE '$._' END" for f in HISTORY_FIELDS)}
+            )
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_history_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_history(task_id, op) VALUES (old.id, 'delete');
+    END
+    """,
+)
+# While the history_checkpoints backfill is working through the tasks from
+# before the history, the first change to one it has not reached yet
+# checkpoints the task as it was first.
+HISTORY_BASELINE_TRIGGERS = tuple(
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_history_baseline_{event.lower()} BEFORE {event} ON tasks
+    WHEN EXISTS (
+        SELECT 1 FROM schema_backfills WHERE name = 'history_checkpoints' AND finished IS NULL
+            AND old.id > done_id AND old.id <= end_id
+    ) AND NOT EXISTS (SELECT 1 FROM task_checkpoints WHERE task_id = old.id) BEGIN
+        INSERT INTO task_checkpoints(task_id, seq, fields) VALUES (
+            old.id,
+            (SELECT seq FROM task_history_start),
+            json_object({", ".join(f"'{f}', old.{f}" for f in HISTORY_FIELDS)})
+        );
+    END
+    """
+    for event in ("UPDATE", "DELETE")
+)
+HISTORY_BASELINE_SQL = f"""
+    INSERT OR IGNORE INTO task_checkpoints(task_id, seq, fields)
+    SELECT id, (SELECT seq FROM task_history_start),
+        json_object({", ".join(f"'{f}', {f}" for f in HISTORY_FIELDS)})
+    FROM tasks
+    WHERE id BETWEEN :first AND :last
+        AND NOT EXISTS (SELECT 1 FROM task_checkpoints WHERE task_id = tasks.id)
+"""
+HISTORY_BACKFILLS = ("history_checkpoints", "history_from_snapshot")
+# History kept by compact_history by default, in days.
+HISTORY_RETAIN_DAYS = 90
+
+INSERT_SQL = (
+    "INSERT INTO tasks(description, priority, due_date, done, status, comment, color, project)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Updates every column given a non-NULL value; parameters from _update_params.
+UPDATE_SQL = """
+    UPDATE tasks SET
+        description=COALESCE(?, description),
+        priority=COALESCE(?, priority),
+        due_date=COALESCE(?, due_date),
+        status=COALESCE(?, status),
+        done=CASE WHEN ? IS NULL THEN done WHEN ?='done' THEN 1 ELSE 0 END,
+        comment=COALESCE(?, comment),
+        color=COALESCE(?, color)
+    WHERE id=?
+"""
+
+
+def normalize_due_date(value: Optional[object]) -> Optional[str]:
+    """Return a due date as YYYY-MM-DD, or None when there is none.
+
+    Accepts dates and anything datetime.date.fromisoformat parses, so
+    stored dates always sort in date order. Raises ValueError otherwise.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.date):
+        return datetime.date(value.year, value.month, value.day).isoformat()
+    try:
+        return datetime.date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid due date {value!r}, expected YYYY-MM-DD") from None
+
+
+def _history_time(value: Union[str, datetime.datetime]) -> str:
+    """Format a time as stored in task_history.at, treating naive times as UTC."""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.strip())
+        except ValueError:
+            raise ValueError(f"Invalid time {value!r}, expected an ISO date or time") from None
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return value.strftime(HISTORY_TIME_FORMAT)[:-3]
+
+
+def _replay(tasks: Dict[int, Dict[str, object]], entries: Iterable[tuple]) -> None:
+    """Apply (task_id, op, changes) history entries to tasks keyed by id."""
+    for task_id, op, changes in entries:
+        if op == "delete":
+            tasks.pop(task_id, None)
+        elif op == "insert":
+            tasks[task_id] = {"id": task_id, **json.loads(changes)}
+        else:
+            tasks[task_id].update(json.loads(changes))
+
+
+def _insert_params(task: Mapping[str, object]) -> tuple:
+    """INSERT_SQL parameters for a mapping of add_task arguments."""
+    status = task.get("status") or "not started"
+    priority = task.get("priority")
+    return (
+        task["description"],
+        1 if priority in (None, "") else int(priority),
+        normalize_due_date(task.get("due_date")),
+        1 if status == "done" else 0,
+        status,
+        task.get("comment") or "",
+        task.get("color") or "",
+        task.get("project") or "",
+    )
+
+
+def _update_params(update: Mapping[str, object]) -> tuple:
+    """UPDATE_SQL parameters for a mapping of ``id`` plus update_task arguments."""
+    priority = update.get("priority")
+    status = update.get("status")
+    return (
+        update.get("description"),
+        None if priority is None else int(priority),
+        normalize_due_date(update.get("due_date")),
+        status,
+        status,
+        status,
+        update.get("comment"),
+        update.get("color"),
+        int(update["id"]),
+    )
+
+
+def _check_fields(fields: Sequence[str]) -> None:
+    unknown = set(fields) - set(EXPORT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+
+
+def _keyset_branches(
+    terms: Sequence[Tuple[str, str]], key: Sequence[object]
+) -> List[Tuple[str, List[object], Sequence[Tuple[str, str]]]]:
+    """Split "sorts after ``key``" into disjoint predicates, one per sort term.
+
+    Each predicate pins the leading terms to the key and moves past it on
+    the next one, so it is a single range seek on the matching sort index.
+    They are returned in sort order, all rows of one before the next, with
+    the terms left to order by (SQLite does not drop pinned expressions
+    from an ORDER BY and would sort the whole range otherwise).
+    """
+    branches = []
+    for i in reversed(range(len(terms))):
+        expr, direction = terms[i]
+        clauses = [f"{pinned} = ?" for pinned, _ in terms[:i]]
+        clauses.append(f"{expr} {'>' if direction == 'ASC' else '<'} ?")
+        branches.append((" AND ".join(clauses), list(key[: i + 1]), terms[i:]))
+    return branches
+
+
+def _keyset_predicate(
+    terms: Sequence[Tuple[str, str]], key: Sequence[object]
+) -> Tuple[str, List[object]]:
+    """Return a predicate matching rows that sort after ``key``.
+
+    Sort directions are mixed, so the row-value comparison is spelled out
+    term by term. The leading inclusive bound lets SQLite seek into the
+    index instead of scanning up to the cursor.
+    """
+    (expr, direction), value = terms[-1], key[-1]
+    clause = f"{expr} {'>' if direction == 'ASC' else '<'} ?"
+    params: List[object] = [value]
+    for (expr, direction), value in zip(reversed(terms[:-1]), reversed(key[:-1])):
+        op = ">" if direction == "ASC" else "<"
+        clause = f"{expr} {op} ? OR ({expr} = ? AND ({clause}))"
+        params = [value, value] + params
+    expr, direction = terms[0]
+    bound = ">=" if direction == "ASC" else "<="
+    return f"{expr} {bound} ? AND ({clause})", [key[0]] + params
+
+
+def _encode_cursor(sort_name: str, key: Sequence[object]) -> str:
+    payload = json.dumps([sort_name, list(key)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort_name: str, width: int) -> List[object]:
+    """Return the sort key of a cursor for ``sort_name``, whose key has ``width`` terms."""
+    try:
+        name, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid page cursor") from exc
+    if name != sort_name:
+        raise ValueError("Page cursor belongs to a different sort order")
+    # the key is bound into the keyset predicate term by term
+    if not (
+        isinstance(key, list)
+        and len(key) == width
+        and all(value is None or isinstance(value, (str, int, float)) for value in key)
+    ):
+        raise ValueError("Invalid page cursor")
+    return key
+
+
+# Connection settings. WAL lets readers carry on while a write commits,
+# synchronous=NORMAL only fsyncs at checkpoints (still crash safe in WAL mode),
+# busy_timeout waits for locks held by other processes instead of failing
+# and the memory map serves hot pages without read() calls.
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+READER_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+def _statement_shape(sql: str) -> str:
+    """Collapse a statement to one line with inlined page sizes replaced by ?."""
+    shape = " ".join(sql.split())
+    return re.sub(r"\b(LIMIT|OFFSET) -?\d+", r"\1 ?", shape)
+
+
+def _instrumented(rows: Optional[Callable[[object], int]] = None):
+    """Record a TaskTracker method's latency, errors and result size.
+
+    ``rows`` maps the method's return value to the number of rows it
+    returned (or wrote); without it only the latency is recorded.
+    """
+
+    def decorate(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                self.metrics.inc("task_tracker_call_errors_total", method=name)
+                raise
+            finally:
+                self.metrics.observe(
+                    "task_tracker_call_seconds", time.perf_counter() - started, method=name
+                )
+            if rows is not None:
+                self.metrics.observe("task_tracker_call_rows", rows(result), method=name)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def _add_columns(conn: sqlite3.Connection, columns: Sequence[Tuple[str, str]]) -> None:
+    """Add the (name, definition) columns that the tasks table lacks."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    for name, definition in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {definition}")
+
+
+def _schema_v1(conn: sqlite3.Connection, created: bool) -> None:
+    """The tasks table and its columns, the full-text index and the counts."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 1,
+            due_date TEXT,
+            done INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'not started',
+            comment TEXT,
+            color TEXT,
+            project TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    # a status column added here starts out 'not started' for done tasks
+    # too, until the status_from_done backfill reaches them
+    _add_columns(
+        conn,
+        (
+            ("due_date", "TEXT"),
+            ("status", "TEXT NOT NULL DEFAULT 'not started'"),
+            ("comment", "TEXT"),
+            ("color", "TEXT"),
+        ),
+    )
+    # Building the full-text index takes a scan of the tasks, but it cannot
+    # be split into chunks: the triggers must see every row already indexed.
+    # The migration's transaction keeps writers out meanwhile, so no write is
+    # missed or applied twice. The counts are filled in by the task_counts
+    # backfill instead.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'").fetchone()
+    try:
+        if not exists:
+            conn.execute(FTS_TABLE)
+            conn.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+        for statement in FTS_TRIGGERS:
+            conn.execute(statement)
+    except sqlite3.OperationalError:
+        # this SQLite build lacks FTS5; searches fall back to LIKE scans
+        pass
+    for statement in COUNT_TABLES + COUNT_TRIGGERS:
+        conn.execute(statement)
+
+
+def _schema_v2(conn: sqlite3.Connection, created: bool) -> None:
+    """Projects."""
+    _add_columns(conn, (("project", "TEXT NOT NULL DEFAULT ''"),))
+
+
+def _schema_v3(conn: sqlite3.Connection, created: bool) -> None:
+    """The change log."""
+    conn.execute(CHANGE_TABLE)
+    for statement in CHANGE_TRIGGERS:
+        conn.execute(statement)
+
+
+def _schema_v4(conn: sqlite3.Connection, created: bool) -> None:
+    """Change log updates that tell reschedules apart."""
+    conn.execute("DROP TRIGGER IF EXISTS task_changes_update")
+    for statement in CHANGE_TRIGGERS:
+        conn.execute(statement)
+
+
+def _schema_v5(conn: sqlite3.Connection, created: bool) -> None:
+    """Task history, starting now; the history_checkpoints backfill records the tasks as they are."""
+    for statement in HISTORY_TABLES + HISTORY_TRIGGERS + HISTORY_BASELINE_TRIGGERS:
+        conn.execute(statement)
+    conn.execute(
+        "INSERT OR IGNORE INTO task_history_start(id, seq, at) VALUES (1,"
+        " COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'task_history'), 0),"
+        " strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+    )
+
+
+def _schema_v6(conn: sqlite3.Connection, created: bool) -> None:
+    """Per-task checkpoints in place of whole-table history snapshots.
+
+    Databases whose history began from a task_snapshots copy start at the
+    oldest copy kept; the history_from_snapshot backfill splits it up.
+    """
+    for statement in HISTORY_TABLES + HISTORY_BASELINE_TRIGGERS:
+        conn.execute(statement)
+    if _table_exists(conn, "task_snapshots"):
+        conn.execute(
+            "INSERT OR IGNORE INTO task_history_start(id, seq, at)"
+            " SELECT 1, seq, at FROM task_snapshots ORDER BY seq LIMIT 1"
+        )
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return bool(
+        conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    )
+
+
+# The decoded task_snapshots copy being split up, as (seq, ids, rows).
+_snapshot_rows: Optional[Tuple[int, List[int], List[list]]] = None
+
+
+def _checkpoints_from_snapshot(conn: sqlite3.Connection, first: int, last: int) -> int:
+    """Checkpoint the tasks in a range of ids from the oldest task_snapshots copy.
+
+    The copy is decoded by the first chunk and kept for the others; the
+    last chunk also takes tasks deleted since with higher ids, then drops
+    the copies.
+    """
+    global _snapshot_rows
+    row = conn.execute("SELECT seq, tasks FROM task_snapshots ORDER BY seq LIMIT 1").fetchone()
+    if row is None:
+        return 0
+    seq, blob = row
+    if _snapshot_rows is None or _snapshot_rows[0] != seq:
+        rows = sorted(json.loads(zlib.decompress(blob)))
+        _snapshot_rows = (seq, [task[0] for task in rows], rows)
+    _, ids, rows = _snapshot_rows
+    end_id = conn.execute(
+        "SELECT end_id FROM schema_backfills WHERE name = 'history_from_snapshot'"
+    ).fetchone()[0]
+    upper = bisect.bisect_right(ids, last) if last < end_id else len(ids)
+    chunk = rows[bisect.bisect_left(ids, first):upper]
+    conn.executemany(
+        "INSERT OR IGNORE INTO task_checkpoints(task_id, seq, fields) VALUES (?, ?, ?)",
+        [(task[0], seq, json.dumps(dict(zip(HISTORY_FIELDS, task[1:])))) for task in chunk],
+    )
+    if last >= end_id:
+        conn.execute("DROP TABLE task_snapshots")
+        _snapshot_rows = None
+    return len(chunk)
+
+
+def _count_tasks(conn: sqlite3.Connection, first: int, last: int) -> int:
+    """Add a range of ids to the running totals; returns the tasks counted."""
+    for statement in COUNT_BACKFILL:
+        conn.execute(statement, {"first": first, "last": last})
+    return conn.execute("SELECT COUNT(*) FROM tasks WHERE id BETWEEN ? AND ?", (first, last)).fetchone()[0]
+
+
+def _normalize_due_dates(conn: sqlite3.Connection, first: int, last: int) -> int:
+    """Rewrite due dates in a range of tasks as YYYY-MM-DD where they parse as dates.
+
+    Dates that do not parse are left as they are, and are logged.
+    """
+    rows = conn.execute(
+        "SELECT id, due_date FROM tasks WHERE id BETWEEN ? AND ? AND due_date IS NOT NULL"
+        " AND due_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'",
+        (first, last),
+    ).fetchall()
+    changed = invalid = 0
+    for task_id, due_date in rows:
+        try:
+            normalized = normalize_due_date(due_date)
+        except ValueError:
+            invalid += 1
+            continue
+        conn.execute("UPDATE tasks SET due_date=? WHERE id=?", (normalized, task_id))
+        changed += 1
+    if invalid:
+        logger.warning("tasks %d-%d: %d keep due dates that are not dates", first, last, invalid)
+    return changed
+
+
+# Schema history, oldest first. Schema steps run while the database is
+# opened; the backfills then rewrite existing rows a chunk at a time (see
+# migrations.py). Indexes are kept in INDEXES instead and created after
+# the steps. Those and the full-text index are the only work on existing
+# rows done under the write lock.
+MIGRATIONS = (
+    migrations.Migration(
+        1,
+        _schema_v1,
+        [
+            migrations.Backfill(
+                "status_from_done",
+                "UPDATE tasks SET status='done'"
+                " WHERE id BETWEEN :first AND :last AND done=1 AND status<>'done'",
+            ),
+            # databases that already kept totals have rows in task_counts
+            migrations.Backfill(
+                "task_counts",
+                _count_tasks,
+                needed=lambda conn: not conn.execute("SELECT 1 FROM task_counts LIMIT 1").fetchone(),
+            ),
+        ],
+    ),
+    migrations.Migration(2, _schema_v2),
+    migrations.Migration(3, _schema_v3),
+    migrations.Migration(4, _schema_v4, [migrations.Backfill("normalize_due_dates", _normalize_due_dates)]),
+    migrations.Migration(5, _schema_v5, [migrations.Backfill("history_checkpoints", HISTORY_BASELINE_SQL)]),
+    migrations.Migration(
+        6,
+        _schema_v6,
+        [
+            migrations.Backfill(
+                "history_from_snapshot",
+                _checkpoints_from_snapshot,
+                needed=lambda conn: _table_exists(conn, "task_snapshots"),
+            )
+        ],
+    ),
+)
+BACKFILLS = migrations.backfills_by_name(MIGRATIONS)
+BACKFILL_MODES = ("now", "background", "off")
+
+
 class TaskTracker:
-    def __init__(self, db_path: str = DB_FILE, populate_dummy: bool = False):
+    def __init__(
+        self,
+        db_path: str = DB_FILE,
+        populate_dummy: bool = False,
+        pooled: bool = False,
+        pool_size: int = 8,
+        group_commit_ms: Optional[float] = None,
+        group_commit_ops: int = 100,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = None,
+        slow_query_ms: Optional[float] = None,
+        slow_log_size: int = 100,
+        snapshot: Optional[str] = None,
+        snapshot_max_age: float = 5.0,
+        column_store: bool = False,
+        backfill: str = "now",
+        backfill_pause: float = 0.05,
+        maintenance: str = "background",
+    ):
+        """Open (and if needed create) the task database at ``db_path``.
+
+        ``populate_dummy`` adds sample tasks to a newly created database.
+
+        By default one connection serves every caller, one at a time. With
+        ``pooled`` reads run concurrently on up to ``pool_size`` read-only
+        connections while writes stay serialized on ``self.conn``, which
+        needs a database file rather than ``:memory:``.
+
+        With ``group_commit_ms`` set, add_task, update_task, mark_done and
+        delete_task queue their change and return a Future instead of
+        committing. A background writer commits queued changes together
+        every ``group_commit_ms`` milliseconds or ``group_commit_ops``
+        changes, whichever comes first, and then resolves their futures.
+        Reads do not see a change until it is committed.
+
+        ``cache_size`` enables an LRU cache of that many list/count results,
+        each kept for at most ``cache_ttl`` seconds. Entries are invalidated
+        by any committed write, see data_generation().
+
+        Call latencies and result sizes are recorded in ``self.metrics``.
+        Statements taking ``slow_query_ms`` or longer are logged with their
+        query plan and the last ``slow_log_size`` are kept for slow_queries().
+
+        With ``snapshot`` set to a file path or ``":memory:"`` list, count
+        and summary reads are served from a copy of the database taken with
+        SQLite's backup API. A background thread refreshes the copy when the
+        data has changed, and a read never sees one older than
+        ``snapshot_max_age`` seconds, so these reads may miss recent writes.
+        Each thread reads the copy on a connection of its own.
+        Single tasks, the change log and the history are still read from
+        the database.
+
+        ``column_store`` answers list_tasks and count_tasks from an in-memory
+        ColumnStore (see column_store.py), loaded on first use and brought
+        up to date from the change log before each read. SQLite remains
+        the store every write goes to. Relevance-ordered lists still run
+        in SQLite.
+
+        Opening a database from an older version applies the schema changes
+        at once, then the backfills that rewrite existing rows (see
+        migrations.py), in chunks. With ``backfill="now"`` they finish
+        before the constructor returns. ``"background"`` leaves them to a
+        thread that waits ``backfill_pause`` seconds between chunks, so
+        other writes get in, and ``"off"`` leaves them to run_backfills().
+
+        A write that leaves the change log too long only flags it; a
+        background thread then trims the log and compacts the history in
+        small transactions. With ``maintenance="off"`` that is left to
+        maintain().
+        """
+        if (pooled or snapshot is not None) and db_path == ":memory:":
+            raise ValueError("pooled and snapshot modes need a database file")
+        if backfill not in BACKFILL_MODES:
+            raise ValueError(f"backfill must be one of {', '.join(BACKFILL_MODES)}")
+        if maintenance not in MAINTENANCE_MODES:
+            raise ValueError(f"maintenance must be one of {', '.join(MAINTENANCE_MODES)}")
         self.db_path = db_path
-        # Allow connection reuse across Flask's threaded request handlers
+        self.pooled = pooled
+        self.pool_size = pool_size
+        # Serializes writes, and every query when not pooled, since the
+        # connection is shared across Flask's threaded request handlers.
+        self._write_lock = threading.RLock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._generation = 0
+        # set once the task_counts backfill is seen finished, see _counts()
+        self._counts_ready = False
+        # guards _generation and _version_conn; never held while waiting on SQLite locks
+        self._generation_lock = threading.Lock()
+        self.maintenance = maintenance
+        # set by writes that find the change log too long, see maintain()
+        self._maintenance_due = threading.Event()
+        self._maintenance_stop = threading.Event()
+        self._maintainer: Optional[threading.Thread] = None
+        self._maintainer_lock = threading.Lock()
+        self._version_conn: Optional[sqlite3.Connection] = None
+        # (data_generation(), data_state()) when data_state() last read it
+        self._state: Optional[Tuple[Tuple[str, int, int], int]] = None
+        # Tells apart generations of different tracker instances/processes.
+        self._instance = uuid.uuid4().hex
+        self.slow_query_ms = slow_query_ms
+        self._slow_log: "deque[Dict[str, object]]" = deque(maxlen=slow_log_size)
+        self.snapshot = snapshot
+        self.snapshot_max_age = snapshot_max_age
+        # (seq, URI) of the newest copy; replaced as a whole, so readers need no lock
+        self._snapshot_current: Optional[Tuple[int, str]] = None
+        # keeps an in-memory copy alive until the next one replaces it
+        self._snapshot_keeper: Optional[sqlite3.Connection] = None
+        # each thread reads the copy through a connection of its own
+        self._snapshot_local = threading.local()
+        # monotonic time at which the snapshot last matched the primary
+        self._snapshot_taken = 0.0
+        self._snapshot_seq = 0
+        self._snapshot_version: Optional[int] = None
+        self._snapshot_lock = threading.Lock()
+        self._columns: Optional[ColumnStore] = ColumnStore() if column_store else None
+        self._columns_generation: Optional[Tuple[str, int, int]] = None
+        self._columns_lock = threading.Lock()
+        self.metrics = self._init_metrics()
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self._init_db()
-        if populate_dummy:
+        for pragma in WRITER_PRAGMAS + READER_PRAGMAS:
+            self.conn.execute(pragma)
+        created = self._init_db()
+        if db_path != ":memory:":
+            # data_version moves on a connection when any other one commits,
+            # this tracker's writer included
+            self._version_conn = self._connect_readonly()
+        self.backfill_pause = backfill_pause
+        self._backfill_stop = threading.Event()
+        self._backfiller: Optional[threading.Thread] = None
+        if backfill == "now":
+            self.run_backfills()
+        elif backfill == "background" and migrations.pending(self.conn):
+            self._backfiller = threading.Thread(
+                target=self._backfill_loop, name="task-tracker-backfill", daemon=True
+            )
+            self._backfiller.start()
+        self.group_commit_ms = group_commit_ms
+        self.group_commit_ops = group_commit_ops
+        self._write_queue: Optional["queue.Queue[tuple]"] = None
+        if group_commit_ms is not None:
+            self._write_queue = queue.Queue()
+            self._group_writer = threading.Thread(
+                target=self._group_commit_loop, name="task-tracker-writer", daemon=True
+            )
+            self._group_writer.start()
+            # Flush whatever is still queued when the interpreter exits.
+            atexit.register(self._stop_group_commit)
+        if snapshot is not None:
+            # committed data only, and without blocking the writer
+            self._snapshot_source = self._connect_readonly()
+            self.refresh_snapshot()
+            self._snapshot_stop = threading.Event()
+            self._snapshot_refresher = threading.Thread(
+                target=self._snapshot_loop, name="task-tracker-snapshot", daemon=True
+            )
+            self._snapshot_refresher.start()
+        if populate_dummy and created:
             self.seed_dummy_tasks()
+            if snapshot is not None:
+                self.refresh_snapshot()
+
+    @contextlib.contextmanager
+    def _reading(self, snapshot: bool = False) -> Iterator[sqlite3.Connection]:
+        """Yield a connection to run read-only queries on.
+
+        With ``snapshot`` the read may be served from the snapshot, which
+        can lag behind recent writes. Only the list, count and summary
+        reads behind _query pass it; lookups of single tasks and of the
+        change log must see every committed write.
+        """
+        if snapshot and self.snapshot is not None:
+            yield self._current_snapshot()
+            return
+        if not self.pooled:
+            with self._write_lock:
+                yield self.conn
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._open_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open another pooled read connection, or wait for a free one."""
+        with self._pool_lock:
+            grow = self._reader_count < self.pool_size
+            if grow:
+                self._reader_count += 1
+        if not grow:
+            return self._readers.get()
+        return self._connect_readonly()
+
+    def _connect_readonly(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        for pragma in READER_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def refresh_snapshot(self) -> None:
+        """Bring the read snapshot up to date, copying only if data changed.
 
-    def _init_db(self) -> None:
-        """Initialise the tasks table and upgrade old schemas."""
-        self.conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                description TEXT NOT NULL,
-                priority INTEGER NOT NULL DEFAULT 1,
-                due_date TEXT,
-                done INTEGER NOT NULL DEFAULT 0,
-                status TEXT NOT NULL DEFAULT 'not started',
-                comment TEXT,
-                color TEXT
+        A new copy is built next to the current one and swapped in, so
+        reads already running finish on the copy they started with.
+        In-memory copies live in SQLite's memdb VFS under a name of their
+        own, so every thread can open a connection to one.
+        """
+        with self._snapshot_lock:
+            started = time.monotonic()
+            version = self._snapshot_source.execute("PRAGMA data_version").fetchone()[0]
+            if self._snapshot_current is not None and version == self._snapshot_version:
+                self._snapshot_taken = started
+                return
+            seq = self._snapshot_seq + 1
+            keeper = None
+            if self.snapshot == ":memory:":
+                uri = f"file:/task-tracker-{self._instance}-{seq}?vfs=memdb"
+                keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                # memdb has no shared memory for WAL, so the copied WAL
+                # header is switched back while this connection has it alone
+                keeper.execute("PRAGMA locking_mode=EXCLUSIVE")
+                self._snapshot_source.backup(keeper)
+                keeper.execute("PRAGMA journal_mode=DELETE")
+                keeper.execute("PRAGMA locking_mode=NORMAL")
+                keeper.execute("SELECT 1 FROM sqlite_master").fetchall()  # drops the lock
+                uri += "&mode=ro"
+            else:
+                partial = f"{self.snapshot}.tmp"
+                with contextlib.closing(sqlite3.connect(partial)) as target:
+                    self._snapshot_source.backup(target)
+                    # a plain file, so it can be opened immutable below
+                    target.execute("PRAGMA journal_mode=DELETE")
+                os.replace(partial, self.snapshot)
+                uri = Path(self.snapshot).resolve().as_uri() + "?mode=ro&immutable=1"
+            replaced, self._snapshot_keeper = self._snapshot_keeper, keeper
+            self._snapshot_current = (seq, uri)
+            if replaced is not None:
+                # threads still reading the old copy keep it open until done
+                replaced.close()
+            self._snapshot_version = version
+            self._snapshot_taken = started
+            self._snapshot_seq = seq
+            self.metrics.observe(
+                "task_tracker_snapshot_copy_seconds", time.monotonic() - started
             )
-            """
+
+    def _current_snapshot(self) -> sqlite3.Connection:
+        """Return this thread's connection to the newest snapshot.
+
+        The snapshot is refreshed first if it is too old. A thread opens a
+        connection to each copy it reads and closes the one before; until
+        then that connection keeps the older copy around.
+        """
+        if time.monotonic() - self._snapshot_taken > self.snapshot_max_age:
+            self.refresh_snapshot()
+        seq, uri = self._snapshot_current
+        local = self._snapshot_local
+        if getattr(local, "seq", None) != seq:
+            if getattr(local, "conn", None) is not None:
+                local.conn.close()
+            local.conn = sqlite3.connect(uri, uri=True)
+            local.seq = seq
+        return local.conn
+
+    def _snapshot_loop(self) -> None:
+        """Background refresher keeping the snapshot within half its max age."""
+        while not self._snapshot_stop.wait(self.snapshot_max_age / 2):
+            try:
+                self.refresh_snapshot()
+            except sqlite3.Error as exc:
+                logger.warning("snapshot refresh failed: %s", exc)
+
+    @contextlib.contextmanager
+    def _writing(self) -> Iterator[sqlite3.Connection]:
+        """Yield the writer connection inside a transaction.
+
+        The transaction commits when the block exits and rolls back if it
+        raises.
+        """
+        with self._write_lock:
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            self._bump_generation()
+            self._check_log()
+
+    def data_generation(self) -> Tuple[str, int, int]:
+        """Return a value that changes whenever the task data may have changed.
+
+        Combines a counter of this tracker's own commits with SQLite's
+        data_version, which moves when another process commits. Values from
+        different tracker instances never compare equal. In snapshot mode
+        it follows the snapshot that reads are served from instead.
+        """
+        if self.snapshot is not None:
+            self._current_snapshot()
+            return self._instance, self._snapshot_seq, -1
+        # a connection of its own, so reads never wait behind a write
+        with self._generation_lock:
+            if self._version_conn is None:
+                # an in-memory database has no other connections
+                return self._instance, self._generation, 0
+            version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            return self._instance, self._generation, version
+
+    def data_state(self) -> int:
+        """Return the newest change log seq, which every write to the tasks moves.
+
+        Unlike data_generation() it is the same in every process and tracker
+        open on the database, so it can name a version of the data to
+        clients, as the web app's ETags do. It is only read again once
+        data_generation() says the data may have changed. In snapshot mode
+        it is read from the snapshot.
+        """
+        # read before the seq, so a write in between is caught next time
+        generation = self.data_generation()
+        with self._generation_lock:
+            if self._state is not None and self._state[0] == generation:
+                return self._state[1]
+        with self._reading(snapshot=True) as conn:
+            row = self._fetch(conn, "SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'")
+        seq = row[0][0] if row else 0
+        with self._generation_lock:
+            self._state = (generation, seq)
+        return seq
+
+    def _bump_generation(self) -> None:
+        """Count a commit made by this tracker."""
+        with self._generation_lock:
+            self._generation += 1
+
+    def _query(self, query: str, params: Sequence[object]) -> List[tuple]:
+        """Run a read query, answering from the result cache when enabled.
+
+        The generated SQL and its parameters form the cache key, so calls
+        that normalize to the same query share an entry. In snapshot mode
+        the query runs on the snapshot.
+        """
+        if not self.cache_size:
+            with self._reading(snapshot=True) as conn:
+                return self._fetch(conn, query, params)
+        key = (query, tuple(params))
+        generation = self.data_generation()
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > now:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return list(entry[2])
+            self.cache_misses += 1
+        with self._reading(snapshot=True) as conn:
+            rows = self._fetch(conn, query, params)
+        expires = now + self.cache_ttl if self.cache_ttl is not None else float("inf")
+        with self._cache_lock:
+            self._cache[key] = (generation, expires, rows)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(rows)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return result cache hit/miss counters and current size."""
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "size": len(self._cache),
+            }
+
+    def _init_metrics(self) -> Metrics:
+        metrics = Metrics()
+        metrics.histogram("task_tracker_call_seconds", "Latency of TaskTracker calls by method.")
+        metrics.histogram(
+            "task_tracker_call_rows",
+            "Rows returned, or written by bulk calls, per TaskTracker call.",
+            ROW_BUCKETS,
+        )
+        metrics.counter("task_tracker_call_errors_total", "TaskTracker calls that raised, by method.")
+        metrics.histogram(
+            "task_tracker_statement_seconds", "Latency of single SQL statements by kind."
+        )
+        metrics.counter(
+            "task_tracker_slow_statements_total", "SQL statements over the slow query threshold."
+        )
+        metrics.histogram(
+            "task_tracker_snapshot_copy_seconds", "Time to copy the database into a read snapshot."
+        )
+        metrics.gauge(
+            "task_tracker_snapshot_age_seconds",
+            "Time since the read snapshot last matched the database.",
+            lambda: (
+                {(): time.monotonic() - self._snapshot_taken} if self.snapshot is not None else {}
+            ),
+        )
+        metrics.gauge(
+            "task_tracker_cache",
+            "Result cache hits, misses and current entries.",
+            lambda: {(("stat", stat),): value for stat, value in self.cache_stats().items()},
+        )
+        return metrics
+
+    def _fetch(self, conn: sqlite3.Connection, sql: str, params: Sequence[object] = ()) -> List[tuple]:
+        """Run a read statement and return all of its rows, recording the timing."""
+        started = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        self._record_statement(conn, "read", sql, params, started)
+        return rows
+
+    def _execute(
+        self, conn: sqlite3.Connection, sql: str, params: Sequence[object] = ()
+    ) -> sqlite3.Cursor:
+        """Run a write statement, recording the timing."""
+        started = time.perf_counter()
+        cursor = conn.execute(sql, params)
+        self._record_statement(conn, "write", sql, params, started)
+        return cursor
+
+    def _record_statement(
+        self,
+        conn: sqlite3.Connection,
+        kind: str,
+        sql: str,
+        params: Sequence[object],
+        started: float,
+    ) -> None:
+        """Time a finished statement and log it with its plan when slow."""
+        elapsed = time.perf_counter() - started
+        self.metrics.observe("task_tracker_statement_seconds", elapsed, kind=kind)
+        if self.slow_query_ms is None or elapsed * 1000 < self.slow_query_ms:
+            return
+        shape = _statement_shape(sql)
+        try:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        except sqlite3.Error:
+            plan = []
+        self.metrics.inc("task_tracker_slow_statements_total")
+        self._slow_log.append(
+            {"sql": shape, "ms": elapsed * 1000, "plan": plan, "at": time.time()}
         )
-        # If the table existed previously without the due_date column we need
-        # to add it. Older SQLite versions ignore "ADD COLUMN" if it already
-        # exists which keeps the operation idempotent.
-        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")]
-        if "due_date" not in columns:
-            self.conn.execute("ALTER TABLE tasks ADD COLUMN due_date TEXT")
-        if "status" not in columns:
-            self.conn.execute("ALTER TABLE tasks ADD COLUMN status TEXT NOT NULL DEFAULT 'not started'")
-            # migrate existing done flag into status
-            self.conn.execute("UPDATE tasks SET status='done' WHERE done=1")
-        if "comment" not in columns:
-            self.conn.execute("ALTER TABLE tasks ADD COLUMN comment TEXT")
-        if "color" not in columns:
-            self.conn.execute("ALTER TABLE tasks ADD COLUMN color TEXT")
+        logger.warning("slow query (%.1f ms): %s [%s]", elapsed * 1000, shape, "; ".join(plan))
+
+    def slow_queries(self) -> List[Dict[str, object]]:
+        """Return the most recent slow statements, oldest first.
+
+        Each is a dict with the statement ``sql`` (whitespace collapsed,
+        parameters left out), its duration ``ms``, the query ``plan`` lines
+        and the Unix time ``at`` which it was logged.
+        """
+        return list(self._slow_log)
+
+    def _submit(self, sql: str, params: Sequence[object]) -> Future:
+        """Run a single-statement write, or queue it for the next group commit.
+
+        Returns a Future of the statement's lastrowid that resolves once the
+        transaction holding the change commits; it is already resolved
+        unless group commit is enabled.
+        """
+        future: Future = Future()
+        if self._write_queue is None:
+            with self._writing() as conn:
+                future.set_result(self._execute(conn, sql, params).lastrowid)
+            return future
+        self._write_queue.put((sql, params, future))
+        return future
+
+    def _pending(self, future: Future) -> Optional[Future]:
+        """Hand ``future`` to the caller only when the write is still queued."""
+        return future if self._write_queue is not None else None
+
+    def _group_commit_loop(self) -> None:
+        """Background writer: commit queued changes in batches until stopped."""
+        assert self._write_queue is not None
+        window = self.group_commit_ms / 1000
+        stopping = False
+        while not stopping:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + window
+            while batch[-1][0] is not None and len(batch) < self.group_commit_ops:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            # A None statement is a flush barrier; one without a future
+            # additionally stops the writer.
+            stopping = batch[-1][0] is None and batch[-1][2] is None
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[tuple]) -> None:
+        """Apply queued changes in one transaction and resolve their futures.
+
+        Each change runs under its own savepoint so that a failing one
+        rejects only its own future.
+        """
+        outcomes = []
+        with self._write_lock:
+            conn = self.conn
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql, params, future in batch:
+                    if sql is None:
+                        outcomes.append((future, None, None))
+                        continue
+                    conn.execute("SAVEPOINT queued_write")
+                    try:
+                        row_id = self._execute(conn, sql, params).lastrowid
+                    except Exception as exc:
+                        conn.execute("ROLLBACK TO queued_write")
+                        outcomes.append((future, None, exc))
+                    else:
+                        outcomes.append((future, row_id, None))
+                    conn.execute("RELEASE queued_write")
+                conn.commit()
+                self._bump_generation()
+                self._check_log()
+            except Exception as exc:
+                conn.rollback()
+                outcomes = [(future, None, exc) for _, _, future in batch]
+        for future, result, error in outcomes:
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def flush(self) -> None:
+        """Block until every queued change has been committed."""
+        if self._write_queue is None or not self._group_writer.is_alive():
+            return
+        barrier: Future = Future()
+        self._write_queue.put((None, None, barrier))
+        barrier.result()
+
+    def _stop_group_commit(self) -> None:
+        """Commit anything still queued and stop the background writer."""
+        if self._write_queue is None:
+            return
+        atexit.unregister(self._stop_group_commit)
+        if self._group_writer.is_alive():
+            self._write_queue.put((None, None, None))
+            self._group_writer.join()
+
+    def close(self) -> None:
+        """Flush queued changes, then close every connection.
+
+        A background backfill stops after its current chunk and resumes
+        the next time the database is opened.
+        """
+        self._stop_group_commit()
+        self._backfill_stop.set()
+        if self._backfiller is not None:
+            self._backfiller.join()
+        with self._maintainer_lock:
+            self._maintenance_stop.set()
+            self._maintenance_due.set()
+        if self._maintainer is not None:
+            self._maintainer.join()
+        if self.snapshot is not None:
+            self._snapshot_stop.set()
+            self._snapshot_refresher.join()
+            with self._snapshot_lock:
+                self._snapshot_source.close()
+                if self._snapshot_keeper is not None:
+                    self._snapshot_keeper.close()
+                # other threads' connections close when they are collected
+                if getattr(self._snapshot_local, "conn", None) is not None:
+                    self._snapshot_local.conn.close()
+                    self._snapshot_local.conn = self._snapshot_local.seq = None
+        with self._write_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self.conn.close()
+        with self._generation_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+
+    def _init_db(self) -> bool:
+        """Create the tables, or bring an older schema up to date.
+
+        Runs the schema steps of MIGRATIONS that the database has not had
+        yet; their backfills are left to run_backfills. Databases already at
+        SCHEMA_VERSION are left alone, so opening one costs a couple of
+        lookups. Returns True when the tasks table was created.
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # processes opening the database together migrate one at a time,
+            # and the later ones find it done
+            self.conn.execute("BEGIN IMMEDIATE")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            self.conn.rollback()
+            raise RuntimeError(
+                f"{self.db_path} has schema version {version}, newer than this"
+                f" code's {SCHEMA_VERSION}"
+            )
+        created = False
+        if version < SCHEMA_VERSION:
+            created = not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks'"
+            ).fetchone()
+            version = migrations.migrate(self.conn, MIGRATIONS, version, created)
+            for statement in INDEXES:
+                self.conn.execute(statement)
+            self.conn.execute(f"PRAGMA user_version = {version}")
         self.conn.commit()
+        self.fts_enabled = bool(
+            self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'"
+            ).fetchone()
+        )
+        return created
+
+    @_instrumented()
+    def run_backfills(self, chunks: Optional[int] = None) -> int:
+        """Apply pending migration backfills, at most ``chunks`` chunks of them.
+
+        Each chunk is its own write transaction, so other writers get in
+        between chunks. Returns the number of chunks applied, fewer than
+        ``chunks`` once nothing is left.
+        """
+        applied = 0
+        while chunks is None or applied < chunks:
+            with self._write_lock:
+                if not migrations.run_chunk(self.conn, BACKFILLS):
+                    break
+                self._bump_generation()
+            applied += 1
+        return applied
+
+    def _backfill_loop(self) -> None:
+        """Background backfiller: one chunk at a time until none is left."""
+        while not self._backfill_stop.is_set():
+            try:
+                if not self.run_backfills(chunks=1):
+                    return
+            except sqlite3.OperationalError as exc:
+                # another process held the lock for longer than busy_timeout
+                logger.warning("backfill chunk failed, retrying: %s", exc)
+            self._backfill_stop.wait(self.backfill_pause)
+
+    def backfill_progress(self) -> List[Dict[str, object]]:
+        """Every migration backfill's name, done_id, end_id, rows changed and times.
 
+        A backfill has finished once ``finished`` is set.
+        """
+        with self._write_lock:
+            return migrations.progress(self.conn)
+
+    def _fts_match(self, search: Optional[str]) -> Optional[str]:
+        """Translate a search box string into an FTS5 prefix query.
+
+        Every word must match the start of a word in the description or
+        comment. Returns None when full-text search cannot be used.
+        """
+        if not search or not self.fts_enabled:
+            return None
+        terms = re.findall(r"\w+", search)
+        if not terms:
+            return None
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @_instrumented()
     def add_task(
         self,
         description: str,
@@ -53,16 +1464,72 @@ class TaskTracker:
         status: str = "not started",
         comment: str = "",
         color: str = "",
-    ) -> None:
-        """Add a new task."""
-        done = 1 if status == "done" else 0
-        self.conn.execute(
-            "INSERT INTO tasks(description, priority, due_date, done, status, comment, color) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (description, priority, due_date, done, status, comment, color),
+        project: str = "",
+    ) -> Union[int, Future]:
+        """Add a new task and return its id (a Future of it in group commit mode)."""
+        future = self._submit(
+            INSERT_SQL,
+            _insert_params(
+                dict(
+                    description=description,
+                    priority=priority,
+                    due_date=due_date,
+                    status=status,
+                    comment=comment,
+                    color=color,
+                    project=project,
+                )
+            ),
         )
-        self.conn.commit()
+        return self._pending(future) or future.result()
 
-    def list_tasks(
+    def _where(
+        self,
+        show_all: bool,
+        search: Optional[str],
+        status: Optional[str],
+        for_list: bool = False,
+        project: Optional[str] = None,
+    ) -> Tuple[str, List[object]]:
+        """Build the WHERE clause shared by list and count queries."""
+        clauses = []
+        params: List[object] = []
+        if not show_all:
+            clauses.append("done=0")
+        if search:
+            match = self._fts_match(search)
+            if match is not None:
+                clauses.append("id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)")
+                params.append(match)
+            else:
+                clauses.append("(description LIKE ? OR comment LIKE ?)")
+                params.extend([f"%{search}%", f"%{search}%"])
+        if status:
+            # The unary + keeps list queries on the sort-order indexes rather
+            # than idx_tasks_status, which would force a sort of the matches.
+            clauses.append("+status=?" if for_list else "status=?")
+            params.append(status)
+        if project is not None:
+            clauses.append("project=?")
+            params.append(project)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def _sort_terms(
+        self, sort_by: str, ascending: bool, search: Optional[str]
+    ) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        """Resolve a requested ordering to its name and ORDER BY terms."""
+        if sort_by == "relevance":
+            if self._fts_match(search) is None:
+                sort_by = "priority"
+            ascending = False
+        elif sort_by != "due":
+            # default to sorting by priority
+            sort_by = "priority"
+        name = f"{sort_by}_{'asc' if ascending else 'desc'}"
+        return name, SORT_KEYS[(sort_by, ascending)]
+
+    def _list_query(
         self,
         show_all: bool = False,
         ascending: bool = False,
@@ -73,66 +1540,660 @@ class TaskTracker:
         offset: Optional[int] = None,
         with_status: bool = False,
         with_meta: bool = False,
-    ) -> List[Tuple[int, str, int, Optional[str], int]]:
-        """Return tasks with optional filtering and pagination."""
-        order = "ASC" if ascending else "DESC"
-        if sort_by == "due":
-            null_high = "9999-12-31" if ascending else "0001-01-01"
-            order_clause = f"COALESCE(due_date, '{null_high}') {order}, priority DESC"
-        else:
-            # default to sorting by priority
-            order_clause = f"priority {order}, COALESCE(due_date, '')"
+        after: Optional[Sequence[object]] = None,
+        backwards: bool = False,
+        with_keys: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        project: Optional[str] = None,
+    ) -> Tuple[str, List[object]]:
+        """Return the SQL and parameters used by list_tasks.
+
+        ``after`` restricts the result to rows following that sort key and
+        ``backwards`` walks the order in reverse, which together give keyset
+        pagination in both directions. ``with_keys`` appends the sort key
+        columns to every row. ``fields`` replaces the default columns.
+        """
+        name, terms = self._sort_terms(sort_by, ascending, search)
+        if backwards:
+            terms = tuple((expr, "ASC" if d == "DESC" else "DESC") for expr, d in terms)
+        order_clause = ", ".join(f"{expr} {direction}" for expr, direction in terms)
 
         cols = "id, description, priority, due_date, done"
         if with_status:
             cols += ", status"
         if with_meta:
             cols += ", comment, color"
-        base_query = f"SELECT {cols} FROM tasks"
-        clauses = []
-        params: List[object] = []
-        if not show_all:
-            clauses.append("done=0")
-        if search:
-            clauses.append("description LIKE ?")
-            params.append(f"%{search}%")
-        if status:
-            clauses.append("status=?")
-            params.append(status)
-        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
-        query = f"{base_query}{where} ORDER BY {order_clause}"
+        if fields:
+            cols = ", ".join(fields)
+        key_cols = ", ".join(f"{expr} AS sort_key_{i}" for i, (expr, _) in enumerate(terms))
+        if name.startswith("relevance"):
+            source = (
+                "tasks JOIN (SELECT rowid AS fts_id, rank AS fts_rank"
+                " FROM tasks_fts WHERE tasks_fts MATCH ?) ON fts_id = id"
+            )
+            where, params = self._where(show_all, None, status, for_list=True, project=project)
+            params.insert(0, self._fts_match(search))
+        else:
+            source = "tasks"
+            where, params = self._where(show_all, search, status, for_list=True, project=project)
+        if after is not None and source == "tasks" and limit is not None:
+            # Union of index seeks, one per sort term (see _keyset_branches),
+            # each stopping after ``limit`` rows; only their few rows are sorted.
+            branches = []
+            branch_params: List[object] = []
+            for predicate, key_params, rest in _keyset_branches(terms, after):
+                branch_where = f"{where} AND {predicate}" if where else f" WHERE {predicate}"
+                branch_order = ", ".join(f"{expr} {d}" for expr, d in rest)
+                branches.append(
+                    f"SELECT * FROM (SELECT {cols}, {key_cols} FROM tasks{branch_where}"
+                    f" ORDER BY {branch_order} LIMIT {int(limit)})"
+                )
+                branch_params.extend(params + key_params)
+            outer_cols = ", ".join(col.split(".")[-1] for col in cols.split(", "))
+            if with_keys:
+                outer_cols += ", " + ", ".join(f"sort_key_{i}" for i in range(len(terms)))
+            outer_order = ", ".join(f"sort_key_{i} {d}" for i, (_, d) in enumerate(terms))
+            query = (
+                f"SELECT {outer_cols} FROM ({' UNION ALL '.join(branches)})"
+                f" ORDER BY {outer_order} LIMIT {int(limit)}"
+            )
+            return query, branch_params
+        if after is not None:
+            predicate, key_params = _keyset_predicate(terms, after)
+            where += f" AND {predicate}" if where else f" WHERE {predicate}"
+            params.extend(key_params)
+        if with_keys:
+            cols += f", {key_cols}"
+        query = f"SELECT {cols} FROM {source}{where} ORDER BY {order_clause}"
         if limit is not None:
-            query += f" LIMIT {limit}"
+            query += f" LIMIT {int(limit)}"
         if offset is not None:
-            query += f" OFFSET {offset}"
-        cursor = self.conn.execute(query, params)
-        return cursor.fetchall()
+            if limit is None:
+                query += " LIMIT -1"
+            query += f" OFFSET {int(offset)}"
+        return query, params
+
+    def _count_query(
+        self,
+        show_all: bool = False,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        project: Optional[str] = None,
+    ) -> Tuple[str, List[object]]:
+        """Return the SQL and parameters used by count_tasks.
+
+        Counts without a search or project are read from the
+        trigger-maintained totals.
+        """
+        if not search and project is None:
+            where, params = self._where(show_all, None, status)
+            return f"SELECT COALESCE(SUM(n), 0) FROM {self._counts('task_counts')}{where}", params
+        where, params = self._where(show_all, search, status, project=project)
+        return f"SELECT COUNT(*) FROM tasks{where}", params
 
+    def _counts(self, table: str) -> str:
+        """Return what to read the totals of ``table`` from.
+
+        That is the table itself, or a scan of the tasks while the
+        task_counts backfill of an upgraded database is still counting them.
+        It is checked on the connection the read will use, since a snapshot
+        can be older than the database.
+        """
+        if not self._counts_ready:
+            with self._reading(snapshot=True) as conn:
+                self._counts_ready = "task_counts" not in migrations.pending(conn)
+            if not self._counts_ready:
+                return COUNT_SCANS[table]
+        return table
+
+    @_instrumented(rows=len)
+    def list_tasks(
+        self,
+        show_all: bool = False,
+        ascending: bool = False,
+        sort_by: str = "priority",
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        with_status: bool = False,
+        with_meta: bool = False,
+        project: Optional[str] = None,
+    ) -> List[Tuple[int, str, int, Optional[str], int]]:
+        """Return tasks with optional filtering and pagination."""
+        if self._columns is not None:
+            name, _ = self._sort_terms(sort_by, ascending, search)
+            if not name.startswith("relevance"):
+                fields = ["id", "description", "priority", "due_date", "done"]
+                if with_status:
+                    fields.append("status")
+                if with_meta:
+                    fields += ["comment", "color"]
+                ids, text = self._column_search(search)
+                store = self._column_store()
+                with self._columns_lock:
+                    slots = store.select(
+                        name, show_all, status, project, ids, text, limit, offset
+                    )
+                    return store.rows(slots, fields)
+        query, params = self._list_query(
+            show_all,
+            ascending,
+            sort_by,
+            search,
+            status,
+            limit,
+            offset,
+            with_status,
+            with_meta,
+            project=project,
+        )
+        return self._query(query, params)
+
+    @_instrumented(rows=lambda page: len(page[0]))
+    def list_tasks_page(
+        self,
+        show_all: bool = False,
+        ascending: bool = False,
+        sort_by: str = "priority",
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 10,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        with_status: bool = False,
+        with_meta: bool = False,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[tuple], Optional[str], Optional[str]]:
+        """Return a page of tasks with cursors for the next and previous pages.
+
+        Pages continue from the opaque cursor passed as ``after`` or
+        ``before`` instead of skipping rows with OFFSET, so deep pages cost
+        the same as the first one. A cursor is None when there is no such
+        page. Raises ValueError for a cursor from a different sort order.
+        ``fields`` selects the columns of each task from EXPORT_FIELDS.
+        """
+        if fields is not None:
+            _check_fields(fields)
+        name, terms = self._sort_terms(sort_by, ascending, search)
+        cursor = before if before is not None else after
+        key = _decode_cursor(cursor, name, len(terms)) if cursor is not None else None
+        backwards = before is not None
+        query, params = self._list_query(
+            show_all,
+            ascending,
+            sort_by,
+            search,
+            status,
+            limit=limit + 1,
+            with_status=with_status,
+            with_meta=with_meta,
+            after=key,
+            backwards=backwards,
+            with_keys=True,
+            fields=fields,
+        )
+        rows = self._query(query, params)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return [], None, None
+        width = len(terms)
+        tasks = [row[:-width] for row in rows]
+        has_next = True if backwards else more
+        has_prev = more if backwards else cursor is not None
+        next_cursor = _encode_cursor(name, rows[-1][-width:]) if has_next else None
+        prev_cursor = _encode_cursor(name, rows[0][-width:]) if has_prev else None
+        return tasks, next_cursor, prev_cursor
+
+    @_instrumented()
     def count_tasks(
         self,
         show_all: bool = False,
         search: Optional[str] = None,
         status: Optional[str] = None,
+        project: Optional[str] = None,
     ) -> int:
         """Return number of tasks matching the given filters."""
-        base_query = "SELECT COUNT(*) FROM tasks"
-        clauses = []
-        params: List[object] = []
-        if not show_all:
-            clauses.append("done=0")
-        if search:
-            clauses.append("description LIKE ?")
-            params.append(f"%{search}%")
-        if status:
-            clauses.append("status=?")
-            params.append(status)
-        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
-        return self.conn.execute(base_query + where, params).fetchone()[0]
+        if self._columns is not None:
+            ids, text = self._column_search(search)
+            store = self._column_store()
+            with self._columns_lock:
+                return store.count(show_all, status, project, ids, text)
+        query, params = self._count_query(show_all, search, status, project)
+        return self._query(query, params)[0][0]
+
+    @_instrumented()
+    def summary(self, today: Optional[str] = None) -> Dict[str, object]:
+        """Return dashboard totals, read from the trigger-maintained counts.
+
+        Gives the number of tasks per status, and of open tasks in total,
+        per priority, overdue (due before ``today``) and due this week
+        (``today`` and the six days after). ``today`` is an ISO date and
+        defaults to the local date.
+        """
+        day = datetime.date.fromisoformat(today) if today else datetime.date.today()
+        week_end = (day + datetime.timedelta(days=7)).isoformat()
+        day = day.isoformat()
+        counts, due_counts = self._counts("task_counts"), self._counts("task_due_counts")
+        by_status = self._query(
+            f"SELECT status, SUM(n) FROM {counts} GROUP BY status HAVING SUM(n) > 0", ()
+        )
+        by_priority = self._query(
+            f"SELECT priority, SUM(n) FROM {due_counts} WHERE done=0"
+            " GROUP BY priority HAVING SUM(n) > 0 ORDER BY priority DESC",
+            (),
+        )
+        overdue, due_this_week = self._query(
+            "SELECT COALESCE(SUM(CASE WHEN due_date < ? THEN n END), 0),"
+            " COALESCE(SUM(CASE WHEN due_date >= ? THEN n END), 0)"
+            f" FROM {due_counts} WHERE done=0 AND due_date > '' AND due_date < ?",
+            (day, day, week_end),
+        )[0]
+        return {
+            "by_status": dict(by_status),
+            "open": sum(n for _, n in by_priority),
+            "by_priority": dict(by_priority),
+            "overdue": overdue,
+            "due_this_week": due_this_week,
+        }
+
+    @_instrumented(rows=len)
+    def due_tasks(
+        self, today: Optional[str] = None, days: int = 7, limit: Optional[int] = None
+    ) -> List[Tuple[int, str, int, str, str]]:
+        """Return open tasks due before ``today`` plus ``days`` days, earliest first.
+
+        Rows are (id, description, priority, due_date, status); those due
+        before ``today`` (an ISO date, the local date by default) are
+        overdue. The rows are one range of idx_tasks_open_due, so the cost
+        follows the number returned rather than the number of tasks.
+        """
+        day = datetime.date.fromisoformat(today) if today else datetime.date.today()
+        end = (day + datetime.timedelta(days=days)).isoformat()
+        query = (
+            "SELECT id, description, priority, due_date, status FROM tasks"
+            " WHERE done=0 AND due_date IS NOT NULL AND due_date < ?"
+            " ORDER BY due_date, id"
+        )
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return self._query(query, (end,))
+
+    def last_change(self) -> int:
+        """Return the sequence number of the newest change log entry, or 0."""
+        with self._reading() as conn:
+            return self._fetch(conn, "SELECT COALESCE(MAX(seq), 0) FROM task_changes", ())[0][0]
+
+    @_instrumented(rows=len)
+    def changes_since(
+        self, seq: int, limit: int = 1000
+    ) -> List[Tuple[int, str, int, Optional[Dict[str, object]]]]:
+        """Return up to ``limit`` changes logged after ``seq``, oldest first.
+
+        Each change is (seq, op, task_id, record) where op is insert,
+        update, reschedule (an update that moves the due date or reopens
+        the task) or delete, and record is the task's current columns keyed
+        by EXPORT_FIELDS, or None once the task is gone. Raises ValueError when
+        entries after ``seq`` have already been trimmed, since the caller
+        can no longer catch up change by change.
+        """
+        columns = ", ".join(f"t.{field}" for field in EXPORT_FIELDS)
+        with self._reading() as conn:
+            rows = self._fetch(
+                conn,
+                f"SELECT c.seq, c.op, c.task_id, t.id IS NOT NULL, {columns}"
+                " FROM task_changes c LEFT JOIN tasks t ON t.id = c.task_id"
+                " WHERE c.seq > ? ORDER BY c.seq LIMIT ?",
+                (seq, limit),
+            )
+        # seq has no gaps, so a jump means the entries in between were trimmed
+        if rows and rows[0][0] > seq + 1:
+            raise ValueError(f"change log no longer holds changes after {seq}")
+        return [
+            (row[0], row[1], row[2], dict(zip(EXPORT_FIELDS, row[4:])) if row[3] else None)
+            for row in rows
+        ]
+
+    @_instrumented()
+    def trim_changes(self, keep: int = CHANGE_LOG_KEEP) -> Optional[Future]:
+        """Drop all but the newest ``keep`` change log entries."""
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        return self._pending(self._submit(TRIM_CHANGES_SQL, (keep,)))
+
+    def _check_log(self) -> None:
+        """Schedule maintenance once the change log is CHANGE_LOG_SLACK past CHANGE_LOG_KEEP.
+
+        Called on the writer after each commit. It reads only the two ends
+        of the log's key, and looks at the log itself rather than counting
+        writes, so short-lived processes such as the CLI notice it too.
+        """
+        low, high = self.conn.execute(
+            "SELECT (SELECT MIN(seq) FROM task_changes), (SELECT MAX(seq) FROM task_changes)"
+        ).fetchone()
+        if high is not None and high - low >= CHANGE_LOG_KEEP + CHANGE_LOG_SLACK:
+            self.schedule_maintenance()
+
+    def schedule_maintenance(self) -> None:
+        """Ask for maintain() to run, in the background unless maintenance is off."""
+        self._maintenance_due.set()
+        if self.maintenance != "background":
+            return
+        with self._maintainer_lock:
+            if self._maintainer is None and not self._maintenance_stop.is_set():
+                self._maintainer = threading.Thread(
+                    target=self._maintenance_loop, name="task-tracker-maintenance", daemon=True
+                )
+                self._maintainer.start()
+
+    def maintenance_due(self) -> bool:
+        """Whether maintenance was scheduled and has not finished since."""
+        return self._maintenance_due.is_set()
+
+    @_instrumented()
+    def maintain(self, chunks: Optional[int] = None) -> int:
+        """Trim the change log to CHANGE_LOG_KEEP entries and compact the history.
+
+        Runs at most ``chunks`` steps, each its own write transaction that
+        deletes at most MAINTENANCE_CHUNK rows, so writers get in between.
+        Returns the number of steps that changed something, fewer than
+        ``chunks`` once nothing is left.
+        """
+        applied = 0
+        while chunks is None or applied < chunks:
+            if not self._maintenance_step():
+                self._maintenance_due.clear()
+                break
+            applied += 1
+        return applied
+
+    def _maintenance_step(self) -> bool:
+        """Run the next maintenance step; False once there is nothing to do."""
+        with self._writing() as conn:
+            trimmed = self._execute(
+                conn, TRIM_CHANGES_CHUNK_SQL, (MAINTENANCE_CHUNK, CHANGE_LOG_KEEP)
+            ).rowcount
+        if trimmed > 0:
+            return True
+        return self._compact_history_step(HISTORY_RETAIN_DAYS) is not None
+
+    def _maintenance_loop(self) -> None:
+        """Background maintainer: one step at a time whenever maintenance is due."""
+        while True:
+            self._maintenance_due.wait()
+            if self._maintenance_stop.is_set():
+                return
+            try:
+                more = self.maintain(chunks=1)
+            except sqlite3.Error as exc:
+                # e.g. another process held the lock for longer than busy_timeout
+                logger.warning("change log maintenance failed, retrying: %s", exc)
+                more = True
+            if more:
+                # let other writers in before the next step
+                self._maintenance_stop.wait(MAINTENANCE_PAUSE)
+
+    @_instrumented(rows=len)
+    def task_history(
+        self, task_id: int
+    ) -> List[Tuple[int, str, str, Optional[Dict[str, object]]]]:
+        """Return the history kept for a task, oldest first.
+
+        Each entry is (seq, at, op, changes) where op is insert, update or
+        delete, at is a UTC timestamp and changes maps the fields written to
+        their new values (every field for an insert, None for a delete).
+        """
+        with self._reading() as conn:
+            rows = self._fetch(
+                conn,
+                "SELECT seq, at, op, changes FROM task_history WHERE task_id = ? ORDER BY seq",
+                (task_id,),
+            )
+        return [(seq, at, op, json.loads(changes) if changes else None) for seq, at, op, changes in rows]
+
+    @_instrumented()
+    def task_as_of(self, task_id: int, when: Union[int, str, datetime.datetime]) -> Optional[Dict[str, object]]:
+        """Return a task's fields as they were at ``when``, or None if it did not exist.
+
+        ``when`` is a history seq or a time (an ISO string or datetime, UTC
+        unless it says otherwise). Raises ValueError for times before the
+        oldest history kept. Only the task's own checkpoint and entries
+        are read.
+        """
+        with self._reading() as conn:
+            target = self._history_target(conn, when)
+            checkpoint = self._fetch(
+                conn,
+                "SELECT seq, fields FROM task_checkpoints WHERE task_id = ? AND seq <= ?"
+                " ORDER BY seq DESC LIMIT 1",
+                (task_id, target),
+            )
+            base = checkpoint[0][0] if checkpoint else 0
+            entries = self._fetch(
+                conn,
+                "SELECT task_id, op, changes FROM task_history"
+                " WHERE task_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+                (task_id, base, target),
+            )
+        tasks = {task_id: {"id": task_id, **json.loads(checkpoint[0][1])}} if checkpoint else {}
+        _replay(tasks, entries)
+        return tasks.get(task_id)
+
+    @_instrumented(rows=len)
+    def tasks_as_of(self, when: Union[int, str, datetime.datetime]) -> List[Dict[str, object]]:
+        """Return every task as it was at ``when``, by id; see task_as_of."""
+        with self._reading() as conn:
+            target = self._history_target(conn, when)
+            checkpoints = self._fetch(
+                conn,
+                "SELECT task_id, seq, fields FROM task_checkpoints c WHERE seq = ("
+                "SELECT MAX(seq) FROM task_checkpoints WHERE task_id = c.task_id AND seq <= ?)",
+                (target,),
+            )
+            entries = self._fetch(
+                conn,
+                "SELECT task_id, op, changes, seq FROM task_history WHERE seq <= ? ORDER BY seq",
+                (target,),
+            )
+        tasks = {task_id: {"id": task_id, **json.loads(fields)} for task_id, _, fields in checkpoints}
+        bases = {task_id: seq for task_id, seq, _ in checkpoints}
+        # entries a task's checkpoint already includes are skipped
+        _replay(tasks, (entry[:3] for entry in entries if entry[3] > bases.get(entry[0], 0)))
+        return [tasks[task_id] for task_id in sorted(tasks)]
+
+    def _history_target(self, conn: sqlite3.Connection, when: Union[int, str, datetime.datetime]) -> int:
+        """Return the history seq ``when`` refers to, checking the history reaches back to it."""
+        pending = self._fetch(
+            conn,
+            "SELECT name FROM schema_backfills WHERE finished IS NULL"
+            f" AND name IN ({', '.join('?' for _ in HISTORY_BACKFILLS)})",
+            HISTORY_BACKFILLS,
+        )
+        if pending:
+            raise ValueError(f"task history is available once the {pending[0][0]} backfill finishes")
+        start_seq, start_at = self._fetch(conn, "SELECT seq, at FROM task_history_start")[0]
+        if isinstance(when, int):
+            if when < start_seq:
+                raise ValueError(f"no history is kept from before seq {start_seq}")
+            return when
+        at = _history_time(when)
+        if at < start_at:
+            raise ValueError(f"no history is kept from before {start_at}")
+        return max(self._history_seq_at(conn, at), start_seq)
+
+    def _history_seq_at(self, conn: sqlite3.Connection, at: str) -> int:
+        """Return the newest history seq logged at or before ``at``, or 0.
+
+        at follows seq, so it is a binary search over the seq key: a few
+        lookups however long the history is.
+        """
+        low, high = self._fetch(conn, "SELECT MIN(seq), MAX(seq) FROM task_history")[0]
+        found = 0
+        while low is not None and low <= high:
+            middle = (low + high) // 2
+            row = self._fetch(
+                conn, "SELECT seq, at FROM task_history WHERE seq >= ? ORDER BY seq LIMIT 1", (middle,)
+            )[0]
+            if row[0] > high or row[1] > at:
+                high = middle - 1
+            else:
+                found = row[0]
+                low = row[0] + 1
+        return found
+
+    @_instrumented()
+    def compact_history(self, retain_days: float = HISTORY_RETAIN_DAYS) -> int:
+        """Drop history no longer needed to reach back ``retain_days``; returns entries dropped.
+
+        Moves the history start to the newest entry from before then and
+        checkpoints each task with entries up to it, in steps of at most
+        MAINTENANCE_CHUNK entries, each its own transaction. Every time
+        within the retention period can still be reconstructed.
+        """
+        dropped = 0
+        while True:
+            step = self._compact_history_step(retain_days)
+            if step is None:
+                return dropped
+            dropped += step
+
+    def _compact_history_step(self, retain_days: float) -> Optional[int]:
+        """Run one compaction step and return the entries it dropped, or None when done."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=retain_days)
+        with self._writing() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            # checkpoints of older tasks may still be missing
+            if set(migrations.pending(conn)) & set(HISTORY_BACKFILLS):
+                return None
+            start = self._fetch(conn, "SELECT seq FROM task_history_start")[0][0]
+            keep = self._history_seq_at(conn, _history_time(cutoff))
+            if keep > start:
+                self._execute(
+                    conn,
+                    "UPDATE task_history_start SET seq = ?,"
+                    " at = (SELECT at FROM task_history WHERE seq = ?)",
+                    (keep, keep),
+                )
+                return 0
+            task_ids = self._fetch(
+                conn,
+                "SELECT DISTINCT task_id FROM (SELECT task_id FROM task_history"
+                " WHERE seq <= ? ORDER BY seq LIMIT ?)",
+                (start, MAINTENANCE_CHUNK),
+            )
+            if not task_ids:
+                return None
+            dropped = 0
+            for (task_id,) in task_ids:
+                dropped += self._checkpoint_task(conn, task_id, start)
+            return dropped
+
+    def _checkpoint_task(self, conn: sqlite3.Connection, task_id: int, seq: int) -> int:
+        """Fold a task's history up to ``seq`` into a checkpoint; returns the entries dropped."""
+        checkpoint = self._fetch(
+            conn,
+            "SELECT seq, fields FROM task_checkpoints WHERE task_id = ? AND seq <= ?"
+            " ORDER BY seq DESC LIMIT 1",
+            (task_id, seq),
+        )
+        base = checkpoint[0][0] if checkpoint else 0
+        entries = self._fetch(
+            conn,
+            "SELECT task_id, op, changes FROM task_history"
+            " WHERE task_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (task_id, base, seq),
+        )
+        tasks = {task_id: {"id": task_id, **json.loads(checkpoint[0][1])}} if checkpoint else {}
+        _replay(tasks, entries)
+        if task_id in tasks:
+            fields = {field: tasks[task_id][field] for field in HISTORY_FIELDS}
+            self._execute(
+                conn,
+                "INSERT OR REPLACE INTO task_checkpoints(task_id, seq, fields) VALUES (?, ?, ?)",
+                (task_id, seq, json.dumps(fields)),
+            )
+        self._execute(
+            conn,
+            "DELETE FROM task_checkpoints WHERE task_id = ? AND seq < ?",
+            (task_id, seq if task_id in tasks else seq + 1),
+        )
+        return self._execute(
+            conn, "DELETE FROM task_history WHERE task_id = ? AND seq <= ?", (task_id, seq)
+        ).rowcount
+
+    def _column_store(self) -> ColumnStore:
+        """Return the column store, first applying changes logged since its last use."""
+        # read before the changes, so a write in between is caught next time
+        generation = self.data_generation()
+        with self._columns_lock:
+            store = self._columns
+            if generation == self._columns_generation:
+                return store
+            try:
+                if self._columns_generation is None:
+                    raise ValueError("not loaded yet")
+                while True:
+                    changes = self.changes_since(store.seq, limit=COLUMN_SYNC_BATCH)
+                    for seq, _, task_id, record in changes:
+                        if record is None:
+                            store.remove(task_id)
+                        else:
+                            store.upsert(**record)
+                        store.seq = seq
+                    if len(changes) < COLUMN_SYNC_BATCH:
+                        break
+            except ValueError:
+                # first use, or too far behind a trimmed log: reload
+                store = self._columns = self._load_columns()
+            self._columns_generation = generation
+            return store
+
+    def _load_columns(self) -> ColumnStore:
+        store = ColumnStore()
+        # changes after this point are replayed on top of the rows below
+        store.seq = self.last_change()
+        with self._reading() as conn:
+            for row in conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM tasks"):
+                store.upsert(*row)
+        return store
+
+    def _column_search(self, search: Optional[str]) -> Tuple[Optional[Set[int]], Optional[str]]:
+        """Translate a search for the column store into (task ids, substring).
+
+        With full-text search the matching ids come from the FTS index, so
+        results are the same as in SQLite; otherwise the store does the
+        substring match itself, like the LIKE fallback.
+        """
+        if not search:
+            return None, None
+        match = self._fts_match(search)
+        if match is None:
+            return None, search
+        # from the database, like the changes the store is kept up to date with
+        with self._reading() as conn:
+            rows = self._fetch(conn, "SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?", (match,))
+        return {row[0] for row in rows}, None
+
+    def explain(self, query: str, params: Sequence[object] = ()) -> List[str]:
+        """Return the EXPLAIN QUERY PLAN detail lines for a query."""
+        with self._reading() as conn:
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    def explain_list_tasks(self, **kwargs) -> Dict[str, List[str]]:
+        """Return the query plans list_tasks and count_tasks would use."""
+        count_args = {k: kwargs[k] for k in ("show_all", "search", "status") if k in kwargs}
+        return {
+            "list": self.explain(*self._list_query(**kwargs)),
+            "count": self.explain(*self._count_query(**count_args)),
+        }
 
     def seed_dummy_tasks(self) -> None:
         """Insert a few sample tasks if the table is empty."""
-        count = self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
-        if count:
+        if self.count_tasks(show_all=True):
             return
         tasks = [
             ("Buy groceries", 2, "2024-05-01"),
@@ -141,18 +2202,192 @@ class TaskTracker:
             ("Exercise", 3, "2024-04-15"),
             ("Plan vacation", 4, "2024-06-01"),
         ]
-        for desc, prio, due in tasks:
-            self.add_task(desc, prio, due)
+        self.bulk_add(
+            {"description": desc, "priority": prio, "due_date": due} for desc, prio, due in tasks
+        )
 
-    def mark_done(self, task_id: int) -> None:
-        self.conn.execute("UPDATE tasks SET done=1, status='done' WHERE id=?", (task_id,))
-        self.conn.commit()
+    @_instrumented(rows=int)
+    def bulk_add(self, tasks: Iterable[Mapping[str, object]], batch_size: int = 1000) -> int:
+        """Insert many tasks in a single transaction and return how many.
+
+        ``tasks`` holds mappings with the add_task keyword arguments and is
+        consumed lazily ``batch_size`` rows at a time, so arbitrarily large
+        iterators can be loaded without holding them in memory.
+        """
+        rows = (_insert_params(task) for task in tasks)
+        return self._executemany_batched(INSERT_SQL, rows, batch_size)
+
+    @_instrumented(rows=int)
+    def bulk_update(self, updates: Iterable[Mapping[str, object]], batch_size: int = 1000) -> int:
+        """Apply many task updates in a single transaction and return how many.
+
+        Each mapping holds the task ``id`` plus the update_task keyword
+        arguments to change; missing or None fields are left untouched.
+        """
+        rows = (_update_params(update) for update in updates)
+        return self._executemany_batched(UPDATE_SQL, rows, batch_size)
 
-    def delete_task(self, task_id: int) -> None:
+    @_instrumented()
+    def apply_batch(
+        self,
+        creates: Sequence[Mapping[str, object]] = (),
+        updates: Sequence[Mapping[str, object]] = (),
+        deletes: Sequence[int] = (),
+    ) -> Dict[str, object]:
+        """Apply creates, updates and deletes together in one transaction.
+
+        Creates and updates take the same mappings as bulk_add and
+        bulk_update. Either every change is applied or, if one fails, none
+        is. Returns the new task ids and the number of tasks updated and
+        deleted.
+        """
+        self.flush()
+        with self._writing() as conn:
+            # _write_lock only keeps out this process; holding SQLite's write
+            # lock from before the sequence is read keeps out other processes
+            # too, so AUTOINCREMENT hands out consecutive ids from first_id
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            first_id = conn.execute(
+                "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name='tasks'), 0) + 1"
+            ).fetchone()[0]
+            conn.executemany(INSERT_SQL, [_insert_params(task) for task in creates])
+            updated = conn.executemany(UPDATE_SQL, [_update_params(u) for u in updates]).rowcount
+            deleted = conn.executemany(
+                "DELETE FROM tasks WHERE id=?", [(int(task_id),) for task_id in deletes]
+            ).rowcount
+        return {
+            "created": list(range(first_id, first_id + len(creates))),
+            "updated": max(updated, 0),
+            "deleted": max(deleted, 0),
+        }
+
+    def _executemany_batched(self, sql: str, rows: Iterable[tuple], batch_size: int) -> int:
+        """Run ``sql`` for every row in one transaction, ``batch_size`` at a time."""
+        rows = iter(rows)
+        total = 0
+        # keep queued single-task changes ahead of the bulk write
+        self.flush()
+        with self._writing() as conn:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(sql, batch)
+                total += len(batch)
+        return total
+
+    def iter_tasks(
+        self,
+        show_all: bool = False,
+        ascending: bool = False,
+        sort_by: str = "priority",
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Sequence[str] = EXPORT_FIELDS,
+        batch_size: int = 500,
+        project: Optional[str] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """Yield matching tasks in list_tasks order as dicts of ``fields``.
+
+        Rows are fetched ``batch_size`` at a time, each batch a keyset page
+        read on its own, so memory use does not grow with the number of
+        matches and no connection or lock is held while the caller works
+        through a batch. Writes made meanwhile may show up in later
+        batches, but no task is yielded twice. The result cache is
+        bypassed. Raises ValueError right away for a field not in
+        EXPORT_FIELDS.
+        """
+        _check_fields(fields)
+        fields = tuple(fields)
+        _, terms = self._sort_terms(sort_by, ascending, search)
+        page = functools.partial(
+            self._list_query,
+            show_all,
+            ascending,
+            sort_by,
+            search,
+            status,
+            with_keys=True,
+            fields=fields,
+            project=project,
+        )
+        return self._stream_rows(page, len(terms), fields, limit, batch_size)
+
+    def _stream_rows(
+        self,
+        page: Callable[..., Tuple[str, List[object]]],
+        width: int,
+        fields: Sequence[str],
+        limit: Optional[int],
+        batch_size: int,
+    ) -> Iterator[Dict[str, object]]:
+        """Yield rows of the ``page(limit=, after=)`` query a batch at a time.
+
+        Each row ends in its ``width`` sort key columns, and the next batch
+        seeks past the last of them.
+        """
+        started = time.perf_counter()
+        count = 0
+        key = None
+        try:
+            while limit is None or count < limit:
+                size = batch_size if limit is None else min(batch_size, limit - count)
+                query, params = page(limit=size, after=key)
+                with self._reading() as conn:
+                    rows = self._fetch(conn, query, params)
+                for row in rows:
+                    yield dict(zip(fields, row[:-width]))
+                count += len(rows)
+                if len(rows) < size:
+                    break
+                key = rows[-1][-width:]
+        finally:
+            self.metrics.observe(
+                "task_tracker_call_seconds", time.perf_counter() - started, method="iter_tasks"
+            )
+            self.metrics.observe("task_tracker_call_rows", count, method="iter_tasks")
+
+    def export_tasks(self) -> Iterator[Dict[str, object]]:
+        """Yield every task as a dict in id order without loading them all."""
+        with self._reading() as conn:
+            cursor = conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM tasks ORDER BY id")
+            for row in cursor:
+                yield dict(zip(EXPORT_FIELDS, row))
+
+    @_instrumented(rows=lambda task: int(task is not None))
+    def get_task(self, task_id: int) -> Optional[Tuple[object, ...]]:
+        """Return (description, priority, due_date, status, comment, color) for a task."""
+        with self._reading() as conn:
+            rows = self._fetch(
+                conn,
+                "SELECT description, priority, due_date, status, comment, color FROM tasks WHERE id=?",
+                (task_id,),
+            )
+        return rows[0] if rows else None
+
+    @_instrumented(rows=lambda task: int(task is not None))
+    def get_task_record(self, task_id: int) -> Optional[Dict[str, object]]:
+        """Return every column of a task as a dict keyed by EXPORT_FIELDS."""
+        with self._reading() as conn:
+            rows = self._fetch(
+                conn, f"SELECT {', '.join(EXPORT_FIELDS)} FROM tasks WHERE id=?", (task_id,)
+            )
+        return dict(zip(EXPORT_FIELDS, rows[0])) if rows else None
+
+    @_instrumented()
+    def mark_done(self, task_id: int) -> Optional[Future]:
+        return self._pending(
+            self._submit("UPDATE tasks SET done=1, status='done' WHERE id=?", (task_id,))
+        )
+
+    @_instrumented()
+    def delete_task(self, task_id: int) -> Optional[Future]:
         """Delete a task permanently."""
-        self.conn.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-        self.conn.commit()
+        return self._pending(self._submit("DELETE FROM tasks WHERE id=?", (task_id,)))
 
+    @_instrumented()
     def update_task(
         self,
         task_id: int,
@@ -162,7 +2397,7 @@ class TaskTracker:
         status: Optional[str] = None,
         comment: Optional[str] = None,
         color: Optional[str] = None,
-    ) -> None:
+    ) -> Optional[Future]:
         """Update an existing task's fields."""
         fields = []
         params = []
@@ -172,6 +2407,7 @@ class TaskTracker:
         if priority is not None:
             fields.append("priority=?")
             params.append(priority)
+        due_date = normalize_due_date(due_date)
         if due_date is not None:
             fields.append("due_date=?")
             params.append(due_date)
@@ -187,14 +2423,84 @@ class TaskTracker:
             fields.append("color=?")
             params.append(color)
         if not fields:
-            return
+            return None
         params.append(task_id)
-        self.conn.execute(f"UPDATE tasks SET {', '.join(fields)} WHERE id=?", params)
-        self.conn.commit()
+        return self._pending(
+            self._submit(f"UPDATE tasks SET {', '.join(fields)} WHERE id=?", params)
+        )
+
+
+def _read_records(stream, fmt: str) -> Iterator[Dict[str, object]]:
+    """Yield task records from a CSV or JSON Lines stream one at a time."""
+    if fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(stream):
+            # empty CSV cells mean "not given"
+            yield {key: value for key, value in row.items() if value != ""}
+
+
+def _write_records(
+    stream,
+    fmt: str,
+    records: Iterable[Mapping[str, object]],
+    fields: Sequence[str] = EXPORT_FIELDS,
+) -> int:
+    """Write task records as CSV, JSON Lines or text and return how many.
+
+    Text is one tab-separated line of ``fields`` per record.
+    """
+    count = 0
+    if fmt == "jsonl":
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            count += 1
+    elif fmt == "text":
+        for record in records:
+            values = ("" if record[field] is None else str(record[field]) for field in fields)
+            stream.write("\t".join(values) + "\n")
+            count += 1
+    else:
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    return count
+
 
+def _open_stream(path: str, mode: str):
+    """Open ``path`` for CSV/JSONL I/O, where "-" means stdin or stdout."""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, newline="")
 
-def main() -> None:
+
+def _guess_format(path: Optional[str], fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path and path.endswith((".jsonl", ".json")) else "csv"
+
+
+def _report_rate(verb: str, count: int, started: float) -> None:
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(
+        f"{verb} {count} tasks in {elapsed:.2f}s ({count / elapsed:.0f} rows/sec)",
+        file=sys.stderr,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Simple task tracker")
+    parser.add_argument("--db", default=DB_FILE, help=f"Database file (default: {DB_FILE})")
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("TASK_TRACKER_SOCKET"),
+        help="Unix socket of a running 'serve' daemon to send commands to"
+        " (default: $TASK_TRACKER_SOCKET)",
+    )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     add_parser = subparsers.add_parser("add", help="Add a new task")
@@ -223,55 +2529,350 @@ def main() -> None:
     )
     list_parser.add_argument(
         "--sort-by",
-        choices=["priority", "due"],
+        choices=["priority", "due", "relevance"],
         default="priority",
-        help="Sort tasks by priority or due date",
+        help="Sort tasks by priority, due date or best match to --search",
+    )
+    list_parser.add_argument("-s", "--search", help="Only tasks matching these words")
+    list_parser.add_argument(
+        "--status",
+        choices=["not started", "in progress", "done"],
+        help="Only tasks with this status (implies --all)",
+    )
+    list_parser.add_argument("-n", "--limit", type=int, help="Show at most this many tasks")
+    list_parser.add_argument(
+        "--format", choices=["text", "jsonl", "csv"], default="text", help="Output format"
+    )
+    list_parser.add_argument(
+        "--fields",
+        help=f"Comma-separated columns to output, from {','.join(EXPORT_FIELDS)}",
+    )
+    list_parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print the query plans instead of the tasks",
     )
 
     seed_parser = subparsers.add_parser("seed", help="Insert sample tasks")
 
+    summary_parser = subparsers.add_parser("summary", help="Show task totals")
+    summary_parser.add_argument("--today", help="Date to count overdue tasks from (YYYY-MM-DD)")
+
+    due_parser = subparsers.add_parser("due", help="Show overdue tasks and those due soon")
+    due_parser.add_argument("--today", help="Date to measure from (YYYY-MM-DD)")
+    due_parser.add_argument(
+        "--days", type=int, default=7, help="Also show tasks due within this many days"
+    )
+    due_parser.add_argument("-n", "--limit", type=int, help="Show at most this many tasks")
+    due_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and print tasks as they become due or overdue",
+    )
+    due_parser.add_argument(
+        "--interval", type=float, default=60, help="Seconds between checks with --watch"
+    )
+
+    history_parser = subparsers.add_parser("history", help="Show how a task has changed")
+    history_parser.add_argument("task_id", type=int, help="ID of the task")
+    history_parser.add_argument(
+        "--as-of", help="Show the task as it was at this UTC time (YYYY-MM-DD[ HH:MM:SS])"
+    )
+    history_parser.add_argument(
+        "--compact",
+        type=float,
+        metavar="DAYS",
+        help="First drop history older than this many days",
+    )
+
     done_parser = subparsers.add_parser("done", help="Mark task as done")
     done_parser.add_argument("task_id", type=int, help="ID of the task to mark as done")
 
     delete_parser = subparsers.add_parser("delete", help="Delete a task")
     delete_parser.add_argument("task_id", type=int, help="ID of the task to delete")
 
+    import_parser = subparsers.add_parser("import", help="Import tasks from CSV or JSON Lines")
+    import_parser.add_argument(
+        "file", nargs="?", default="-", help="File to read (default: standard input)"
+    )
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format")
+    import_parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Rows sent to SQLite per batch"
+    )
+    import_parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update the existing tasks named by the id column instead of adding",
+    )
+
+    export_parser = subparsers.add_parser("export", help="Export tasks as CSV or JSON Lines")
+    export_parser.add_argument(
+        "file", nargs="?", default="-", help="File to write (default: standard output)"
+    )
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], help="Output format")
+
     edit_parser = subparsers.add_parser("edit", help="Edit an existing task")
     edit_parser.add_argument("task_id", type=int, help="ID of the task to edit")
     edit_parser.add_argument("-d", "--description", help="New description")
     edit_parser.add_argument("-p", "--priority", type=int, help="New priority")
-    edit_parser.add_argument("--due-date", help="New due date")
+    edit_parser.add_argument("--due-date", help="New due date as YYYY-MM-DD")
     edit_parser.add_argument(
         "--status",
         choices=["not started", "in progress", "done"],
         help="Updated status",
     )
 
-    args = parser.parse_args()
-    tracker = TaskTracker(populate_dummy=True)
+    subparsers.add_parser(
+        "serve", help="Keep the database open and answer commands sent to --socket"
+    )
+    return parser
+
 
+def run_command(
+    tracker: "TaskTracker", args: argparse.Namespace, parser: argparse.ArgumentParser
+) -> None:
+    """Run a parsed CLI command, writing its output to sys.stdout/sys.stderr."""
     if args.command == "add":
-        tracker.add_task(args.description, args.priority, args.due_date, args.status)
+        try:
+            tracker.add_task(args.description, args.priority, args.due_date, args.status)
+        except ValueError as exc:
+            parser.error(str(exc))
+    elif args.command == "list" and args.explain:
+        # the same query list would run with these arguments
+        plans = tracker.explain_list_tasks(
+            show_all=args.all or args.status is not None,
+            ascending=args.asc,
+            sort_by=args.sort_by,
+            search=args.search,
+            status=args.status,
+            limit=args.limit,
+        )
+        for name, details in plans.items():
+            for detail in details:
+                print(f"{name}: {detail}")
+            if any("TEMP B-TREE" in detail for detail in details):
+                print(f"{name}: WARNING query sorts with a temporary B-tree")
     elif args.command == "list":
-        tasks = tracker.list_tasks(args.all, ascending=args.asc, sort_by=args.sort_by)
-        for tid, desc, priority, due, done in tasks:
-            status = "done" if done else "pending"
-            due_info = f" due {due}" if due else ""
-            print(f"[{tid}] (p={priority}) {desc}{due_info} - {status}")
+        fields = args.fields.split(",") if args.fields else EXPORT_FIELDS
+        try:
+            tasks = tracker.iter_tasks(
+                args.all or args.status is not None,
+                ascending=args.asc,
+                sort_by=args.sort_by,
+                search=args.search,
+                status=args.status,
+                limit=args.limit,
+                fields=fields,
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+        if args.format == "text" and not args.fields:
+            for task in tasks:
+                state = "done" if task["done"] else "pending"
+                due_info = f" due {task['due_date']}" if task["due_date"] else ""
+                print(
+                    f"[{task['id']}] (p={task['priority']}) {task['description']}"
+                    f"{due_info} - {state}"
+                )
+        else:
+            _write_records(sys.stdout, args.format, tasks, fields)
+    elif args.command == "due":
+        try:
+            tasks = tracker.due_tasks(args.today, args.days, args.limit)
+            scheduler = DueScheduler(tracker, args.today) if args.watch else None
+        except ValueError as exc:
+            parser.error(str(exc))
+        today = args.today or datetime.date.today().isoformat()
+        for task_id, description, priority, due_date, _ in tasks:
+            kind = "overdue" if due_date < today else "due" if due_date == today else "upcoming"
+            print(f"{kind}: [{task_id}] (p={priority}) {description} due {due_date}")
+        while scheduler is not None:
+            sys.stdout.flush()
+            time.sleep(args.interval)
+            for kind, task_id, description, priority, due_date, _ in scheduler.poll():
+                print(f"{kind}: [{task_id}] (p={priority}) {description} due {due_date}")
+    elif args.command == "history":
+        if args.compact is not None:
+            print(f"dropped {tracker.compact_history(args.compact)} history entries")
+        if args.as_of:
+            try:
+                task = tracker.task_as_of(args.task_id, args.as_of)
+            except ValueError as exc:
+                parser.error(str(exc))
+            print(json.dumps(task))
+        else:
+            for seq, at, op, changes in tracker.task_history(args.task_id):
+                print(f"{seq} {at} {op}" + (f" {json.dumps(changes)}" if changes else ""))
     elif args.command == "done":
         tracker.mark_done(args.task_id)
     elif args.command == "delete":
         tracker.delete_task(args.task_id)
     elif args.command == "seed":
         tracker.seed_dummy_tasks()
+    elif args.command == "summary":
+        summary = tracker.summary(args.today)
+        for status, count in summary["by_status"].items():
+            print(f"{status}: {count}")
+        print(f"open: {summary['open']}")
+        print(f"overdue: {summary['overdue']}")
+        print(f"due this week: {summary['due_this_week']}")
+    elif args.command == "import":
+        fmt = _guess_format(args.file, args.format)
+        started = time.perf_counter()
+        with _open_stream(args.file, "r") as stream:
+            records = _read_records(stream, fmt)
+            if args.update:
+                count = tracker.bulk_update(records, batch_size=args.batch_size)
+            else:
+                count = tracker.bulk_add(records, batch_size=args.batch_size)
+        _report_rate("Updated" if args.update else "Imported", count, started)
+    elif args.command == "export":
+        fmt = _guess_format(args.file, args.format)
+        started = time.perf_counter()
+        with _open_stream(args.file, "w") as stream:
+            count = _write_records(stream, fmt, tracker.export_tasks())
+        _report_rate("Exported", count, started)
     elif args.command == "edit":
-        tracker.update_task(
-            args.task_id,
-            description=args.description,
-            priority=args.priority,
-            due_date=args.due_date,
-            status=args.status,
-        )
+        try:
+            tracker.update_task(
+                args.task_id,
+                description=args.description,
+                priority=args.priority,
+                due_date=args.due_date,
+                status=args.status,
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+
+
+# Commands a daemon may run for the CLI. import and export stream files and
+# standard input/output, so they always run in the calling process.
+FORWARDED_COMMANDS = ("add", "list", "done", "delete", "edit", "seed", "summary", "due", "history")
+
+
+class _Relay:
+    """Text stream that sends what is written to a daemon client as messages."""
+
+    def __init__(self, stream, kind: str, buffer_size: int = 65536):
+        self.stream = stream
+        self.kind = kind
+        self.buffer_size = buffer_size
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self.parts:
+            self.stream.write(json.dumps({self.kind: "".join(self.parts)}) + "\n")
+            self.parts, self.size = [], 0
+        self.stream.flush()
+
+
+def _answer(conn: socket.socket, tracker: "TaskTracker", parser: argparse.ArgumentParser) -> None:
+    """Run one forwarded command and stream its output back to the client.
+
+    The request is a JSON line {"cwd": path, "argv": [...]}. The reply is
+    a series of {"out": text} and {"err": text} lines ending with {"exit":
+    code}, or a single {"refused": reason} when the command was not run
+    because it is not forwardable or names another database.
+    """
+    with conn.makefile("rw", encoding="utf-8", newline="\n") as stream:
+        line = stream.readline()
+        if not line:
+            return  # connected without a request, e.g. a liveness probe
+        request = json.loads(line)
+        out, err = _Relay(stream, "out"), _Relay(stream, "err")
+        code = 0
+        refused = None
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                args = parser.parse_args(request["argv"])
+                db = (Path(request["cwd"]) / args.db).resolve()
+                if args.command not in FORWARDED_COMMANDS or getattr(args, "watch", False):
+                    refused = f"{args.command} runs in the calling process"
+                elif db != Path(tracker.db_path).resolve():
+                    refused = f"serving {tracker.db_path}"
+                else:
+                    run_command(tracker, args, parser)
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+            except Exception as exc:
+                print(f"error: {exc}", file=sys.stderr)
+                code = 1
+        if refused is not None:
+            stream.write(json.dumps({"refused": refused}) + "\n")
+            return
+        out.flush()
+        err.flush()
+        stream.write(json.dumps({"exit": code}) + "\n")
+
+
+def serve(db_path: str, socket_path: str, parser: argparse.ArgumentParser) -> None:
+    """Answer CLI commands sent to ``socket_path`` until interrupted.
+
+    The database is opened once, so forwarded commands skip interpreter
+    imports, connection setup and schema checks. Commands run one at a
+    time in arrival order.
+    """
+    if os.path.exists(socket_path):
+        with contextlib.suppress(OSError), socket.socket(socket.AF_UNIX) as probe:
+            probe.connect(socket_path)
+            raise SystemExit(f"a daemon is already listening on {socket_path}")
+        os.unlink(socket_path)
+    tracker = TaskTracker(db_path, populate_dummy=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # stop cleanly, removing the socket file, when terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.bind(socket_path)
+        server.listen()
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    _answer(conn, tracker, parser)
+                except (OSError, ValueError, KeyError) as exc:
+                    # broken request or client gone; keep serving the others
+                    logger.warning("daemon request failed: %s", exc)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        with contextlib.suppress(OSError):
+            os.unlink(socket_path)
+        tracker.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        if not args.socket:
+            parser.error("serve needs --socket or TASK_TRACKER_SOCKET")
+        serve(args.db, args.socket, parser)
+        return
+    try:
+        if args.socket and args.command in FORWARDED_COMMANDS:
+            code = forward(args.socket, argv)
+            if code is not None:
+                sys.stdout.flush()
+                sys.exit(code)
+        tracker = TaskTracker(args.db, populate_dummy=True, maintenance="off")
+        run_command(tracker, args, parser)
+        sys.stdout.flush()
+        # the command's writes only flagged an overlong log; trim it on the way out
+        if tracker.maintenance_due():
+            tracker.maintain()
+    except BrokenPipeError:
+        # the reader went away, e.g. output piped into head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 
 if __name__ == "__main__":
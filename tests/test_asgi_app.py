@@ -0,0 +1,133 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Ensure the package root is on the path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import asgi_app
+import web_app
+from task_tracker import TaskTracker
+
+
+def call(method, path, body=b"", query=b"", headers=()):
+    """Send one request through the ASGI app and return (status, headers, body)."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": list(headers),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start, payload = sent
+    return start["status"], dict(start["headers"]), payload["body"]
+
+
+def test_asgi_routes(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    web_app.tracker = tracker
+
+    status, headers, _ = call("POST", "/add", b"description=async+task&priority=3&due_date=2024-01-10")
+    assert status == 302 and headers[b"location"] == b"/"
+    call("POST", "/add", b"description=other&priority=1&due_date=2024-01-05")
+
+    status, _, body = call("GET", "/", query=b"sort=due_asc")
+    assert status == 200
+    page = body.decode()
+    assert page.index("other") < page.index("async task")
+
+    task_id = tracker.list_tasks()[0][0]
+    status, _, body = call("GET", f"/edit/{task_id}")
+    assert status == 200 and b'value="async task"' in body
+    call("POST", f"/edit/{task_id}", b"description=edited&priority=2")
+    assert call("POST", f"/comment/{task_id}", b"comment=hi&color=%23ff0000")[0] == 204
+    assert tracker.get_task(task_id)[:2] == ("edited", 2)
+    assert tracker.get_task(task_id)[4:] == ("hi", "#ff0000")
+
+    call("POST", f"/done/{task_id}")
+    assert len(tracker.list_tasks()) == 1
+    call("POST", f"/delete/{task_id}")
+    assert tracker.count_tasks(show_all=True) == 1
+
+    assert call("GET", "/add")[0] == 405
+    assert call("GET", "/missing")[0] == 404
+    assert call("POST", "/add", b"priority=1")[0] == 400
+    status, _, body = call("POST", "/add", b"description=x&due_date=tomorrow")
+    assert status == 400 and b"YYYY-MM-DD" in body
+    assert call("POST", "/edit/1", b"due_date=tomorrow")[0] == 400
+
+
+def test_asgi_conditional_get(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    tracker.add_task("etag task")
+    web_app.tracker = tracker
+
+    status, headers, _ = call("GET", "/")
+    etag = headers[b"etag"]
+    status, _, body = call("GET", "/", headers=[(b"if-none-match", etag)])
+    assert status == 304 and body == b""
+    tracker.add_task("another")
+    assert call("GET", "/", headers=[(b"if-none-match", etag)])[0] == 200
+
+
+def test_asgi_event_stream(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    web_app.tracker = tracker
+    task_id = tracker.add_task("streamed")
+    tracker.update_task(task_id, priority=4)
+
+    scope = {"type": "http", "method": "GET", "path": "/events", "query_string": b"since=0", "headers": []}
+    sent = []
+
+    async def receive():
+        if not sent:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # hang up once the backlog has been delivered
+        while len(sent) < 3:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asyncio.wait_for(asgi_app.app(scope, receive, send), timeout=5))
+    assert sent[0]["status"] == 200
+    assert dict(sent[0]["headers"])[b"content-type"] == b"text/event-stream"
+    assert sent[1]["body"] == b"retry: 3000\n\n"
+    events = sent[2]["body"].decode()
+    assert events.count("event: change") == 2 and '"op": "update"' in events
+    tracker.close()
+
+
+def test_asgi_assets_rows_and_compression(tmp_path):
+    import gzip
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    for i in range(12):
+        tracker.add_task(f"row {i:02d}")
+    web_app.tracker = tracker
+
+    _, headers, body = call("GET", "/", headers=[(b"accept-encoding", b"gzip")])
+    assert headers[b"content-encoding"] == b"gzip"
+    page = gzip.decompress(body).decode()
+    script = web_app.ASSET_URLS["app.js"]
+    assert script in page and "function openComment" not in page
+
+    status, headers, body = call("GET", script, headers=[(b"accept-encoding", b"gzip;q=0")])
+    assert status == 200 and b"content-encoding" not in headers
+    assert b"immutable" in headers[b"cache-control"] and b"function openComment" in body
+    assert call("GET", "/static/app.js")[0] == 404
+
+    status, _, body = call("GET", "/rows", query=b"sort=asc")
+    rows = body.decode()
+    assert rows.startswith("<tbody") and "row 00" in rows and "<html" not in rows
@@ -0,0 +1,36 @@
+import json
+import sys
+from pathlib import Path
+
+# Ensure the package root and the benchmarks are on the path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import suite
+from synthetic import generate_tasks
+
+
+def test_synthetic_data_is_reproducible():
+    first = list(generate_tasks(500, seed=3))
+    assert first == list(generate_tasks(500, seed=3))
+    assert first != list(generate_tasks(500, seed=4))
+    statuses = [task["status"] for task in first]
+    assert statuses.count("not started") > statuses.count("done") > 0
+    assert 50 < sum(task["due_date"] is None for task in first) < 200
+
+
+def test_suite_report(tmp_path):
+    import web_app
+
+    saved = web_app.tracker
+    try:
+        report = suite.run([200], repeat=2, seed=0, db_dir=str(tmp_path))
+    finally:
+        web_app.tracker = saved
+    json.dumps(report)
+    names = {result["name"] for result in report["results"]}
+    assert {"bulk_add", "list_tasks.priority.page1", "count_tasks.status", "GET /"} <= names
+    timed = [r for r in report["results"] if r["kind"] != "load"]
+    assert all(r["repeat"] == 2 and r["min_ms"] <= r["median_ms"] for r in timed)
+    assert suite.compare(report, report)
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+# Ensure the package root is on the path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from due_scheduler import DueScheduler
+from task_tracker import TaskTracker
+
+
+def kinds(events):
+    return [(kind, description) for kind, _, description, _, _, _ in events]
+
+
+def test_events_follow_the_clock_and_changes(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    tracker.add_task("already late", due_date="2024-05-01")
+    tomorrow = tracker.add_task("tomorrow", due_date="2024-06-02")
+    tracker.add_task("in three days", due_date="2024-06-04")
+    finished = tracker.add_task("finished", due_date="2024-06-02")
+    tracker.add_task("no date")
+
+    scheduler = DueScheduler(tracker, today="2024-06-01")
+    assert scheduler.poll("2024-06-01") == []
+
+    # changes onto days already reached are reported against the last poll
+    tracker.add_task("added late", due_date="2024-05-20")
+    tracker.add_task("added today", due_date="2024-06-01")
+    tracker.add_task("added later", due_date="2024-06-03")
+    tracker.update_task(tomorrow, comment="not a reschedule")
+    tracker.mark_done(finished)
+    assert kinds(scheduler.poll("2024-06-01")) == [("overdue", "added late"), ("due", "added today")]
+    assert scheduler.poll("2024-06-01") == []
+
+    assert kinds(scheduler.poll("2024-06-02")) == [("overdue", "added today"), ("due", "tomorrow")]
+    # skipping days reports everything passed as overdue
+    assert kinds(scheduler.poll("2024-06-05")) == [
+        ("overdue", "tomorrow"), ("overdue", "added later"), ("overdue", "in three days")
+    ]
+    assert scheduler.poll("2024-06-01") == [] and scheduler.day.isoformat() == "2024-06-05"
+
+    # rescheduling and reopening count as changes
+    tracker.update_task(tomorrow, due_date="2024-06-05")
+    tracker.update_task(finished, status="in progress")
+    assert kinds(scheduler.poll("2024-06-05")) == [("due", "tomorrow"), ("overdue", "finished")]
+    tracker.close()
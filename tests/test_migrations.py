@@ -0,0 +1,188 @@
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import pytest
+
+# Ensure the package root and the benchmarks are on the path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import migration
+import migrations
+from synthetic import populate_legacy
+from task_tracker import COUNT_SCANS, EXPORT_FIELDS, TaskTracker
+
+
+def test_backfill_commits_between_chunks(tmp_path):
+    db = str(tmp_path / "tasks.db")
+    populate_legacy(db, 5000)
+    tracker = TaskTracker(db, backfill="off")
+    assert tracker.run_backfills(chunks=1) == 1
+
+    # the first chunk is committed and seen by other connections, the rest
+    # is not touched yet
+    other = sqlite3.connect(db, timeout=0)
+    stale = "SELECT COUNT(*) FROM tasks WHERE done=1 AND status<>'done' AND id {}"
+    assert other.execute(stale.format("<= 2000")).fetchone()[0] == 0
+    assert other.execute(stale.format("> 2000")).fetchone()[0] > 0
+    # and the write lock is free between chunks
+    other.execute("INSERT INTO tasks(description, done, status) VALUES ('between chunks', 1, 'done')")
+    other.commit()
+    other.close()
+    tracker.close()
+
+    # writes from another tracker succeed while the rest runs in the background
+    background = TaskTracker(db, backfill="background", backfill_pause=0.05)
+    writer = TaskTracker(db, backfill="off")
+    written = []
+    while migrations.pending(writer.conn):
+        written.append(writer.add_task(f"during the backfill {len(written)}"))
+    background.close()
+    assert written and migrations.pending(writer.conn) == []
+    assert writer.count_tasks(search="during the backfill", show_all=True) == len(written)
+    assert writer.conn.execute(stale.format("> 0")).fetchone()[0] == 0
+    writer.close()
+
+
+@pytest.mark.skipif(not os.environ.get("TIMING_TESTS"), reason="set TIMING_TESTS=1 to run timing tests")
+def test_online_upgrade_keeps_writes_fast(tmp_path):
+    report = migration.run(30000, db_dir=str(tmp_path))
+    blocking, online = report["results"]
+    assert blocking["failed_writes"] == online["failed_writes"] == 0
+    # a write waits for at most one chunk instead of a whole backfill
+    assert online["writes"] > blocking["writes"]
+    assert online["write_max_ms"] * 3 < blocking["write_max_ms"]
+
+
+def _progress(db):
+    conn = sqlite3.connect(db)
+    try:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT name, done_id, changed, finished FROM schema_backfills")}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def test_backfill_resumes_after_crash(tmp_path):
+    db = str(tmp_path / "tasks.db")
+    populate_legacy(db, 20000)
+    child = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys, time; from task_tracker import TaskTracker;"
+         " TaskTracker(sys.argv[1], backfill='background', backfill_pause=0.2); time.sleep(60)", db],
+        cwd=ROOT,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while _progress(db).get("status_from_done", (0,))[0] < 4000:
+            assert time.monotonic() < deadline and child.poll() is None
+            time.sleep(0.05)
+    finally:
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+    done_id, changed, finished = _progress(db)["status_from_done"]
+    assert 4000 <= done_id < 20000 and finished is None
+
+    # another process writes before the backfill is picked up again
+    tracker = TaskTracker(db, backfill="off")
+    assert migrations.pending(tracker.conn) == [
+        "status_from_done", "task_counts", "normalize_due_dates", "history_checkpoints"
+    ]
+    added = tracker.add_task("after the crash", due_date="20240610")
+    before = tracker.get_task_record(1)
+    tracker.mark_done(1)
+    assert tracker.run_backfills(chunks=2) == 2
+    assert tracker.backfill_progress()[0]["done_id"] == done_id + 4000
+
+    # part way through counting, counts come from the tasks; writes to rows
+    # on either side of the counted range are counted once
+    while migrations.pending(tracker.conn)[0] != "task_counts":
+        tracker.run_backfills(chunks=1)
+    tracker.run_backfills(chunks=2)
+    assert migrations.pending(tracker.conn)[0] == "task_counts"
+    tracker.update_task(2, status="in progress", due_date="2024-07-01")
+    tracker.update_task(15000, status="in progress", due_date="2024-07-01")
+    tracker.delete_task(3)
+    tracker.delete_task(15001)
+    scanned = dict(tracker.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+    assert tracker.summary()["by_status"] == scanned
+    assert tracker.count_tasks(show_all=True) == 19999
+    tracker.run_backfills()
+    assert migrations.pending(tracker.conn) == []
+
+    conn = tracker.conn
+    legacy_done = conn.execute("SELECT COUNT(*) FROM tasks WHERE done=1 AND id <= 20000").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM tasks WHERE done=1 AND status<>'done'").fetchone()[0] == 0
+    # every row was visited once: mark_done(1) did task 1 itself if it was open
+    assert tracker.backfill_progress()[0]["changed"] in (legacy_done, legacy_done - 1)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM tasks WHERE due_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    ).fetchone()[0] == 0
+    assert tracker.get_task_record(added)["due_date"] == "2024-06-10"
+    actual = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+    assert tracker.summary()["by_status"] == actual
+    assert sorted(conn.execute("SELECT * FROM task_due_counts WHERE n > 0")) == sorted(
+        conn.execute(f"SELECT * FROM {COUNT_SCANS['task_due_counts']}")
+    )
+    # the history starts from each older task as it was before its first change
+    start = conn.execute("SELECT seq FROM task_history_start").fetchone()[0]
+    assert tracker.task_as_of(1, start) == before
+    assert len(tracker.tasks_as_of(start)) == 20000
+    tracker.close()
+
+
+def test_created_databases_have_no_backfills(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"), backfill="background")
+    assert tracker.backfill_progress() == [] and tracker.run_backfills() == 0
+    with pytest.raises(ValueError):
+        TaskTracker(str(tmp_path / "tasks.db"), backfill="later")
+    tracker.close()
+
+
+def test_whole_table_history_snapshots_become_checkpoints(tmp_path):
+    db = str(tmp_path / "tasks.db")
+    tracker = TaskTracker(db)
+    kept = tracker.add_task("kept", priority=2)
+    gone = tracker.add_task("gone")
+    tracker.close()
+
+    # a schema version 5 database, whose history starts from a compressed
+    # copy of the whole table with the entries before it compacted away
+    conn = sqlite3.connect(db)
+    rows = conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM tasks ORDER BY id").fetchall()
+    conn.executescript(
+        "DROP TABLE task_checkpoints; DROP TABLE task_history_start;"
+        " DROP TRIGGER task_history_baseline_update; DROP TRIGGER task_history_baseline_delete;"
+        " DELETE FROM schema_backfills; DELETE FROM task_history;"
+        " CREATE TABLE task_snapshots (seq INTEGER PRIMARY KEY,"
+        " at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')), tasks BLOB NOT NULL);"
+        " PRAGMA user_version = 5;"
+    )
+    start = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'task_history'").fetchone()[0]
+    conn.execute(
+        "INSERT INTO task_snapshots(seq, tasks) VALUES (?, ?)",
+        (start, zlib.compress(json.dumps(rows).encode())),
+    )
+    conn.execute("UPDATE tasks SET description = 'renamed' WHERE id = ?", (kept,))
+    conn.execute("DELETE FROM tasks WHERE id = ?", (gone,))
+    conn.commit()
+    conn.close()
+
+    tracker = TaskTracker(db)
+    assert [t["description"] for t in tracker.tasks_as_of(start)] == ["kept", "gone"]
+    assert tracker.task_as_of(kept, start + 1)["description"] == "renamed"
+    assert tracker.tasks_as_of(start + 2) == [tracker.get_task_record(kept)]
+    assert not tracker.conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'task_snapshots'"
+    ).fetchone()
+    tracker.close()
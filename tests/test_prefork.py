@@ -0,0 +1,91 @@
+import http.client
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Ensure the package root is on the path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from web_app import ProcessLocal
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_process_local_is_remade_after_fork():
+    made = ProcessLocal(lambda: [os.getpid()])
+    parent = made.get()
+    assert made.get() is parent and made.count(os.getpid()) == 1
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write, str(made.get()[0]).encode())
+        finally:
+            os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert int(os.read(read, 100)) == pid
+    os.close(read)
+    assert made.get() is parent
+
+
+def wait_for(predicate, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+
+def test_workers_reload_and_stop(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    log = tmp_path / "server.log"
+    with open(log, "w") as out:
+        master = subprocess.Popen(
+            [sys.executable, str(ROOT / "prefork.py"), "--host", "127.0.0.1", "--port", str(port),
+             "--workers", "2"],
+            cwd=tmp_path, stdout=out, stderr=out,
+        )
+
+    def get(path):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+
+    def lines(word):
+        return [line for line in log.read_text().splitlines() if f" {word}" in line]
+
+    try:
+        wait_for(lambda: len(lines("started")) == 2)
+        wait_for(lambda: _answers(get))
+        assert all(get("/api/tasks") == 200 for _ in range(10))
+
+        master.send_signal(signal.SIGHUP)
+        wait_for(lambda: len(lines("stopped")) == 2)
+        assert len(lines("started")) == 4
+        assert all(get("/api/tasks") == 200 for _ in range(10))
+    finally:
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+    assert len(lines("stopped")) == 4
+    assert "Traceback" not in log.read_text()
+    # the workers opened the new database together; only one seeded it
+    conn = sqlite3.connect(str(tmp_path / "tasks.db"))
+    assert conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 5
+    conn.close()
+
+
+def _answers(get) -> bool:
+    try:
+        return get("/") == 200
+    except OSError:
+        return False
@@ -0,0 +1,73 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure the package root is on the path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sharding import ShardedTaskTracker
+
+
+def fill(tracker, count=60):
+    rng = random.Random(7)
+    ids = []
+    for i in range(count):
+        due = rng.choice([None, "2024-03-01", "2024-03-02", "2024-04-10"])
+        ids.append(
+            tracker.add_task(
+                f"task {i}", priority=rng.randint(1, 3), due_date=due, project=f"p{i % 7}"
+            )
+        )
+    return ids
+
+
+def test_scatter_gather_matches_a_single_sort(tmp_path):
+    tracker = ShardedTaskTracker(str(tmp_path / "shards"), shards=3)
+    ids = fill(tracker)
+    assert len(set(ids)) == len(ids)
+    assert {task_id % 3 for task_id in ids} == {0, 1, 2}
+
+    rows = tracker.list_tasks(show_all=True)
+    expected = sorted(rows, key=lambda r: (-r[2], r[3] or "", r[0]))
+    assert rows == expected and len(rows) == 60
+    by_due = tracker.list_tasks(show_all=True, sort_by="due", ascending=True)
+    assert by_due == sorted(rows, key=lambda r: (r[3] or "9999-12-31", -r[2], r[0]))
+    by_due_desc = tracker.list_tasks(show_all=True, sort_by="due")
+    assert by_due_desc == sorted(
+        rows, key=lambda r: (r[3] or "0001-01-01", r[2], r[0]), reverse=True
+    )
+    assert tracker.list_tasks(show_all=True, limit=10, offset=25) == rows[25:35]
+    assert tracker.count_tasks(show_all=True) == 60
+    tracker.close()
+
+
+def test_routing_by_project_and_id(tmp_path):
+    tracker = ShardedTaskTracker(str(tmp_path / "shards"), shards=3)
+    ids = fill(tracker, 21)
+
+    project_rows = tracker.list_tasks(show_all=True, project="p2")
+    assert [row[1] for row in project_rows] and all(
+        int(row[1].split()[1]) % 7 == 2 for row in project_rows
+    )
+    assert tracker.count_tasks(show_all=True, project="p2") == len(project_rows)
+
+    target = ids[4]
+    tracker.update_task(target, description="renamed", priority=3)
+    assert tracker.get_task(target)[:2] == ("renamed", 3)
+    record = tracker.get_task_record(target)
+    assert record["id"] == target and record["project"] == "p4"
+    tracker.mark_done(target)
+    assert tracker.count_tasks() == 20
+    tracker.delete_task(target)
+    assert tracker.get_task(target) is None
+    assert tracker.count_tasks(show_all=True) == 20
+    tracker.close()
+
+
+def test_shard_count_is_fixed(tmp_path):
+    ShardedTaskTracker(str(tmp_path / "shards"), shards=2).close()
+    with pytest.raises(ValueError):
+        ShardedTaskTracker(str(tmp_path / "shards"), shards=4)
+    ShardedTaskTracker(str(tmp_path / "shards"), shards=2).close()
@@ -1,7 +1,11 @@
 import os
+import re
+import sqlite3
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure the package root is on the path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -82,3 +86,849 @@ def test_web_app(tmp_path):
         client.post(f'/edit/{tid}', data={'description': 't2 edited', 'priority': '2', 'due_date': '2024-01-06'})
         assert 't2 edited' in client.get('/').data.decode()
 
+
+
+def test_list_queries_use_sort_indexes(tmp_path, capsys):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    for sort_by in ("priority", "due"):
+        for ascending in (False, True):
+            for show_all in (False, True):
+                for status in (None, "in progress"):
+                    plans = tracker.explain_list_tasks(
+                        show_all=show_all,
+                        ascending=ascending,
+                        sort_by=sort_by,
+                        status=status,
+                        limit=10,
+                    )
+                    assert not any("TEMP B-TREE" in line for line in plans["list"])
+                    assert any("USING INDEX idx_tasks_" in line for line in plans["list"])
+    plans = tracker.explain_list_tasks(show_all=True, status="done")
+    assert plans["count"] == ["SEARCH task_counts USING PRIMARY KEY (status=?)"]
+
+    # --explain shows the plans for the query the same list command runs
+    from task_tracker import main
+
+    main(["--db", tracker.db_path, "list", "--explain", "-s", "milk", "--status", "done"])
+    lines = capsys.readouterr().out.splitlines()
+    for name in ("list", "count"):
+        assert any(line.startswith(f"{name}: ") and "tasks_fts" in line for line in lines)
+    assert "count: SEARCH tasks USING COVERING INDEX idx_tasks_status (status=?)" in lines
+
+
+def test_sort_ties_are_broken_by_id(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    for name in ("a", "b", "c"):
+        tracker.add_task(name, priority=2)
+
+    assert [t[1] for t in tracker.list_tasks()] == ["a", "b", "c"]
+    assert [t[1] for t in tracker.list_tasks(limit=2, offset=1)] == ["b", "c"]
+    assert [t[1] for t in tracker.list_tasks(offset=2)] == ["c"]
+
+
+def test_full_text_search(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    tracker.add_task("Buy oat milk", priority=1)
+    tracker.add_task("Write report", priority=3, comment="quarterly milk numbers")
+    tracker.add_task("Call plumber", priority=2)
+
+    assert tracker.fts_enabled
+    assert {t[1] for t in tracker.list_tasks(search="milk")} == {"Buy oat milk", "Write report"}
+    assert [t[1] for t in tracker.list_tasks(search="plumb")] == ["Call plumber"]
+    assert tracker.count_tasks(search="milk") == 2
+    ranked = tracker.list_tasks(search="milk oat", sort_by="relevance")
+    assert [t[1] for t in ranked] == ["Buy oat milk"]
+
+    tracker.update_task(3, description="Call electrician")
+    assert tracker.list_tasks(search="plumb") == []
+    assert [t[1] for t in tracker.list_tasks(search="electric")] == ["Call electrician"]
+    tracker.delete_task(1)
+    assert [t[1] for t in tracker.list_tasks(search="milk")] == ["Write report"]
+
+    tracker.fts_enabled = False  # LIKE fallback used without FTS5
+    assert [t[1] for t in tracker.list_tasks(search="lectric")] == ["Call electrician"]
+
+
+def test_full_text_index_backfilled_for_old_databases(tmp_path):
+    import sqlite3
+
+    db_path = tmp_path / "tasks.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 1, done INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("INSERT INTO tasks(description, priority, done) VALUES ('legacy task', 2, 1)")
+    conn.commit()
+    conn.close()
+
+    tracker = TaskTracker(str(db_path))
+    tasks = tracker.list_tasks(show_all=True, search="legacy", with_status=True)
+    assert [(t[1], t[5]) for t in tasks] == [("legacy task", "done")]
+
+
+def test_keyset_pages_match_full_listing(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    for i in range(23):
+        due = None if i % 4 == 0 else f"2024-05-{i % 7 + 1:02d}"
+        tracker.add_task(f"task {i} report", priority=i % 3 + 1, due_date=due)
+
+    for sort_by in ("priority", "due", "relevance"):
+        for ascending in (False, True):
+            args = dict(sort_by=sort_by, ascending=ascending, search="report")
+            expected = tracker.list_tasks(**args)
+            pages = []
+            tasks, next_cursor, prev_cursor = tracker.list_tasks_page(limit=5, **args)
+            assert prev_cursor is None
+            pages.append(tasks)
+            while next_cursor:
+                tasks, next_cursor, prev_cursor = tracker.list_tasks_page(
+                    limit=5, after=next_cursor, **args
+                )
+                pages.append(tasks)
+            assert [t for page in pages for t in page] == expected
+            assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+
+            # walk back from the last page
+            back = [pages[-1]]
+            while prev_cursor:
+                tasks, _, prev_cursor = tracker.list_tasks_page(
+                    limit=5, before=prev_cursor, **args
+                )
+                back.insert(0, tasks)
+            assert back == pages
+
+    _, next_cursor, _ = tracker.list_tasks_page(limit=5)
+    try:
+        tracker.list_tasks_page(sort_by="due", after=next_cursor)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("cursor from another sort order accepted")
+    import base64
+    import json
+
+    import pytest
+
+    for key in (5, [5], [[1], "x", 2], {"a": 1}):
+        crafted = base64.urlsafe_b64encode(json.dumps(["priority_desc", key]).encode()).decode()
+        with pytest.raises(ValueError, match="Invalid page cursor"):
+            tracker.list_tasks_page(after=crafted)
+
+    query, params = tracker._list_query(
+        limit=5, after=(2, "2024-05-03", 7), with_keys=True
+    )
+    # each branch seeks its sort index; only the merged pages get sorted
+    plan = [line for line in tracker.explain(query, params) if "tasks" in line]
+    assert len(plan) == 3
+    assert all(line.startswith("SEARCH tasks USING INDEX idx_tasks_priority") for line in plan)
+
+
+def test_web_app_pagination(tmp_path):
+    import web_app
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    for i in range(12):
+        tracker.add_task(f"paged {i:02d}", priority=1)
+    web_app.tracker = tracker
+    app.config.update({'TESTING': True})
+
+    with app.test_client() as client:
+        body = client.get('/').data.decode()
+        assert 'paged 09' in body and 'paged 10' not in body
+        assert 'Previous' not in body
+        href = re.search(r'href="([^"]*after=[^"]*)">Next', body).group(1)
+        page_two = client.get(href.replace('&amp;', '&')).data.decode()
+        assert 'paged 10' in page_two and 'paged 11' in page_two
+        assert 'Previous' in page_two and 'Next' not in page_two
+        assert client.get('/?after=garbage').status_code == 200
+
+        # the same page's rows alone, for paging in place
+        rows = client.get(href.replace('&amp;', '&').replace('/?', '/rows?')).data.decode()
+        assert rows.startswith('<tbody') and 'paged 10' in rows and 'data-next=""' in rows
+        assert 'data-prev="/?before=' in rows and 'id="filters"' not in rows
+
+
+def test_web_app_static_assets_and_compression(tmp_path):
+    import gzip
+    import web_app
+
+    web_app.tracker = TaskTracker(str(tmp_path / "tasks.db"), populate_dummy=True)
+    with app.test_client() as client:
+        page = client.get('/', headers={'Accept-Encoding': 'br;q=0, gzip'})
+        assert page.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in page.headers['Vary']
+        html = gzip.decompress(page.data).decode()
+        assert web_app.ASSET_URLS['app.css'] in html and '<style>' not in html and '<script>' not in html
+        again = client.get('/', headers={'If-None-Match': page.headers['ETag']})
+        assert again.status_code == 304
+
+        style = client.get(web_app.ASSET_URLS['app.css'])
+        assert style.mimetype == 'text/css' and 'Content-Encoding' not in style.headers
+        assert style.headers['Cache-Control'] == web_app.ASSET_CACHE_CONTROL
+        assert client.get('/static/app.css').status_code == 404
+        # small responses are sent as they are
+        assert 'Content-Encoding' not in client.get('/api/summary', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_bulk_add_update_and_export(tmp_path):
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    records = ({"description": f"bulk {i}", "priority": str(i % 5 + 1)} for i in range(250))
+    assert tracker.bulk_add(records, batch_size=100) == 250
+    assert tracker.count_tasks() == 250
+
+    updated = tracker.bulk_update(
+        [{"id": 1, "status": "done"}, {"id": 2, "description": "renamed", "priority": 9}],
+        batch_size=1,
+    )
+    assert updated == 2
+    exported = list(tracker.export_tasks())
+    assert len(exported) == 250
+    assert exported[0]["done"] == 1 and exported[0]["status"] == "done"
+    assert exported[1]["description"] == "renamed" and exported[1]["priority"] == 9
+    assert exported[2]["description"] == "bulk 2"
+    assert [t[1] for t in tracker.list_tasks(search="renamed")] == ["renamed"]
+
+    # a failing row rolls back the whole import
+    with pytest.raises(KeyError):
+        tracker.bulk_add([{"description": "ok"}, {"priority": 1}])
+    assert tracker.count_tasks(show_all=True) == 250
+
+    result = tracker.apply_batch(
+        creates=[{"description": "new one"}], updates=[{"id": 3, "priority": 7}], deletes=[4, 5]
+    )
+    assert result == {"created": [251], "updated": 1, "deleted": 2}
+    with pytest.raises(KeyError):
+        tracker.apply_batch(creates=[{"description": "lost"}], deletes=[6], updates=[{"priority": 1}])
+    assert tracker.count_tasks(show_all=True) == 249
+
+    # another process trying to insert while the ids are worked out waits
+    other = sqlite3.connect(tracker.db_path, timeout=0)
+    refused = []
+
+    def insert_elsewhere(statement):
+        if "sqlite_sequence" in statement:
+            try:
+                other.execute("INSERT INTO tasks(description) VALUES ('elsewhere')")
+                other.commit()
+            except sqlite3.OperationalError:
+                refused.append(statement)
+
+    tracker.conn.set_trace_callback(insert_elsewhere)
+    result = tracker.apply_batch(creates=[{"description": "a"}, {"description": "b"}])
+    tracker.conn.set_trace_callback(None)
+    other.close()
+    assert refused and [tracker.get_task_record(i)["description"] for i in result["created"]] == ["a", "b"]
+
+
+def test_pooled_reads_do_not_wait_for_writer(tmp_path):
+    import threading
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"), pooled=True, pool_size=2)
+    assert tracker.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    tracker.add_task("committed")
+
+    results = []
+    with tracker._writing() as conn:
+        conn.execute("INSERT INTO tasks(description) VALUES ('pending')")
+        # the writer is busy, yet another thread can still read
+        reader = threading.Thread(target=lambda: results.append(tracker.list_tasks()))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+    assert [t[1] for t in results[0]] == ["committed"]
+    assert len(tracker.list_tasks()) == 2
+
+    tracker.close()
+
+
+def test_group_commit_batches_writes(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    tracker = TaskTracker(db_path, group_commit_ms=200, group_commit_ops=50)
+    statements = []
+    tracker.conn.set_trace_callback(statements.append)
+
+    futures = [tracker.add_task(f"queued {i}") for i in range(5)]
+    futures.append(tracker.update_task(1, priority=4))
+    bad = tracker.add_task(None)  # violates NOT NULL
+    futures.append(tracker.mark_done(2))
+    tracker.flush()
+
+    assert all(f.done() and f.exception() is None for f in futures)
+    assert isinstance(bad.exception(), sqlite3.IntegrityError)
+    assert statements.count("COMMIT") == 1
+    tasks = tracker.list_tasks(show_all=True, with_status=True)
+    assert len(tasks) == 5
+    assert tasks[0][1:3] == ("queued 0", 4)
+    assert [t[5] for t in tasks if t[1] == "queued 1"] == ["done"]
+
+    tracker.delete_task(3)
+    tracker.close()  # flushes the pending delete
+    assert TaskTracker(db_path).count_tasks(show_all=True) == 4
+
+
+def test_result_cache_invalidated_by_writes(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    tracker = TaskTracker(db_path, cache_size=2)
+    tracker.add_task("cached", priority=2)
+
+    first = tracker.list_tasks()
+    assert tracker.list_tasks() == first
+    assert tracker.count_tasks() == tracker.count_tasks() == 1
+    assert tracker.cache_stats() == {"hits": 2, "misses": 2, "size": 2}
+
+    tracker.mark_done(first[0][0])
+    assert tracker.list_tasks() == []
+    tracker.seed_dummy_tasks()  # table is not empty, nothing to invalidate
+    tracker.update_task(first[0][0], status="in progress")
+    assert len(tracker.list_tasks()) == 1
+
+    # a commit from another connection is noticed too
+    TaskTracker(db_path).add_task("elsewhere")
+    assert len(tracker.list_tasks()) == 2
+
+    # least recently used entries are evicted
+    tracker.list_tasks(sort_by="due")
+    tracker.list_tasks(show_all=True)
+    assert tracker.cache_stats()["size"] == 2
+
+    expiring = TaskTracker(db_path, cache_size=8, cache_ttl=0)
+    expiring.list_tasks()
+    expiring.list_tasks()
+    assert expiring.cache_stats()["hits"] == 0
+
+    # a cached pooled read does not wait for a write in progress
+    import threading
+
+    pooled = TaskTracker(db_path, pooled=True, cache_size=8)
+    pooled.list_tasks()
+    generation = pooled.data_generation()
+    answered = threading.Event()
+    with pooled._write_lock:
+        threading.Thread(target=lambda: (pooled.list_tasks(), answered.set())).start()
+        assert answered.wait(5)
+    assert pooled.cache_stats()["hits"] == 1
+    pooled.add_task("moves the generation")
+    assert pooled.data_generation() != generation
+    pooled.close()
+
+
+def test_web_app_conditional_get(tmp_path):
+    import web_app
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    tracker.add_task("cached page")
+    web_app.tracker = tracker
+    app.config.update({'TESTING': True})
+
+    with app.test_client() as client:
+        first = client.get('/?sort=asc')
+        etag = first.headers['ETag']
+        assert b'cached page' in first.data
+
+        statements = []
+        tracker.conn.set_trace_callback(statements.append)
+        again = client.get('/?sort=asc', headers={'If-None-Match': etag})
+        tracker.conn.set_trace_callback(None)
+        assert again.status_code == 304 and again.data == b''
+        assert not any('tasks' in sql for sql in statements)
+
+        # other query arguments and later writes get a new tag
+        assert client.get('/?sort=desc', headers={'If-None-Match': etag}).status_code == 200
+        client.post('/add', data={'description': 'fresh'})
+        changed = client.get('/?sort=asc', headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and b'fresh' in changed.data
+
+        # another process on the same database, such as a second pre-forked
+        # worker, honours the tag until the data changes
+        etag = changed.headers['ETag']
+        other = web_app.tracker = TaskTracker(tracker.db_path)
+        assert client.get('/?sort=asc', headers={'If-None-Match': etag}).status_code == 304
+        tracker.add_task("from the first worker")
+        assert client.get('/?sort=asc', headers={'If-None-Match': etag}).status_code == 200
+        web_app.tracker = tracker
+        other.close()
+
+
+def test_json_api(tmp_path):
+    import web_app
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    web_app.tracker = tracker
+    app.config.update({'TESTING': True})
+
+    with app.test_client() as client:
+        resp = client.post('/api/tasks', json={'description': 'api task', 'priority': 4})
+        assert resp.status_code == 201
+        task = resp.get_json()
+        assert task['description'] == 'api task' and task['priority'] == 4
+        assert resp.headers['Location'].endswith(f"/api/tasks/{task['id']}")
+
+        resp = client.patch(f"/api/tasks/{task['id']}", json={'status': 'done'})
+        assert resp.get_json()['done'] == 1
+        assert client.get(f"/api/tasks/{task['id']}").get_json()['status'] == 'done'
+
+        assert client.post('/api/tasks', json={'priority': 1}).status_code == 400
+        assert client.post('/api/tasks', json={'description': 'x', 'owner': 'me'}).status_code == 400
+        assert client.patch('/api/tasks/999', json={'priority': 1}).status_code == 404
+
+        resp = client.post('/api/tasks:batch', json={
+            'create': [{'description': f'batch {i}', 'priority': i} for i in range(1, 6)],
+            'update': [{'id': task['id'], 'description': 'renamed'}],
+            'delete': [],
+        })
+        result = resp.get_json()
+        assert result['updated'] == 1 and result['deleted'] == 0
+        assert len(result['created']) == 5
+        assert client.get(f"/api/tasks/{result['created'][-1]}").get_json()['description'] == 'batch 5'
+
+        # an invalid change rejects the whole batch
+        resp = client.post('/api/tasks:batch', json={
+            'create': [{'description': 'ok'}], 'update': [{'id': 1, 'priority': 'high'}]
+        })
+        assert resp.status_code == 400
+        assert tracker.count_tasks(show_all=True) == 6
+
+        page = client.get('/api/tasks?limit=4&fields=id,description&sort=asc').get_json()
+        assert [t['description'] for t in page['tasks']] == ['batch 1', 'batch 2', 'batch 3', 'renamed']
+        assert set(page['tasks'][0]) == {'id', 'description'}
+        rest = client.get(f"/api/tasks?limit=4&sort=asc&after={page['next']}").get_json()
+        assert [t['description'] for t in rest['tasks']] == ['batch 4', 'batch 5']
+        assert rest['next'] is None and rest['prev']
+
+        resp = client.post('/api/tasks:batch', json={'delete': result['created']})
+        assert resp.get_json()['deleted'] == 5
+        assert client.delete(f"/api/tasks/{task['id']}").status_code == 204
+        assert client.get(f"/api/tasks/{task['id']}").status_code == 404
+
+
+def test_metrics_and_slow_query_log(tmp_path):
+    import web_app
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"), slow_query_ms=0)
+    tracker.add_task("measured", priority=2)
+    tracker.list_tasks(limit=5)
+    assert tracker.metrics.value("task_tracker_call_seconds", method="list_tasks") == 1
+    assert tracker.metrics.value("task_tracker_call_seconds", method="add_task") == 1
+
+    slow = tracker.slow_queries()
+    select = next(entry for entry in slow if entry['sql'].startswith('SELECT'))
+    assert select['sql'].endswith('LIMIT ?') and '\n' not in select['sql']
+    assert any('idx_tasks_priority_desc' in line for line in select['plan'])
+
+    web_app.tracker = tracker
+    app.config.update({'TESTING': True})
+    with app.test_client() as client:
+        client.get('/')
+        client.get('/edit/1')
+        resp = client.get('/metrics')
+    assert resp.mimetype == 'text/plain'
+    text = resp.get_data(as_text=True)
+    assert 'task_tracker_call_seconds_count{method="list_tasks_page"} 1' in text
+    assert 'task_tracker_call_rows_bucket{method="list_tasks_page",le="1"} 1' in text
+    assert 'task_tracker_slow_statements_total ' in text
+    # request metrics are process wide, so other tests add to the counts
+    assert re.search(
+        r'http_request_duration_seconds_count\{method="GET",route="/edit/<int:task_id>",status="200"\} \d+',
+        text,
+    )
+
+
+def test_counts_and_summary_follow_writes(tmp_path):
+    db = str(tmp_path / "tasks.db")
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL,"
+        " priority INTEGER NOT NULL DEFAULT 1, due_date TEXT, done INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.execute("INSERT INTO tasks(description, priority, due_date) VALUES ('old', 2, '2024-04-01')")
+    conn.commit()
+    conn.close()
+
+    tracker = TaskTracker(db)
+    tracker.add_task("soon", priority=3, due_date="2024-05-03")
+    tracker.add_task("later", priority=3, due_date="2024-06-01", status="in progress")
+    tracker.add_task("undated", priority=1)
+    finished = tracker.add_task("finished", priority=5, due_date="2024-04-02")
+    tracker.mark_done(finished)
+    tracker.update_task(2, due_date="2024-05-02")
+    tracker.delete_task(4)
+
+    for filters in ({}, {"show_all": True}, {"status": "in progress"}, {"show_all": True, "status": "done"}):
+        query, params = tracker._count_query(**filters)
+        assert "task_counts" in query
+        where, where_params = tracker._where(filters.get("show_all", False), None, filters.get("status"))
+        expected = tracker.conn.execute(f"SELECT COUNT(*) FROM tasks{where}", where_params).fetchone()[0]
+        assert tracker.count_tasks(**filters) == expected
+
+    summary = tracker.summary(today="2024-05-01")
+    assert summary == {
+        "by_status": {"not started": 2, "in progress": 1, "done": 1},
+        "open": 3,
+        "by_priority": {3: 2, 2: 1},
+        "overdue": 1,
+        "due_this_week": 1,
+    }
+
+    import web_app
+
+    web_app.tracker = tracker
+    app.config.update({'TESTING': True})
+    with app.test_client() as client:
+        api = client.get('/api/summary?today=2024-05-01').get_json()
+        assert api['overdue'] == 1 and api['by_priority'] == {'3': 2, '2': 1}
+        assert client.get('/api/summary?today=May').status_code == 400
+        assert b'3 open' in client.get('/').data
+
+
+def test_iter_tasks_streams_in_list_order(tmp_path):
+    import subprocess
+
+    db = tmp_path / "tasks.db"
+    tracker = TaskTracker(str(db))
+    tracker.bulk_add({"description": f"stream {i}", "priority": i % 4} for i in range(1200))
+    tracker.update_task(7, status="in progress")
+
+    stream = tracker.iter_tasks(show_all=True, fields=("id", "priority"), batch_size=100)
+    first = next(stream)
+    assert first == {"id": 4, "priority": 3}
+    rest = list(stream)
+    assert [first["id"]] + [t["id"] for t in rest] == [t[0] for t in tracker.list_tasks(show_all=True)]
+    assert [t["description"] for t in tracker.iter_tasks(status="in progress")] == ["stream 6"]
+    tracker.add_task("stream web", priority=2, project="web")
+    assert [t["id"] for t in tracker.iter_tasks(project="web", fields=("id",))] == [1201]
+    searched = tracker.iter_tasks(sort_by="relevance", search="stream 1", fields=("id",), limit=30, batch_size=7)
+    assert [t["id"] for t in searched] == [
+        t[0] for t in tracker.list_tasks(sort_by="relevance", search="stream 1", limit=30)
+    ]
+
+    # a paused stream holds no lock, so writes from other threads go ahead
+    import threading
+
+    paused = tracker.iter_tasks(batch_size=10)
+    next(paused)
+    writer = threading.Thread(target=tracker.add_task, args=("written meanwhile",))
+    writer.start()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert len(list(paused)) == tracker.count_tasks() - 1
+    try:
+        tracker.iter_tasks(fields=("id", "secret"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown field accepted")
+
+    out = subprocess.run(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "..", "task_tracker.py"),
+         "list", "--format", "csv", "--fields", "id,description", "-n", "2", "--asc"],
+        cwd=tmp_path, capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.splitlines() == ["id,description", "1,stream 0", "5,stream 4"]
+
+
+def test_schema_version_skips_migrations_and_seeding(tmp_path):
+    db = str(tmp_path / "tasks.db")
+    tracker = TaskTracker(db, populate_dummy=True)
+    assert tracker.count_tasks(show_all=True) == 5
+    tracker.apply_batch(deletes=range(1, 6))
+    tracker.conn.execute("DROP INDEX idx_tasks_status")
+    tracker.conn.commit()
+    tracker.close()
+
+    # a current database is neither migrated nor seeded again
+    reopened = TaskTracker(db, populate_dummy=True)
+    assert reopened.count_tasks(show_all=True) == 0
+    names = [row[0] for row in reopened.conn.execute("SELECT name FROM sqlite_master")]
+    assert "idx_tasks_status" not in names and reopened.fts_enabled
+    reopened.conn.execute("PRAGMA user_version = 999")
+    try:
+        TaskTracker(db)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("newer schema accepted")
+
+
+def test_cli_daemon(tmp_path):
+    import subprocess
+    import time
+
+    root = os.path.join(os.path.dirname(__file__), "..")
+    sock = str(tmp_path / "tasks.sock")
+    daemon = subprocess.Popen(
+        [sys.executable, os.path.join(root, "task_tracker.py"), "--socket", sock, "serve"],
+        cwd=tmp_path,
+    )
+    env = dict(os.environ, TASK_TRACKER_SOCKET=sock)
+
+    def client(*argv, check=True):
+        return subprocess.run(
+            [sys.executable, os.path.join(root, "task_client.py"), *argv],
+            cwd=tmp_path, env=env, capture_output=True, text=True, check=check,
+        )
+
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(sock) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        client("add", "from the daemon", "-p", "9")
+        assert client("list", "-n", "1").stdout == "[6] (p=9) from the daemon - pending\n"
+        bad = client("list", "--fields", "nope", check=False)
+        assert bad.returncode == 2 and "Unknown task fields" in bad.stderr
+        # export is not forwarded but still works through the client
+        exported = client("export", "--format", "jsonl").stdout.splitlines()
+        assert len(exported) == 6
+    finally:
+        daemon.terminate()
+        daemon.wait(timeout=10)
+    assert not os.path.exists(sock)
+
+
+def test_snapshot_reads_lag_within_bound(tmp_path):
+    import time
+
+    for name, target in (("memory", ":memory:"), ("file", str(tmp_path / "snapshot.db"))):
+        tracker = TaskTracker(str(tmp_path / f"{name}.db"), snapshot=target, snapshot_max_age=60, cache_size=16)
+        tracker.add_task("first", priority=2)
+        # reads come from the snapshot taken at startup
+        assert tracker.count_tasks(show_all=True) == 0
+        tracker.refresh_snapshot()
+        assert tracker.count_tasks(show_all=True) == 1
+        generation = tracker.data_generation()
+
+        tracker.add_task("second", priority=3)
+        assert [t[1] for t in tracker.list_tasks()] == ["first"]
+        assert tracker.data_generation() == generation  # follows the snapshot
+        # single tasks and the change log are read from the database
+        assert tracker.get_task_record(2)["description"] == "second"
+        assert [change[2] for change in tracker.changes_since(0)] == [1, 2]
+        tracker.snapshot_max_age = 0.05
+        time.sleep(0.1)
+        assert [t[1] for t in tracker.list_tasks()] == ["second", "first"]
+        assert tracker.data_generation() != generation
+        assert tracker.get_task_record(2)["description"] == "second"
+
+        # threads read the snapshot side by side, and a refresh leaves a
+        # read in progress on the copy it started with
+        import threading
+
+        with tracker._reading(snapshot=True) as held:
+            counted = []
+            reader = threading.Thread(target=lambda: counted.append(tracker.count_tasks(show_all=True)))
+            reader.start()
+            reader.join(timeout=5)
+            assert counted == [2]
+            tracker.add_task("third")
+            tracker.refresh_snapshot()
+            assert held.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 2
+        assert tracker.count_tasks(show_all=True) == 3
+
+        import web_app
+
+        tracker.snapshot_max_age = 60
+        web_app.tracker = tracker
+        with app.test_client() as client:
+            created = client.post("/api/tasks", json={"description": "posted"})
+            assert created.status_code == 201 and created.get_json()["description"] == "posted"
+            task_id = created.get_json()["id"]
+            assert client.patch(f"/api/tasks/{task_id}", json={"priority": 4}).get_json()["priority"] == 4
+        tracker.close()
+
+
+def test_writes_keep_the_change_log_bounded(tmp_path, monkeypatch):
+    import time
+
+    import task_tracker
+    from task_tracker import main
+
+    monkeypatch.setattr(task_tracker, "CHANGE_LOG_KEEP", 5)
+    monkeypatch.setattr(task_tracker, "CHANGE_LOG_SLACK", 3)
+    monkeypatch.setattr(task_tracker, "MAINTENANCE_CHUNK", 2)
+    db = str(tmp_path / "tasks.db")
+    # one short-lived tracker per command, as with the CLI
+    for i in range(20):
+        main(["--db", db, "add", f"task {i}"])
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM task_changes").fetchone()[0] < 5 + 3
+    conn.close()
+
+    # writes only flag the log; maintain() trims it a chunk at a time
+    tracker = TaskTracker(db, maintenance="off")
+    for i in range(10):
+        tracker.add_task(f"flagged {i}")
+    assert tracker.maintenance_due()
+    assert tracker.conn.execute("SELECT COUNT(*) FROM task_changes").fetchone()[0] >= 5 + 3
+    assert tracker.maintain(chunks=1) == 1
+    assert tracker.maintain() > 1 and not tracker.maintenance_due()
+    assert tracker.conn.execute("SELECT COUNT(*) FROM task_changes").fetchone()[0] == 5
+    tracker.close()
+
+    # otherwise a background thread does it, for group commits too
+    tracker = TaskTracker(db, group_commit_ms=1)
+    for i in range(20):
+        tracker.add_task(f"queued {i}").result()
+    tracker.flush()
+    deadline = time.monotonic() + 5
+    while tracker.conn.execute("SELECT COUNT(*) FROM task_changes").fetchone()[0] > 5 + 3:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    tracker.close()
+
+
+def test_change_feed(tmp_path):
+    import json
+    import pytest
+    import web_app
+
+    tracker = TaskTracker(str(tmp_path / "tasks.db"))
+    first = tracker.add_task("first")
+    second = tracker.add_task("second", priority=2)
+    tracker.update_task(second, comment="note")
+    tracker.delete_task(first)
+
+    changes = tracker.changes_since(0)
+    assert [(op, task_id) for _, op, task_id, _ in changes] == [
+        ("insert", first), ("insert", second), ("update", second), ("delete", first)
+    ]
+    assert changes[0][3] is None  # deleted since
+    assert changes[2][3]["comment"] == "note"
+    assert tracker.last_change() == changes[-1][0]
+    assert tracker.changes_since(changes[1][0], limit=1) == changes[2:3]
+
+    web_app.tracker = tracker
+    with web_app.app.test_client() as client:
+        page = client.get("/").get_data(as_text=True)
+        assert f'data-seq="{tracker.last_change()}"' in page
+        assert f'id="task-{second}"' in page
+
+        response = client.get(f"/events?since={changes[1][0]}", buffered=False)
+        assert response.mimetype == "text/event-stream"
+        stream = response.iter_encoded()
+        assert next(stream) == b"retry: 3000\n\n"
+        message = next(stream).decode()
+        assert message.startswith(f"id: {changes[2][0]}\nevent: change\n")
+        payload = json.loads(message.split("data: ", 1)[1])
+        assert payload["op"] == "update" and payload["id"] == second
+        assert f'id="task-{second}"' in payload["row"] and "1 open" in payload["summary"]
+        assert json.loads(next(stream).decode().split("data: ", 1)[1])["row"] is None
+        response.close()
+
+    tracker.trim_changes(keep=1)
+    with pytest.raises(ValueError):
+        tracker.changes_since(0)
+    assert len(tracker.changes_since(changes[-2][0])) == 1
+    assert web_app.feed.catch_up(0) is None
+    tracker.close()
+
+
+def test_due_dates_validated_and_due_tasks(tmp_path, capsys):
+    import pytest
+    import web_app
+    from task_tracker import main, normalize_due_date
+
+    db = str(tmp_path / "tasks.db")
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL,"
+        " priority INTEGER NOT NULL DEFAULT 1, due_date TEXT, done INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.executemany(
+        "INSERT INTO tasks(description, due_date) VALUES (?, ?)",
+        [("compact", "20240601"), ("vague", "soon")],
+    )
+    conn.commit()
+    conn.close()
+
+    tracker = TaskTracker(db)
+    # old dates are normalized where they parse and kept otherwise; those
+    # kept sort by their text, so "soon" comes after every real date
+    assert [t[3] for t in tracker.list_tasks(sort_by="due", ascending=True)] == ["2024-06-01", "soon"]
+    assert [t[3] for t in tracker.list_tasks(sort_by="due")] == ["soon", "2024-06-01"]
+    assert normalize_due_date("20240105") == "2024-01-05" and normalize_due_date("") is None
+    with pytest.raises(ValueError):
+        tracker.add_task("bad", due_date="2024-13-01")
+    tracker.add_task("later", priority=2, due_date="2024-06-09")
+    tracker.add_task("today", due_date="2024-06-03")
+    tracker.mark_done(tracker.add_task("finished", due_date="2024-05-01"))
+
+    assert [(t[1], t[3]) for t in tracker.due_tasks(today="2024-06-03")] == [
+        ("compact", "2024-06-01"), ("today", "2024-06-03"), ("later", "2024-06-09")
+    ]
+    assert [t[1] for t in tracker.due_tasks(today="2024-06-03", days=1, limit=1)] == ["compact"]
+    plan = " ".join(row[3] for row in tracker.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM tasks WHERE done=0 AND due_date IS NOT NULL"
+        " AND due_date < '2024-06-10' ORDER BY due_date, id"
+    ))
+    assert "idx_tasks_open_due" in plan and "TEMP B-TREE" not in plan
+
+    main(["--db", db, "due", "--today", "2024-06-03", "--days", "1"])
+    assert capsys.readouterr().out.splitlines() == [
+        "overdue: [1] (p=1) compact due 2024-06-01",
+        "due: [4] (p=1) today due 2024-06-03",
+    ]
+
+    web_app.tracker = tracker
+    with web_app.app.test_client() as client:
+        api = client.get("/api/due?today=2024-06-03&days=1").get_json()
+        assert [(t["description"], t["overdue"]) for t in api["tasks"]] == [("compact", True), ("today", False)]
+        assert client.get("/api/due?today=June").status_code == 400
+        assert client.post("/api/tasks", json={"description": "x", "due_date": "soon"}).status_code == 400
+        # the HTML forms reject it too, without changing anything
+        rejected = client.post("/add", data={"description": "x", "due_date": "tomorrow"})
+        assert rejected.status_code == 400 and "YYYY-MM-DD" in rejected.get_data(as_text=True)
+        assert client.post("/edit/1", data={"due_date": "tomorrow"}).status_code == 400
+        assert tracker.get_task_record(1)["due_date"] == "2024-06-01"
+        assert 'id="due"' in client.get("/").get_data(as_text=True)
+    tracker.close()
+
+
+def test_history_diffs_reconstruction_and_compaction(tmp_path):
+    import pytest
+
+    db = str(tmp_path / "tasks.db")
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT NOT NULL,"
+        " priority INTEGER NOT NULL DEFAULT 1, due_date TEXT, done INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.execute("INSERT INTO tasks(description, priority) VALUES ('before history', 2)")
+    conn.commit()
+    conn.close()
+
+    tracker = TaskTracker(db)
+    task = tracker.add_task("write report", due_date="2024-06-01")
+    tracker.update_task(task, priority=4, comment="draft")
+    tracker.update_task(task, priority=4)  # no change, not logged
+    tracker.update_task(1, description="renamed")
+    tracker.mark_done(task)
+    tracker.delete_task(1)
+
+    history = tracker.task_history(task)
+    assert [(op, changes) for _, _, op, changes in history][1:] == [
+        ("update", {"priority": 4, "comment": "draft"}),
+        ("update", {"done": 1, "status": "done"}),
+    ]
+    assert history[0][3]["due_date"] == "2024-06-01"
+    assert tracker.task_history(1)[-1][2:] == ("delete", None)
+
+    seqs = [entry[0] for entry in history]
+    first = dict(tracker.get_task_record(task), priority=1, comment="", done=0, status="not started")
+    assert tracker.task_as_of(task, seqs[0]) == first
+    # the task that predates the history starts from its checkpoint
+    assert [t["description"] for t in tracker.tasks_as_of(seqs[1])] == ["before history", "write report"]
+    assert tracker.task_as_of(1, seqs[-1])["description"] == "renamed"
+    assert tracker.task_as_of(1, seqs[-1] + 1) is None
+    assert tracker.tasks_as_of("2999-01-01") == [tracker.get_task_record(task)]
+    assert tracker.task_as_of(task, history[-1][1])["done"] == 1
+    with pytest.raises(ValueError):
+        tracker.tasks_as_of("2000-01-01")
+
+    # older than the retention period: checkpoint the tasks changed, then
+    # drop their entries; the deleted task leaves nothing behind
+    assert tracker.compact_history(retain_days=0) == 5
+    assert tracker.task_history(task) == []
+    assert tracker.conn.execute("SELECT task_id FROM task_checkpoints").fetchall() == [(task,)]
+    assert tracker.tasks_as_of("2999-01-01") == [tracker.get_task_record(task)]
+    with pytest.raises(ValueError):
+        tracker.task_as_of(task, seqs[1])
+    tracker.update_task(task, comment="final")
+    assert tracker.compact_history() == 0
+    assert tracker.task_as_of(task, tracker.task_history(task)[0][0])["comment"] == "final"
+    tracker.close()
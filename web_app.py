@@ -1,36 +1,167 @@
-from flask import Flask, request, redirect, url_for, render_template_string
-from task_tracker import TaskTracker
+import datetime
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
 
-app = Flask(__name__)
-tracker = TaskTracker(populate_dummy=True)
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional
+
+from flask import Flask, g, request, redirect, url_for, render_template, make_response, jsonify
+from metrics import Metrics
+from task_tracker import EXPORT_FIELDS, TaskTracker, normalize_due_date
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+# Static files are served from STATIC_DIR by the asset routes below.
+app = Flask(__name__, static_folder=None)
+
+
+def open_tracker() -> TaskTracker:
+    """Open the tracker the web app serves, configured from the environment."""
+    return TaskTracker(
+        populate_dummy=True,
+        pooled=True,
+        cache_size=256,
+        cache_ttl=60,
+        slow_query_ms=float(os.getenv("SLOW_QUERY_MS", 100)),
+        # opt in to serving pages from a snapshot at most this many seconds old
+        snapshot=":memory:" if os.getenv("SNAPSHOT_MAX_AGE") else None,
+        snapshot_max_age=float(os.getenv("SNAPSHOT_MAX_AGE") or 5),
+        # start serving while an upgraded database's rows are rewritten
+        backfill="background",
+    )
+
+
+class ProcessLocal:
+    """Creates an object on first use in each process and forwards to it.
+
+    SQLite connections, reader pools and background threads cannot be
+    shared across fork, so a process forked after its parent made the
+    object makes its own. The parent's copy is kept, unused and unclosed,
+    because closing an inherited connection could disturb the parent's
+    locks.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._pid = None
+        self._inherited = []
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            # another thread may have held the lock at the moment of fork
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return this process's object, creating it on first use."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self._value is not None:
+                        self._inherited.append(self._value)
+                    self._value = self._factory()
+                    self._pid = os.getpid()
+        return self._value
+
+    def close(self) -> None:
+        """Close this process's object, if it made one."""
+        if self._pid == os.getpid():
+            self._value.close()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+tracker = ProcessLocal(open_tracker)
+
+http_metrics = Metrics()
+http_metrics.histogram(
+    "http_request_duration_seconds", "Time to handle a request by route, method and status."
+)
+
+# One table row of the index page, kept as a macro so the same compiled code
+# renders every row, on the page and in change events.
+ROW_TEMPLATE = """
+{% macro task_row(tid, desc, priority, due, done, status, comment, color) -%}
+    <tr id="task-{{tid}}" style="background-color: {{color if color else ''}};">
+        <td>{{desc}}</td>
+        <td>{{priority}}</td>
+        <td>{{due if due else ''}}</td>
+        <td>{{status}}</td>
+        <td>
+            {% if status != 'done' %}
+            <form method="post" action="/done/{{tid}}" style="display:inline;">
+                <button type="submit">Done</button>
+            </form>
+            {% endif %}
+            <form method="get" action="/edit/{{tid}}" style="display:inline;">
+                <button type="submit">Edit</button>
+            </form>
+            <form method="post" action="/delete/{{tid}}" style="display:inline;">
+                <button type="submit">Delete</button>
+            </form>
+            <button type="button" onclick="openComment({{tid}}, {{comment|tojson}}, {{color|tojson}})">Comment</button>
+        </td>
+    </tr>
+{%- endmacro %}
+{% macro task_rows(tasks, change_seq, next_cursor, prev_cursor, sort, q, status_filter) -%}
+<tbody data-seq="{{change_seq}}"
+    data-next="{{ url_for('index', after=next_cursor, sort=sort, q=q, status=status_filter) if next_cursor else '' }}"
+    data-prev="{{ url_for('index', before=prev_cursor, sort=sort, q=q, status=status_filter) if prev_cursor else '' }}">
+{% for task in tasks %}
+{{ task_row(*task) }}
+{% endfor %}
+</tbody>
+{%- endmacro %}
+{% macro summary_line(summary) -%}
+{{summary.open}} open &middot; {{summary.overdue}} overdue &middot; {{summary.due_this_week}} due this week
+{%- endmacro %}
+"""
 
 TEMPLATE = """
 <!doctype html>
 <title>Task Tracker</title>
-<style>
-table { border-collapse: collapse; width: 100%; }
-th, td { padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }
-tr:nth-child(even) { background-color: #f9f9f9; }
-tr:nth-child(odd) { background-color: #ffffff; }
-#commentBox { position: fixed; top: 20%; left: 20%; background: white; border: 1px solid #ccc; padding: 10px; display:none; }
-</style>
+<link rel="stylesheet" href="{{ asset_url('app.css') }}">
 <h1>Tasks</h1>
-<form method="get" action="/">
+<p id="summary">{{ summary_line(summary) }}</p>
+{% if due %}
+<ul id="due">
+    {% for tid, desc, priority, due_date, status in due %}
+    <li class="{{ 'overdue' if due_date < today else 'due' }}">
+        {{desc}} &ndash; {{ 'overdue since' if due_date < today else 'due' }} {{due_date}}
+    </li>
+    {% endfor %}
+</ul>
+{% endif %}
+<p id="newTasks" style="display:none;"><a href="">New tasks were added &ndash; reload</a></p>
+<form id="filters" method="get" action="/">
     <label for="q">Search:</label>
     <input id="q" type="text" name="q" value="{{q}}">
     <label for="status">Status:</label>
-    <select name="status" id="status" onchange="this.form.submit()">
+    <select name="status" id="status">
         <option value="" {% if not status_filter %}selected{% endif %}>All</option>
         {% for st in statuses %}
         <option value="{{st}}" {% if status_filter==st %}selected{% endif %}>{{st}}</option>
         {% endfor %}
     </select>
     <label for="sort">Sort:</label>
-    <select name="sort" id="sort" onchange="this.form.submit()">
+    <select name="sort" id="sort">
         <option value="desc" {% if sort == 'desc' %}selected{% endif %}>Priority high-&gt;low</option>
         <option value="asc" {% if sort == 'asc' %}selected{% endif %}>Priority low-&gt;high</option>
         <option value="due_asc" {% if sort == 'due_asc' %}selected{% endif %}>Due earliest</option>
         <option value="due_desc" {% if sort == 'due_desc' %}selected{% endif %}>Due latest</option>
+        <option value="relevance" {% if sort == 'relevance' %}selected{% endif %}>Best match</option>
     </select>
     <button type="submit">Apply</button>
 </form>
@@ -63,37 +194,14 @@ tr:nth-child(odd) { background-color: #ffffff; }
         <th>Actions</th>
     </tr>
 </thead>
-<tbody>
-{% for tid, desc, priority, due, done, status, comment, color in tasks %}
-    <tr style="background-color: {{color if color else ''}};">
-        <td>{{desc}}</td>
-        <td>{{priority}}</td>
-        <td>{{due if due else ''}}</td>
-        <td>{{status}}</td>
-        <td>
-            {% if status != 'done' %}
-            <form method="post" action="/done/{{tid}}" style="display:inline;">
-                <button type="submit">Done</button>
-            </form>
-            {% endif %}
-            <form method="get" action="/edit/{{tid}}" style="display:inline;">
-                <button type="submit">Edit</button>
-            </form>
-            <form method="post" action="/delete/{{tid}}" style="display:inline;">
-                <button type="submit">Delete</button>
-            </form>
-            <button type="button" onclick="openComment({{tid}}, {{comment|tojson}}, {{color|tojson}})">Comment</button>
-        </td>
-    </tr>
-{% endfor %}
-</tbody>
+{{ task_rows(tasks, change_seq, next_cursor, prev_cursor, sort, q, status_filter) }}
 </table>
-<div>
-{% if page > 1 %}
-  <a href="{{ url_for('index', page=page-1, sort=sort, q=q, status=status_filter) }}">Previous</a>
+<div id="pager">
+{% if prev_cursor %}
+  <a id="prevPage" href="{{ url_for('index', before=prev_cursor, sort=sort, q=q, status=status_filter) }}">Previous</a>
 {% endif %}
-{% if has_next %}
-  <a href="{{ url_for('index', page=page+1, sort=sort, q=q, status=status_filter) }}">Next</a>
+{% if next_cursor %}
+  <a id="nextPage" href="{{ url_for('index', after=next_cursor, sort=sort, q=q, status=status_filter) }}">Next</a>
 {% endif %}
 </div>
 <div id="commentBox">
@@ -102,79 +210,345 @@ tr:nth-child(odd) { background-color: #ffffff; }
   <button type="button" onclick="saveComment()">Save</button>
   <button type="button" onclick="closeComment()">Close</button>
 </div>
-<script>
-function openComment(id, text, color){
-  var box=document.getElementById('commentBox');
-  box.style.display='block';
-  box.dataset.id=id;
-  document.getElementById('commentText').value=text||'';
-  document.getElementById('commentColor').value=color||'#ffffff';
-}
-function closeComment(){
-  document.getElementById('commentBox').style.display='none';
-}
-document.addEventListener('click',function(e){
-  var box=document.getElementById('commentBox');
-  if(box.style.display==='block' && !box.contains(e.target) && e.target.tagName!=='BUTTON'){
-    box.style.display='none';
-  }
-});
-function saveComment(){
-  var id=document.getElementById('commentBox').dataset.id;
-  var text=document.getElementById('commentText').value;
-  var color=document.getElementById('commentColor').value;
-  fetch('/comment/'+id,{method:'POST',headers:{'Content-Type':'application/x-www-form-urlencoded'},body:'comment='+encodeURIComponent(text)+'&color='+encodeURIComponent(color)}).then(()=>{window.location.reload();});
-}
-</script>
+<script src="{{ asset_url('app.js') }}"></script>
 """
 
-@app.route("/")
-def index():
-    sort = request.args.get("sort", "desc")
-    q = request.args.get("q", "")
-    status_filter = request.args.get("status") or None
-    page = int(request.args.get("page", 1))
-    limit = 10
-    offset = (page - 1) * limit
+# Just the table body of the index page, for paging and sorting in place.
+ROWS_TEMPLATE = "{{ task_rows(tasks, change_seq, next_cursor, prev_cursor, sort, q, status_filter) }}"
+
+STATUSES = ["not started", "in progress", "done"]
+# Tasks listed in the index page's due soon box.
+DUE_WIDGET_SIZE = 5
+
+EDIT_TEMPLATE = """
+    <!doctype html>
+    <title>Edit Task</title>
+    <form method=\"post\">
+        <label>Description:<input type=text name=description value=\"{{t[0]}}\"></label>
+        <label>Priority:<input type=number name=priority value=\"{{t[1]}}\" min=1></label>
+        <label>Due date:<input type=date name=due_date value=\"{{t[2] if t[2] else ''}}\"></label>
+        <label>Status:
+            <select name=status>
+            {% for st in statuses %}
+                <option value=\"{{st}}\" {% if t[3]==st %}selected{% endif %}>{{st}}</option>
+            {% endfor %}
+            </select>
+        </label>
+        <label>Comment:<br><textarea name=comment rows=4 cols=40>{{t[4] or ''}}</textarea></label>
+        <label>Color:<input type=color name=color value=\"{{t[5] if t[5] else '#ffffff'}}\"></label>
+        <button type=submit>Save</button>
+    </form>
+    <a href=\"/\">Back</a>
+    """
+
+
+def parse_sort(sort: str) -> tuple:
+    """Map a ``sort`` query value to list_tasks (sort_by, ascending)."""
     if sort == "due_asc":
-        sort_by, ascending = "due", True
-    elif sort == "due_desc":
-        sort_by, ascending = "due", False
-    else:
-        sort_by, ascending = "priority", sort == "asc"
-    tasks = tracker.list_tasks(
+        return "due", True
+    if sort == "due_desc":
+        return "due", False
+    if sort == "relevance":
+        return "relevance", False
+    return "priority", sort == "asc"
+
+
+def rows_context(args) -> dict:
+    """Load the task table data for the given query arguments."""
+    sort = args.get("sort", "desc")
+    q = args.get("q", "")
+    status_filter = args.get("status") or None
+    after = args.get("after") or None
+    before = args.get("before") or None
+    sort_by, ascending = parse_sort(sort)
+    # read before the tasks, so the page's change feed replays anything
+    # committed in between rather than missing it
+    change_seq = tracker.last_change()
+    page_args = dict(
         show_all=True,
         sort_by=sort_by,
         ascending=ascending,
         search=q or None,
         status=status_filter,
-        limit=limit,
-        offset=offset,
+        limit=10,
         with_status=True,
         with_meta=True,
     )
-    total = tracker.count_tasks(show_all=True, search=q or None, status=status_filter)
-    has_next = offset + limit < total
-    return render_template_string(
-        TEMPLATE,
+    try:
+        tasks, next_cursor, prev_cursor = tracker.list_tasks_page(
+            after=after, before=before, **page_args
+        )
+    except ValueError:
+        # stale or foreign cursor, e.g. after changing the sort order
+        tasks, next_cursor, prev_cursor = tracker.list_tasks_page(**page_args)
+    return dict(
         tasks=tasks,
         sort=sort,
         q=q,
         status_filter=status_filter,
-        page=page,
-        has_next=has_next,
-        statuses=["not started", "in progress", "done"],
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        change_seq=change_seq,
+    )
+
+
+def index_context(args) -> dict:
+    """Load the index page data for the given query arguments."""
+    return dict(
+        rows_context(args),
+        statuses=STATUSES,
+        summary=tracker.summary(),
+        # overdue tasks and those due within a week, soonest first
+        due=tracker.due_tasks(limit=DUE_WIDGET_SIZE),
+        today=datetime.date.today().isoformat(),
+    )
+
+
+def add_args(form) -> dict:
+    """Map the add form to add_task keyword arguments."""
+    return dict(
+        description=form["description"],
+        priority=int(form.get("priority", 1)),
+        due_date=form.get("due_date") or None,
+        status=form.get("status", "not started"),
+        comment=form.get("comment", ""),
+        color=form.get("color", ""),
+    )
+
+
+def edit_args(form) -> dict:
+    """Map the edit form to update_task keyword arguments."""
+    priority = form.get("priority")
+    return dict(
+        description=form.get("description"),
+        priority=int(priority) if priority else None,
+        due_date=form.get("due_date") or None,
+        status=form.get("status"),
+        comment=form.get("comment"),
+        color=form.get("color"),
+    )
+
+
+def bad_form(error: ValueError):
+    """Reply 400 to a form post whose values were rejected, e.g. a due date that is not a date."""
+    return app.response_class(f"{error}\n", status=400, mimetype="text/plain")
+
+
+# Static assets -------------------------------------------------------------
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Asset URLs carry a hash of the content, so a cached copy never goes stale.
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Smaller responses are not worth compressing.
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript")
+
+
+def load_assets(directory: str) -> tuple:
+    """Read the static files, returning (url by name, asset by fingerprinted name).
+
+    Each asset is (mimetype, bodies by content encoding), compressed once
+    here rather than per request.
+    """
+    urls, assets = {}, {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            body = f.read()
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f"{stem}.{hashlib.sha1(body).hexdigest()[:12]}{ext}"
+        bodies = {None: body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body)
+        urls[name] = f"/static/{fingerprinted}"
+        assets[fingerprinted] = (mimetypes.guess_type(name)[0] or "application/octet-stream", bodies)
+    return urls, assets
+
+
+ASSET_URLS, ASSETS = load_assets(STATIC_DIR)
+
+
+def asset_url(name: str) -> str:
+    """URL of a static file that changes whenever its content does."""
+    return ASSET_URLS[name]
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, or None to send as is."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if weights.get(encoding, weights.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def encode_body(body: bytes, mimetype: str, accept_encoding: str) -> tuple:
+    """Return (content encoding or None, body) for a response the client accepts."""
+    if len(body) < COMPRESS_MIN_BYTES or not (mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return None, body
+    encoding = accepted_encoding(accept_encoding)
+    if encoding == "br":
+        return encoding, brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return encoding, gzip.compress(body, compresslevel=6, mtime=0)
+    return None, body
+
+
+def asset_body(name: str, accept_encoding: str):
+    """Return (mimetype, content encoding, body) of an asset, or None if unknown."""
+    asset = ASSETS.get(name)
+    if asset is None:
+        return None
+    mimetype, bodies = asset
+    encoding = accepted_encoding(accept_encoding)
+    if encoding not in bodies:
+        encoding = None
+    return mimetype, encoding, bodies[encoding]
+
+
+def compile_templates(env) -> tuple:
+    """Compile the page templates once for a Jinja environment.
+
+    Registers the row, rows and summary macros as the ``task_row``,
+    ``task_rows`` and ``summary_line`` globals, and ``asset_url``, and
+    returns the (index, edit, rows fragment) templates.
+    """
+    env.globals["asset_url"] = asset_url
+    macros = env.from_string(ROW_TEMPLATE).module
+    env.globals["task_row"] = macros.task_row
+    env.globals["task_rows"] = macros.task_rows
+    env.globals["summary_line"] = macros.summary_line
+    return env.from_string(TEMPLATE), env.from_string(EDIT_TEMPLATE), env.from_string(ROWS_TEMPLATE)
+
+
+index_template, edit_template, rows_template = compile_templates(app.jinja_env)
+
+# Changes whenever the page markup or an asset does, so cached pages are not
+# reused across deployments.
+TEMPLATE_VERSION = hashlib.sha1(
+    (ROW_TEMPLATE + TEMPLATE + EDIT_TEMPLATE + ROWS_TEMPLATE + "".join(ASSET_URLS.values())).encode()
+).hexdigest()
+
+
+def page_etag(*parts) -> str:
+    """Return the entity tag for a page built from the current task data.
+
+    Derived from the newest change log seq rather than the page content,
+    so a revalidation is answered without querying the tasks. The seq is
+    the same in every process, so a tag from one pre-forked worker is
+    honoured by the others. The date is included because the overdue
+    counts change at midnight.
+    """
+    key = repr((TEMPLATE_VERSION, tracker.data_state(), datetime.date.today(), parts))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional_page(etag: str, render):
+    """Reply 304 when the client holds ``etag``, else the rendered page."""
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+    # weak: the tag names the page's data, not its bytes or encoding
+    response.set_etag(etag, weak=True)
+    # revalidate on every use; unchanged pages cost a 304
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        http_metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Tracker and request metrics in the Prometheus text format."""
+    body = tracker.metrics.render() + http_metrics.render()
+    return app.response_class(body, mimetype="text/plain; version=0.0.4")
+
+
+@app.after_request
+def compress_response(response):
+    """Compress sizeable text responses for clients that accept it."""
+    if (
+        response.status_code != 200
+        or response.is_streamed
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    encoding, body = encode_body(
+        response.get_data(), response.mimetype, request.headers.get("Accept-Encoding", "")
+    )
+    if encoding is not None:
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+@app.route("/static/<name>")
+def static_asset(name: str):
+    found = asset_body(name, request.headers.get("Accept-Encoding", ""))
+    if found is None:
+        return ("Not Found", 404)
+    mimetype, encoding, body = found
+    response = app.response_class(body, mimetype=mimetype)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = ASSET_CACHE_CONTROL
+    return response
+
+
+@app.route("/")
+def index():
+    return conditional_page(
+        page_etag(request.path, request.query_string),
+        lambda: render_template(index_template, **index_context(request.args)),
+    )
+
+
+@app.route("/rows")
+def rows():
+    """The index page's <tbody> for the same query arguments."""
+    return conditional_page(
+        page_etag(request.path, request.query_string),
+        lambda: render_template(rows_template, **rows_context(request.args)),
     )
 
 @app.route("/add", methods=["POST"])
 def add():
-    description = request.form["description"]
-    priority = int(request.form.get("priority", 1))
-    due_date = request.form.get("due_date") or None
-    status = request.form.get("status", "not started")
-    comment = request.form.get("comment", "")
-    color = request.form.get("color", "")
-    tracker.add_task(description, priority, due_date, status, comment, color)
+    try:
+        tracker.add_task(**add_args(request.form))
+    except ValueError as exc:
+        return bad_form(exc)
     return redirect(url_for("index"))
 
 @app.route("/done/<int:task_id>", methods=["POST"])
@@ -197,49 +571,370 @@ def comment(task_id: int):
 @app.route("/edit/<int:task_id>", methods=["GET", "POST"])
 def edit(task_id: int):
     if request.method == "POST":
-        description = request.form.get("description")
-        priority = request.form.get("priority")
-        due_date = request.form.get("due_date") or None
-        status = request.form.get("status")
-        comment = request.form.get("comment")
-        color = request.form.get("color")
-        tracker.update_task(
-            task_id,
-            description=description,
-            priority=int(priority) if priority else None,
-            due_date=due_date,
-            status=status,
-            comment=comment,
-            color=color,
-        )
+        try:
+            tracker.update_task(task_id, **edit_args(request.form))
+        except ValueError as exc:
+            return bad_form(exc)
         return redirect(url_for("index"))
-    task = tracker.conn.execute(
-        "SELECT description, priority, due_date, status, comment, color FROM tasks WHERE id=?",
-        (task_id,),
-    ).fetchone()
-    edit_template = """
-    <!doctype html>
-    <title>Edit Task</title>
-    <form method=\"post\">
-        <label>Description:<input type=text name=description value=\"{{t[0]}}\"></label>
-        <label>Priority:<input type=number name=priority value=\"{{t[1]}}\" min=1></label>
-        <label>Due date:<input type=date name=due_date value=\"{{t[2] if t[2] else ''}}\"></label>
-        <label>Status:
-            <select name=status>
-            {% for st in statuses %}
-                <option value=\"{{st}}\" {% if t[3]==st %}selected{% endif %}>{{st}}</option>
-            {% endfor %}
-            </select>
-        </label>
-        <label>Comment:<br><textarea name=comment rows=4 cols=40>{{t[4] or ''}}</textarea></label>
-        <label>Color:<input type=color name=color value=\"{{t[5] if t[5] else '#ffffff'}}\"></label>
-        <button type=submit>Save</button>
-    </form>
-    <a href=\"/\">Back</a>
+    return conditional_page(
+        page_etag(request.path),
+        lambda: render_template(edit_template, t=tracker.get_task(task_id), statuses=STATUSES),
+    )
+
+# Change feed --------------------------------------------------------------
+
+# Seconds between change log polls, between keepalives on an idle stream,
+# and between trims of the change log and compactions of the task history.
+CHANGE_POLL_SECONDS = 0.5
+KEEPALIVE_SECONDS = 15
+TRIM_SECONDS = 60
+
+
+class ChangeFeed:
+    """Fans the tracker's change log out to every open event stream.
+
+    One background thread per process follows the log with a single
+    ``seq > ?`` query per poll and keeps the most recent changes, already
+    rendered, for the streams to pick up. Streams that fall further behind
+    catch up from the log directly.
     """
-    return render_template_string(edit_template, t=task, statuses=["not started", "in progress", "done"])
+
+    def __init__(self, source, backlog: int = 1000):
+        # called on every poll so a replaced tracker is followed
+        self._source = source
+        self.backlog = backlog
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # the polling thread does not survive fork; a child starts its own
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._changed = threading.Condition()
+        self._events: deque = deque(maxlen=self.backlog)
+        self._tracker = None
+        self._seq = 0
+        self._thread = None
+        self.closed = False
+
+    def _render(self, tracker: TaskTracker, changes) -> list:
+        """Turn changes_since results into (seq, JSON payload) events."""
+        task_row = app.jinja_env.globals["task_row"]
+        summary = str(app.jinja_env.globals["summary_line"](tracker.summary()))
+        events = []
+        for seq, op, task_id, record in changes:
+            row = None
+            if record is not None:
+                row = str(task_row(*(record[field] for field in EXPORT_FIELDS[:8])))
+            payload = {"op": op, "id": task_id, "row": row, "summary": summary}
+            events.append((seq, json.dumps(payload)))
+        return events
+
+    def _poll(self) -> None:
+        current = self._source()
+        if current is not self._tracker:
+            with self._changed:
+                self._tracker, self._seq = current, current.last_change()
+                self._events.clear()
+        changes = current.changes_since(self._seq, limit=self.backlog)
+        if not changes:
+            return
+        events = self._render(current, changes)
+        with self._changed:
+            self._events.extend(events)
+            self._seq = events[-1][0]
+            self._changed.notify_all()
+
+    def _run(self) -> None:
+        last_trim = time.monotonic()
+        while True:
+            time.sleep(CHANGE_POLL_SECONDS)
+            try:
+                self._poll()
+                if time.monotonic() - last_trim > TRIM_SECONDS:
+                    # the tracker's maintenance thread does the work in small steps
+                    self._tracker.schedule_maintenance()
+                    last_trim = time.monotonic()
+            except Exception:
+                app.logger.exception("change feed poll failed")
+                with self._changed:
+                    # start over from the log on the next poll
+                    self._tracker = None
+
+    def start(self) -> None:
+        """Start following the change log, unless already doing so."""
+        with self._changed:
+            if self._thread is None:
+                self._poll()
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+
+    def since(self, seq: int):
+        """Return the buffered events after ``seq``, or None if not all are buffered."""
+        with self._changed:
+            first = self._events[0][0] if self._events else self._seq + 1
+            if seq + 1 < first:
+                return None
+            return [event for event in self._events if event[0] > seq]
+
+    def catch_up(self, seq: int):
+        """Read the events after ``seq`` from the log, or None once trimmed."""
+        tracker = self._source()
+        try:
+            return self._render(tracker, tracker.changes_since(seq, limit=self.backlog))
+        except ValueError:
+            return None
+
+    def wait(self, seq: int, timeout: float):
+        """Block up to ``timeout`` seconds for events after ``seq``.
+
+        Returns them (an empty list on timeout), or None when the stream
+        can no longer catch up and the page must be reloaded.
+        """
+        self.start()
+        with self._changed:
+            self._changed.wait_for(lambda: self._seq > seq or self.closed, timeout)
+        events = self.since(seq)
+        return self.catch_up(seq) if events is None else events
+
+    def close(self) -> None:
+        """End every stream, so a stopping server need not wait for them.
+
+        Browsers reconnect on their own and resume from the last event
+        they saw.
+        """
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+
+feed = ChangeFeed(lambda: tracker)
+
+
+def stream_start(last_event_id, since) -> int:
+    """Change sequence an event stream resumes after.
+
+    A reconnecting browser sends the last id it saw; otherwise the page
+    passes the sequence it was rendered at, else the stream starts now.
+    """
+    for value in (last_event_id, since):
+        if value and value.isdigit():
+            return int(value)
+    return tracker.last_change()
+
+
+def event_message(seq: int, payload: str) -> str:
+    return f"id: {seq}\nevent: change\ndata: {payload}\n\n"
+
+
+RESET_MESSAGE = "event: reset\ndata: {}\n\n"
+
+
+@app.route("/events")
+def events():
+    """Server-Sent Events stream of task changes after ``since``."""
+    seq = stream_start(request.headers.get("Last-Event-ID"), request.args.get("since"))
+
+    def stream():
+        nonlocal seq
+        yield "retry: 3000\n\n"
+        while not feed.closed:
+            batch = feed.wait(seq, KEEPALIVE_SECONDS)
+            if batch is None:
+                yield RESET_MESSAGE
+                return
+            if not batch:
+                yield ": keepalive\n\n"
+            for seq, payload in batch:
+                yield event_message(seq, payload)
+
+    response = app.response_class(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# JSON API -----------------------------------------------------------------
+
+API_MAX_LIMIT = 1000
+API_MAX_BATCH = 10000
+# Writable fields and the types they accept.
+API_FIELD_TYPES = {
+    "description": str,
+    "priority": int,
+    "due_date": (str, type(None)),
+    "status": str,
+    "comment": str,
+    "color": str,
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def api_error(error: ApiError):
+    return jsonify(error=str(error)), error.status
+
+
+def api_task_fields(data, require_description: bool = False) -> dict:
+    """Validate a JSON task body and return the fields it sets."""
+    if not isinstance(data, dict):
+        raise ApiError("expected a JSON object")
+    unknown = set(data) - set(API_FIELD_TYPES)
+    if unknown:
+        raise ApiError(f"unknown fields: {', '.join(sorted(unknown))}")
+    for field, value in data.items():
+        kind = API_FIELD_TYPES[field]
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise ApiError(f"invalid value for {field}")
+    if data.get("due_date") is not None:
+        try:
+            data["due_date"] = normalize_due_date(data["due_date"])
+        except ValueError as exc:
+            raise ApiError(str(exc))
+    if "status" in data and data["status"] not in STATUSES:
+        raise ApiError(f"status must be one of: {', '.join(STATUSES)}")
+    if require_description and not data.get("description"):
+        raise ApiError("description is required")
+    return data
+
+
+def api_json():
+    data = request.get_json(silent=True)
+    if data is None:
+        raise ApiError("request body must be JSON")
+    return data
+
+
+def settled(result):
+    """Wait for a group-committed write so the response reflects it."""
+    return result.result() if isinstance(result, Future) else result
+
+
+def found(record):
+    if record is None:
+        raise ApiError("task not found", 404)
+    return record
+
+
+@app.route("/api/tasks", methods=["GET"])
+def api_list():
+    args = request.args
+    fields = args.get("fields")
+    fields = fields.split(",") if fields else list(EXPORT_FIELDS)
+    if not set(fields) <= set(EXPORT_FIELDS):
+        raise ApiError(f"fields must be among: {', '.join(EXPORT_FIELDS)}")
+    try:
+        limit = min(int(args.get("limit", 50)), API_MAX_LIMIT)
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    sort_by, ascending = parse_sort(args.get("sort", "desc"))
+    try:
+        tasks, next_cursor, prev_cursor = tracker.list_tasks_page(
+            show_all=args.get("all", "1") != "0",
+            sort_by=sort_by,
+            ascending=ascending,
+            search=args.get("q") or None,
+            status=args.get("status") or None,
+            limit=max(limit, 1),
+            after=args.get("after") or None,
+            before=args.get("before") or None,
+            fields=fields,
+        )
+    except ValueError as exc:
+        raise ApiError(str(exc))
+    return jsonify(
+        tasks=[dict(zip(fields, row)) for row in tasks],
+        next=next_cursor,
+        prev=prev_cursor,
+    )
+
+
+@app.route("/api/tasks", methods=["POST"])
+def api_create():
+    fields = api_task_fields(api_json(), require_description=True)
+    task_id = settled(tracker.add_task(**fields))
+    response = jsonify(tracker.get_task_record(task_id))
+    response.status_code = 201
+    response.headers["Location"] = url_for("api_get", task_id=task_id)
+    return response
+
+
+@app.route("/api/tasks/<int:task_id>", methods=["GET"])
+def api_get(task_id: int):
+    return jsonify(found(tracker.get_task_record(task_id)))
+
+
+@app.route("/api/tasks/<int:task_id>", methods=["PATCH"])
+def api_update(task_id: int):
+    fields = api_task_fields(api_json())
+    found(tracker.get_task_record(task_id))
+    settled(tracker.update_task(task_id, **fields))
+    return jsonify(found(tracker.get_task_record(task_id)))
+
+
+@app.route("/api/tasks/<int:task_id>", methods=["DELETE"])
+def api_delete(task_id: int):
+    found(tracker.get_task_record(task_id))
+    settled(tracker.delete_task(task_id))
+    return ("", 204)
+
+
+@app.route("/api/summary", methods=["GET"])
+def api_summary():
+    """Task totals per status and priority, plus overdue and due this week."""
+    try:
+        return jsonify(tracker.summary(request.args.get("today")))
+    except ValueError:
+        raise ApiError("today must be a YYYY-MM-DD date")
+
+
+@app.route("/api/due", methods=["GET"])
+def api_due():
+    """Open tasks that are overdue or due within ``days`` days, soonest first."""
+    args = request.args
+    try:
+        today = normalize_due_date(args.get("today")) or datetime.date.today().isoformat()
+        days = int(args.get("days", 7))
+        limit = min(int(args.get("limit", 50)), API_MAX_LIMIT)
+        tasks = tracker.due_tasks(today, days, limit)
+    except ValueError:
+        raise ApiError("today must be a YYYY-MM-DD date, days and limit integers")
+    fields = ("id", "description", "priority", "due_date", "status")
+    return jsonify(
+        today=today,
+        tasks=[dict(zip(fields, task), overdue=task[3] < today) for task in tasks],
+    )
+
+
+@app.route("/api/tasks:batch", methods=["POST"])
+def api_batch():
+    """Apply {"create": [...], "update": [...], "delete": [...]} atomically."""
+    data = api_json()
+    if not isinstance(data, dict) or set(data) - {"create", "update", "delete"}:
+        raise ApiError('expected an object with "create", "update" and/or "delete" lists')
+    creates = data.get("create", [])
+    updates = data.get("update", [])
+    deletes = data.get("delete", [])
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        raise ApiError('"create", "update" and "delete" must be lists')
+    if len(creates) + len(updates) + len(deletes) > API_MAX_BATCH:
+        raise ApiError(f"at most {API_MAX_BATCH} changes per batch", 413)
+    creates = [api_task_fields(task, require_description=True) for task in creates]
+    checked_updates = []
+    for update in updates:
+        if not isinstance(update, dict) or not isinstance(update.get("id"), int):
+            raise ApiError("every update needs an integer id")
+        fields = dict(update)
+        task_id = fields.pop("id")
+        checked_updates.append(dict(api_task_fields(fields), id=task_id))
+    if not all(isinstance(task_id, int) for task_id in deletes):
+        raise ApiError("delete must list integer ids")
+    return jsonify(tracker.apply_batch(creates, checked_updates, deletes))
+
 
 if __name__ == "__main__":
-    import os
     port = int(os.getenv("PORT", 5000))
     app.run(host="0.0.0.0", port=port)